@@ -1,16 +1,33 @@
-from fastapi import FastAPI, HTTPException, Query, Body
+from fastapi import FastAPI, HTTPException, Query, Body, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
 from typing import Optional, List
-import yfinance as yf
-import joblib
 import os
+import time
+import numpy as np
 import pandas as pd
 from datetime import date, timedelta
-from loader import load_stocks
+from loader import load_latest, load_bars
+from providers import _yfinance
 import traceback
 from db import init_db, SessionLocal, TrainedModel
-from train_models import train_for_tickers
+import retrain
+import model_selection
+from screener import Screener, ExpressionError, universe_from_env
+from jobs import TrainingQueue
+from model_registry import ModelRegistry
+from prediction_cache import prediction_cache
+from refresh import RefreshEngine
+from quotes import quote_cache
+from stream import StockStream
+from state_store import StateStore
+import leases
+import threading
+import history_format
+import simulator
+import portfolio_risk
+import metrics
 
 
 app = FastAPI()
@@ -21,25 +38,80 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-History-Layout", "X-History-Source-Points"],
 )
 
-init_db()
+# per-route request timing + slow request log (AUGUR_METRICS=0 turns it off)
+if metrics.ENABLED:
+    app.add_middleware(metrics.MetricsMiddleware)
+
+# model training runs in background worker processes
+training_queue = TrainingQueue(max_workers=int(os.environ.get("AUGUR_TRAIN_WORKERS", 2)))
+
+# Startup work is kept out of module import so that `import api_server` (and
+# every --reload) stays cheap. Training code and the ML libraries load in
+# the job workers, ta/yfinance/joblib on first use.
+@app.on_event("startup")
+def prepare_database():
+    init_db()
+
+
+@app.on_event("startup")
+def recover_training_jobs():
+    training_queue.recover()
+
+
+@app.on_event("shutdown")
+def stop_background_work():
+    stock_stream.stop()
+    state_store.close()
 
 
 tracked_stocks = {}
 
+# tracked_stocks survives restarts through SQLite (see state_store.py). With
+# AUGUR_SHARED_STATE=1 (start_server.py --workers N) that table is shared by
+# all workers, and tracked_stocks is each worker's copy of it.
+state_store = StateStore(
+    flush_seconds=float(os.environ.get("AUGUR_STATE_FLUSH_SECONDS", 1)),
+    enabled=os.environ.get("AUGUR_PERSIST_STATE", "1") == "1",
+    shared=os.environ.get("AUGUR_SHARED_STATE", "0") == "1",
+)
+# restored quotes older than this are re-fetched by the startup warmup
+STATE_STALE_SECONDS = float(os.environ.get("AUGUR_STATE_STALE_SECONDS", 900))
+
+# ticker -> (bar date, model version, {feature: value}) of its last model prediction
+_feature_rows = {}
+
 # stocks with ml models
 supportedStocks = [
     "AAPL", "MSFT", "NVDA", "GOOGL", "AMZN",
     "TSLA", "META", "JPM", "V", "JNJ"
 ]
 
+# indicator panel for /api/screener; the universe is the supported and
+# tracked stocks unless AUGUR_SCREENER_UNIVERSE names a list or @file
+screener_panel = Screener(
+    lambda: universe_from_env(list(dict.fromkeys(supportedStocks + list(tracked_stocks)))),
+    history_days=int(os.environ.get("AUGUR_SCREENER_DAYS", 400)),
+    refresh_seconds=float(os.environ.get("AUGUR_SCREENER_REFRESH_SECONDS", 300)),
+)
+
 baseDir = os.path.dirname(os.path.abspath(__file__))
-modelDir = os.path.join(baseDir, "models")
+modelDir = os.environ.get("AUGUR_MODEL_DIR", os.path.join(baseDir, "models"))
 
 # make sure models folder exists
 os.makedirs(modelDir, exist_ok=True)
 
+# deserialized models stay in memory between requests
+model_registry = ModelRegistry(
+    modelDir,
+    max_models=int(os.environ.get("AUGUR_MODEL_CACHE_SIZE", 32)),
+    max_bytes=int(os.environ.get("AUGUR_MODEL_CACHE_MB", 512)) * 1024 * 1024,
+    use_compiled=os.environ.get("AUGUR_USE_COMPILED", "1") == "1",
+    check_seconds=float(os.environ.get("AUGUR_MODEL_CHECK_SECONDS", 2)),
+)
+
 
 def get_modelpath(ticker, file_type="model"):
     if file_type == "model":
@@ -50,51 +122,343 @@ def get_modelpath(ticker, file_type="model"):
         return f"{ticker}_{file_type}.pkl"
 
 
-def get_price(stock_obj, stock_info):
-    price = stock_info.get('currentPrice') or stock_info.get('regularMarketPrice') or stock_info.get('previousClose')
-    if not price or price == 0:
-        try:
-            history = stock_obj.history(period='1d')
-            if not history.empty:
-                price = history['Close'].iloc[-1]
-        except Exception:
-            pass
-    return round(price, 2) if price and price > 0 else None
+def get_prediction(ticker, data=None):
+    """
+    Predict the next move for ticker from the features of its latest bar.
+    `data` is an indicator DataFrame (indexed by bar date) the caller already
+    has; without it the latest values come from the streaming indicator
+    engine. Results are cached per (ticker, bar date, model version).
+    """
+    try:
+        if data is None:
+            cached = prediction_cache.recent(ticker)
+            if cached is not None:
+                metrics.incr("augur_predictions_total", source="recent")
+                return cached
+
+        with metrics.span("prediction.model_version"):
+            version = model_registry.version(ticker)
+        if version is None:
+            metrics.incr("augur_predictions_total", source="no_model")
+            return -1
 
+        if data is None:
+            # only the newest bar is needed, so use the streaming indicators
+            start_date = (date.today() - timedelta(days=365)).strftime("%Y-%m-%d")
+            with metrics.span("prediction.latest_bar"):
+                latest = load_latest([ticker], start_date)
+
+            if ticker not in latest:
+                return -1
+
+            bar_date, values = latest[ticker]
+        else:
+            if len(data) == 0:
+                return -1
+            bar_date, values = data.index[-1], None
+
+        bar_day = pd.Timestamp(bar_date).strftime("%Y-%m-%d")
+        cached = prediction_cache.get(ticker, bar_day, version)
+        if cached is not None:
+            metrics.incr("augur_predictions_total", source="cache")
+            return cached
+
+        with metrics.span("prediction.model_load"):
+            loaded = model_registry.get(ticker)
+        if loaded is None:
+            return -1
+        ml_model, feature_list = loaded
+
+        if values is not None:
+            latest_data = pd.DataFrame([[values[f] for f in feature_list]], columns=feature_list)
+        else:
+            latest_data = data[feature_list].iloc[-1:]
+
+        with metrics.span("prediction.predict"):
+            prediction = int(ml_model.predict(latest_data)[0])
+        prediction_cache.put(ticker, bar_day, version, prediction)
+        _feature_rows[ticker] = (bar_day, version, {f: float(v) for f, v in latest_data.iloc[0].items()})
+        metrics.incr("augur_predictions_total", source="model")
+        return prediction  # 1 = up, 0 = down, -1 = error
+    except Exception as e:
+        print(f"error getting prediction for {ticker}: {e}")
+        metrics.incr("augur_predictions_total", source="error")
+        return -1
 
-def get_companyname(stock_info):
-    return stock_info.get('longName') or stock_info.get('shortName') or None
 
+def get_predictions(tickers):
+    """
+    Batch version of get_prediction: bars for every ticker are loaded in one
+    batched call and their latest feature rows are stacked into one frame
+    before each ticker's model scores its row.
+    Returns ({ticker: {'prediction', 'latency_ms'}}, load_ms).
+    """
+    tickers = list(dict.fromkeys(tickers))
+    started = time.perf_counter()
+    start_date = (date.today() - timedelta(days=365)).strftime("%Y-%m-%d")
+    try:
+        latest = load_latest(tickers, start_date)
+    except Exception as e:
+        print(f"error loading batch data: {e}")
+        latest = {}
+    features = pd.DataFrame(
+        [values for _, values in latest.values()],
+        index=pd.MultiIndex.from_tuples(
+            [(ticker, bar_date) for ticker, (bar_date, _) in latest.items()],
+            names=['ticker', 'Date'],
+        ),
+    )
+    load_ms = (time.perf_counter() - started) * 1000
+
+    results = {}
+    for ticker in tickers:
+        t0 = time.perf_counter()
+        pred = -1
+        if ticker in latest:
+            pred = get_prediction(ticker, features.xs(ticker, level='ticker'))
+        results[ticker] = {
+            'prediction': pred,
+            'latency_ms': round((time.perf_counter() - t0) * 1000, 3),
+        }
+    return results, round(load_ms, 3)
 
-def get_prediction(ticker):
-    model_file = get_modelpath(ticker, "model")
-    features_file = get_modelpath(ticker, "features")
 
-    if not (os.path.exists(model_file) and os.path.exists(features_file)):
-        return -1
+refresh_engine = RefreshEngine(
+    get_prediction,
+    max_workers=int(os.environ.get("AUGUR_REFRESH_WORKERS", 8)),
+    ticker_timeout=float(os.environ.get("AUGUR_REFRESH_TIMEOUT", 10)),
+    fetch_timeout=float(os.environ.get("AUGUR_REFRESH_FETCH_TIMEOUT", 30)),
+    deadline=float(os.environ.get("AUGUR_REFRESH_DEADLINE", 60)),
+)
 
-    try:
-        ml_model = joblib.load(model_file)
-        feature_list = joblib.load(features_file)
 
-        
-        
-        start_date = (date.today() - timedelta(days=365)).strftime("%Y-%m-%d")
-        stock_data = load_stocks([ticker], start_date)
+def _persist(ticker, quoted=False):
+    """Queue ticker's current tracked_stocks entry (or its removal) for the state store."""
+    stock = tracked_stocks.get(ticker)
+    if stock is None:
+        state_store.delete(ticker)
+        return
+    fields = {
+        'company_name': stock.get('company_name'),
+        'price': stock.get('price'),
+        'prediction': stock.get('prediction'),
+    }
+    if quoted:
+        fields['quoted_at'] = time.time()
+    row = _feature_rows.get(ticker)
+    if row is not None:
+        fields.update(bar_date=row[0], model_version=row[1], features=row[2])
+    state_store.put(ticker, **fields)
+
+
+def _sync_watchlist():
+    """Shared-state mode: reload tracked_stocks if another worker changed the table."""
+    if not state_store.shared or not state_store.changed():
+        return
+    state_store.flush()   # our own pending updates first, so the reload keeps them
+    rows = state_store.load()
+    for ticker in list(tracked_stocks):
+        if ticker not in rows:
+            tracked_stocks.pop(ticker, None)
+    for ticker, row in rows.items():
+        tracked_stocks[ticker] = {
+            'price': row['price'] or 0,
+            'prediction': row['prediction'] if row['prediction'] is not None else -1,
+            'company_name': row['company_name'] or ticker,
+        }
 
-        if ticker not in stock_data or stock_data[ticker].empty:
-            return -1
 
-        data = stock_data[ticker]
-        if len(data) == 0:
-            return -1
+def _refresh_tracked(tickers=None):
+    """Re-quote and re-predict tracked stocks (all by default); returns (updated rows, engine result)."""
+    tickers = list(tracked_stocks.keys()) if tickers is None else list(tickers)
+    result = refresh_engine.refresh(tickers)
+
+    updated = []
+    for ticker in tickers:
+        fresh = result['results'].get(ticker)
+        if fresh is None or ticker not in tracked_stocks:
+            continue
+        company = tracked_stocks[ticker].get('company_name') or ticker
+        quote_cache.put_price(ticker, fresh['price'])
+        tracked_stocks[ticker].update({'price': fresh['price'], 'prediction': fresh['prediction']})
+        _persist(ticker, quoted=True)
+        updated.append({
+            'name': ticker,
+            'companyName': company,
+            'price': fresh['price'],
+            'prediction': fresh['prediction'],
+        })
+    return updated, result
 
-        latest_data = data[feature_list].iloc[-1:]
-        prediction = int(ml_model.predict(latest_data)[0])
-        return prediction  # 1 = up, 0 = down, -1 = error
+
+def _watchlist_state():
+    return {
+        ticker: {
+            'companyName': stock_data.get('company_name', ticker),
+            'price': stock_data.get('price', 0),
+            'prediction': stock_data.get('prediction', 0),
+        }
+        for ticker, stock_data in list(tracked_stocks.items())
+    }
+
+
+def _stream_refresh():
+    """
+    Stream tick. With several workers only the holder of the
+    "stream-refresh" lease goes upstream; the others pick up its results
+    from the shared table.
+    """
+    if not state_store.shared:
+        _refresh_tracked()
+        return
+    _sync_watchlist()
+    if leases.acquire("stream-refresh", ttl=stock_stream.interval * 2):
+        _refresh_tracked()
+        state_store.flush()
+
+
+# pushes watchlist changes to open /api/stocks/stream connections; the
+# refresh runs once per interval however many clients are connected
+stock_stream = StockStream(
+    _watchlist_state,
+    _stream_refresh,
+    interval=float(os.environ.get("AUGUR_STREAM_INTERVAL", 60)),
+    max_pending=int(os.environ.get("AUGUR_STREAM_MAX_PENDING", 16)),
+)
+
+
+@app.on_event("startup")
+def restore_tracked_stocks():
+    """
+    Put the persisted watchlist back right away, seeding the quote and
+    prediction caches with it, and leave re-validation to a background
+    thread so the first requests are answered from the restored state.
+    """
+    started = time.perf_counter()
+    try:
+        restored = state_store.load()
     except Exception as e:
-        print(f"error getting prediction for {ticker}: {e}")
-        return -1
+        print(f"[state] could not restore tracked stocks: {e}")
+        return
+    now = time.time()
+    for ticker, row in restored.items():
+        tracked_stocks.setdefault(ticker, {
+            'price': row['price'] or 0,
+            'prediction': row['prediction'] if row['prediction'] is not None else -1,
+            'company_name': row['company_name'] or ticker,
+        })
+        age = now - row['quoted_at'] if row['quoted_at'] else float('inf')
+        quote_cache.seed(ticker, row['company_name'], row['price'], age)
+        if row['bar_date'] and row['model_version'] and row['prediction'] is not None:
+            prediction_cache.seed(ticker, row['bar_date'], row['model_version'], row['prediction'])
+        if row['features'] and row['bar_date'] and row['model_version']:
+            _feature_rows.setdefault(ticker, (row['bar_date'], row['model_version'], row['features']))
+    if restored:
+        print(f"[state] restored {len(restored)} tracked stocks in "
+              f"{(time.perf_counter() - started) * 1000:.1f}ms")
+        if state_store.shared and not leases.acquire("state-warmup", ttl=300):
+            return   # another worker is re-validating the shared table
+        threading.Thread(target=_warm_restored, args=(restored,), name="state-warmup", daemon=True).start()
+
+
+def _warm_restored(restored):
+    """
+    Re-validate restored stocks: re-score the saved feature row of any
+    ticker whose model changed while the server was down (no data fetch
+    needed), then refresh the tickers whose saved quote is older than
+    AUGUR_STATE_STALE_SECONDS.
+    """
+    started = time.perf_counter()
+    rescored = 0
+    for ticker, row in restored.items():
+        if ticker not in tracked_stocks or not row['features']:
+            continue
+        try:
+            version = model_registry.version(ticker)
+            if version is None or version == row['model_version']:
+                continue
+            loaded = model_registry.get(ticker)
+            if loaded is None:
+                continue
+            ml_model, feature_list = loaded
+            X = pd.DataFrame([[row['features'][f] for f in feature_list]], columns=feature_list)
+            prediction = int(ml_model.predict(X)[0])
+        except Exception as e:
+            print(f"[state] could not re-score {ticker}: {e}")
+            continue
+        prediction_cache.put(ticker, row['bar_date'], version, prediction)
+        _feature_rows[ticker] = (row['bar_date'], version, row['features'])
+        if ticker in tracked_stocks:
+            tracked_stocks[ticker]['prediction'] = prediction
+            _persist(ticker)
+        rescored += 1
+    if rescored:
+        stock_stream.publish()
+
+    now = time.time()
+    stale = [
+        t for t, row in restored.items()
+        if t in tracked_stocks and now - (row['quoted_at'] or 0) > STATE_STALE_SECONDS
+    ]
+    if stale:
+        try:
+            _refresh_tracked(stale)
+        except Exception as e:
+            print(f"[state] warmup refresh failed: {e}")
+        stock_stream.publish()
+    print(f"[state] warmup done in {time.perf_counter() - started:.2f}s "
+          f"({rescored} re-scored, {len(stale)} stale refreshed)")
+
+
+@app.on_event("startup")
+def start_model_preload():
+    """
+    With AUGUR_PRELOAD_MODELS=1, load the models of the supported and the
+    tracked stocks into the registry from a background thread, so the first
+    prediction requests do not pay for it. Startup does not wait for it.
+    """
+    if os.environ.get("AUGUR_PRELOAD_MODELS", "0") != "1":
+        return
+    threading.Thread(target=_preload_models, name="model-preload", daemon=True).start()
+
+
+def _preload_models():
+    # give uvicorn a moment to start accepting connections first
+    time.sleep(float(os.environ.get("AUGUR_PRELOAD_DELAY", 1)))
+    started = time.perf_counter()
+    loaded = 0
+    for ticker in dict.fromkeys(supportedStocks + list(tracked_stocks)):
+        try:
+            if model_registry.get(ticker) is not None:
+                loaded += 1
+        except Exception as e:
+            print(f"[preload] could not load model for {ticker}: {e}")
+    print(f"[preload] {loaded} models loaded in {time.perf_counter() - started:.2f}s")
+
+
+@app.on_event("startup")
+def start_retrain_scheduler():
+    """
+    With AUGUR_RETRAIN_HOURS > 0, queue incremental retraining (retrain.py)
+    of every active model that often. With several workers only the one
+    holding the "retrain-scheduler" lease does it.
+    """
+    hours = float(os.environ.get("AUGUR_RETRAIN_HOURS", 0))
+    if hours <= 0:
+        return
+    threading.Thread(target=_retrain_loop, args=(hours * 3600,), name="retrain-scheduler", daemon=True).start()
+
+
+def _retrain_loop(interval):
+    while True:
+        time.sleep(interval)
+        try:
+            if leases.acquire("retrain-scheduler", interval * 1.5):
+                tickers = retrain.active_tickers()
+                training_queue.submit(tickers, years_back=3, on_done=_pick_up_trained_model, incremental=True)
+                print(f"[retrain] queued {len(tickers)} tickers")
+        except Exception as e:
+            print(f"[retrain] could not queue retraining: {e}")
 
 
 class TickerRequest(BaseModel):
@@ -106,42 +470,95 @@ class TrainRequest(BaseModel):
     tickers: List[str]
 
 
+class SimulationRequest(BaseModel):
+    tickers: List[str]
+    atr_mult_sl: List[float] = [1.0, 1.5, 2.0, 2.5, 3.0]
+    atr_mult_tp: List[float] = [1.5, 2.0, 3.0, 4.0, 5.0]
+    risk_per_trade: List[float] = [0.01]
+    years: float = 3
+    max_hold: int = 20
+    signals: str = "model"   # "target" replays realised moves: an upper bound only
+    equity: float = 100000
+    top: int = 5
+
+
+class RiskPosition(BaseModel):
+    ticker: str
+    entry_price: float
+    shares: Optional[float] = None   # held shares; None sizes a candidate entry
+
+
+class PortfolioRiskRequest(BaseModel):
+    positions: List[RiskPosition]
+    equity: float = 100000
+    risk_per_trade: float = 0.01
+    atr_mult_sl: float = 1.5
+    atr_mult_tp: float = 3.0
+    lookback_days: int = 365
+
+
 @app.put('/api/stocks/refresh')
 def refresh_allstocks():
     try:
-        updated = []
-        failed = []
-        for ticker in list(tracked_stocks.keys()):
-            try:
-                stock = yf.Ticker(ticker)
-                info = stock.info
-                price = get_price(stock, info) if info and len(info) > 0 else None
-                if not price:
-                    failed.append(ticker)
-                    continue
-                company = get_companyname(info) or ticker
-                pred = get_prediction(ticker)
-                tracked_stocks[ticker].update({'price': price, 'prediction': pred, 'company_name': company})
-                updated.append({'name': ticker, 'companyName': company, 'price': price, 'prediction': pred})
-            except:
-                failed.append(ticker)
-        return {'updated': updated, 'failed': failed, 'message': f'refreshed {len(updated)} stocks'}
+        _sync_watchlist()
+        updated, result = _refresh_tracked()
+        stock_stream.publish()
+        failed = result['failed'] + result['timed_out']
+        return {
+            'updated': updated,
+            'failed': failed,
+            'timed_out': result['timed_out'],
+            'elapsed_ms': result['elapsed_ms'],
+            'message': f'refreshed {len(updated)} stocks',
+        }
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
+@app.get('/api/predictions')
+def batch_predictions(
+    tickers: str = Query(..., description="Comma-separated tickers, e.g. AAPL,MSFT,NVDA"),
+):
+    """Predictions for many tickers in one call, with per-ticker scoring latency."""
+    symbols = [t.strip().upper() for t in tickers.split(',') if t.strip()]
+    if not symbols:
+        raise HTTPException(status_code=400, detail='tickers required')
+    if len(symbols) > 200:
+        raise HTTPException(status_code=400, detail='at most 200 tickers per call')
+
+    started = time.perf_counter()
+    results, load_ms = get_predictions(symbols)
+    return {
+        'predictions': [{'ticker': t, **results[t]} for t in results],
+        'load_ms': load_ms,
+        'elapsed_ms': round((time.perf_counter() - started) * 1000, 3),
+    }
+
+
+@app.get('/api/stocks/stream')
+async def stream_stocks(request: Request):
+    """
+    Server-sent events: a snapshot of the watchlist, then a diff whenever a
+    price or prediction changes (see stream.py). Replaces client polling.
+    """
+    return StreamingResponse(
+        stock_stream.events(request.is_disconnected),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @app.get('/api/stocks/{ticker}')
 def get_stockdata(ticker: str):
     try:
         ticker = ticker.upper()
-        stock_obj = yf.Ticker(ticker)
-        stock_info = stock_obj.info
+        quote = quote_cache.get(ticker)
 
-        if not stock_info or len(stock_info) == 0:
+        if quote is None:
             raise HTTPException(status_code=400, detail=f'stock {ticker} does not exist')
 
-        price = get_price(stock_obj, stock_info) or 0
-        company = get_companyname(stock_info) or ticker
+        price = quote['price'] or 0
+        company = quote['company_name'] or ticker
         pred = get_prediction(ticker)
 
         return {
@@ -159,6 +576,7 @@ def get_stockdata(ticker: str):
 
 @app.get('/api/stocks')
 def get_trackedstocks():
+    _sync_watchlist()
     result = []
     for ticker, stock_data in tracked_stocks.items():
         result.append({
@@ -174,8 +592,9 @@ def get_trackedstocks():
 def add_stock(request: TickerRequest):
     """
     Add a new stock to the tracked list.
-    Option A: if we don't already have an ML model for this ticker,
-    try to train one on the fly using train_for_tickers().
+    If we don't already have an ML model for this ticker, a background
+    training job is queued and the stock is returned with prediction -1;
+    the prediction is filled in when the job finishes.
     """
     try:
         ticker = request.ticker.upper().strip()
@@ -183,6 +602,7 @@ def add_stock(request: TickerRequest):
         if not ticker:
             raise HTTPException(status_code=400, detail="ticker required")
 
+        _sync_watchlist()
         # If already tracked, just return what we have
         if ticker in tracked_stocks:
             stock_data = tracked_stocks[ticker]
@@ -191,57 +611,58 @@ def add_stock(request: TickerRequest):
                 "companyName": stock_data.get("company_name", ticker),
                 "price": stock_data.get("price", 0),
                 "prediction": stock_data.get("prediction", 0),
+                "trainingJobId": training_queue.active_job(ticker),
             }
 
-        # 1) Ensure / train ML model if missing
-        model_file = get_modelpath(ticker, "model")
-        features_file = get_modelpath(ticker, "features")
+        # 1) Latest quote and company info (cached, see quotes.py)
+        quote = quote_cache.get(ticker)
+        symbol = quote["symbol"] if quote else None
 
-        if not (os.path.exists(model_file) and os.path.exists(features_file)):
-            # Only try if no model exists yet
-            try:
-                print(
-                    f"[add_stock] No model found for {ticker} – "
-                    "training via train_for_tickers..."
-                )
-                # Uses your existing helper in train_models.py
-                train_for_tickers([ticker], years_back=3)
-            except Exception as train_err:
-                # Do not kill the request if training fails:
-                # prediction will just be -1.
-                print(f"[add_stock] train_for_tickers failed for {ticker}: {train_err}")
-
-        # 2) Pull latest quote and company info from yfinance
-        stock = yf.Ticker(ticker)
-        info = stock.info
-        symbol = info.get("symbol") if info else None
-
-        if not info or not symbol or symbol.upper() != ticker:
+        if not symbol or symbol.upper() != ticker:
             raise HTTPException(status_code=400, detail=f"{ticker} not found")
 
-        price = get_price(stock, info)
+        price = quote["price"]
         if not price:
             raise HTTPException(
                 status_code=400,
                 detail=f"{ticker} has no price data",
             )
 
-        company = get_companyname(info) or ticker
+        company = quote["company_name"] or ticker
 
-        # 3) Ask ML model for prediction (may still be -1 if model/train failed)
-        pred = get_prediction(ticker)
+        # 2) Queue training if there is no model yet, otherwise predict now
+        model_file = get_modelpath(ticker, "model")
+        features_file = get_modelpath(ticker, "features")
+        job_id = None
+
+        if os.path.exists(model_file) and os.path.exists(features_file):
+            pred = get_prediction(ticker)
+        else:
+            pred = -1
+            print(f"[add_stock] No model found for {ticker} – queueing training job")
+            # no job when another worker holds the ticker's training lease;
+            # its model is picked up through the registry once it lands
+            jobs = training_queue.submit(
+                [ticker], years_back=3, on_done=_pick_up_trained_model
+            )
+            job_id = jobs[0]["id"] if jobs else None
 
         tracked_stocks[ticker] = {
             "price": price,
             "prediction": pred,
             "company_name": company,
         }
+        _persist(ticker, quoted=True)
+        if state_store.shared:
+            state_store.flush()   # visible to the other workers right away
+        stock_stream.publish()
 
         return {
             "name": ticker,
             "companyName": company,
             "price": price,
             "prediction": pred,
+            "trainingJobId": job_id,
         }
 
     except HTTPException:
@@ -250,11 +671,25 @@ def add_stock(request: TickerRequest):
         raise HTTPException(status_code=400, detail=str(e))
 
 
+def _pick_up_trained_model(job):
+    """Training job callback: refresh the prediction of a still-tracked ticker."""
+    ticker = job["ticker"]
+    model_registry.invalidate(ticker)
+    prediction_cache.invalidate([ticker])
+    if job["status"] == "succeeded" and ticker in tracked_stocks:
+        tracked_stocks[ticker]["prediction"] = get_prediction(ticker)
+        _persist(ticker)
+        stock_stream.publish()
+
+
 @app.delete('/api/stocks/{ticker}')
 def remove_stock(ticker: str):
     ticker = ticker.upper()
+    _sync_watchlist()
     if ticker in tracked_stocks:
         del tracked_stocks[ticker]
+        _persist(ticker)
+        stock_stream.publish()
         return {'message': 'stock removed'}
     else:
         raise HTTPException(status_code=404, detail='stock not found')
@@ -262,50 +697,106 @@ def remove_stock(ticker: str):
 
 @app.get("/api/stocks/{ticker}/history")
 def get_stock_history(
+    request: Request,
     ticker: str,
     period: str = Query(
         default="3mo",
         description="History period for yfinance (e.g. 1mo,3mo,6mo,1y,5y)"
     ),
+    format: str = Query(
+        default="rows",
+        pattern="^(rows|columns|binary)$",
+        description="rows (list of bar objects), columns (parallel arrays) or binary (packed float32)",
+    ),
+    start: Optional[str] = Query(default=None, description="first date (YYYY-MM-DD); overrides period"),
+    end: Optional[str] = Query(default=None, description="last date (YYYY-MM-DD), inclusive"),
+    max_points: Optional[int] = Query(default=None, ge=2, le=20000, description="downsample to at most this many bars"),
+    mode: str = Query(
+        default="ohlc",
+        pattern="^(ohlc|line)$",
+        description="downsampling: ohlc (merged candles) or line (LTTB on close)",
+    ),
+    interval: str = Query(
+        default="1d",
+        pattern="^(1d|1m|5m|15m|30m|1h)$",
+        description="bar size; intraday bars are served from the column store",
+    ),
 ):
     """
     Return OHLCV history for a ticker so the frontend can draw charts.
+    start/end select a date range (for zooming), and max_points caps the
+    number of bars sent (see history_format.downsample_*). The bar count
+    before downsampling is in X-History-Source-Points. Intraday intervals
+    read memory-mapped slices from the loader's column store and are
+    dated to the minute.
+    Responses carry an ETag; a matching If-None-Match gets a 304.
     """
     try:
         t = ticker.upper()
-        stock = yf.Ticker(t)
-        history = stock.history(period=period)
+        try:
+            first = date.fromisoformat(start) if start else None
+            last = date.fromisoformat(end) if end else None
+        except ValueError:
+            raise HTTPException(status_code=400, detail="start/end must be YYYY-MM-DD")
+        if first and last and first > last:
+            raise HTTPException(status_code=400, detail="start is after end")
+
+        intraday = interval != "1d"
+        if intraday:
+            since = first or date.today() - timedelta(days=history_format.PERIOD_DAYS.get(period, 92))
+            history = load_bars([t], since.isoformat(), (last + timedelta(days=1)).isoformat() if last else None,
+                                interval=interval).get(t)
+        else:
+            stock = _yfinance().Ticker(t)
+            if first:
+                # yfinance's end is exclusive
+                history = stock.history(start=first.isoformat(), end=(last + timedelta(days=1)).isoformat() if last else None)
+            else:
+                history = stock.history(period=period)
 
         if history is None or history.empty:
             raise HTTPException(status_code=400, detail="No history data for ticker")
 
-        df = history.reset_index().rename(
-            columns={
-                "Date": "date",
-                "Open": "open",
-                "High": "high",
-                "Low": "low",
-                "Close": "close",
-                "Volume": "volume",
-            }
+        cols = history_format.history_columns(history, intraday=intraday)
+        cols = history_format.slice_range(
+            cols,
+            np.datetime64(first, "D") if first else None,
+            # inclusive end: the last minute of that day for intraday bars
+            (np.datetime64(last, "D") + 1 - np.timedelta64(1, "m") if intraday else np.datetime64(last, "D"))
+            if last else None,
         )
+        if len(cols["date"]) == 0:
+            raise HTTPException(status_code=400, detail="No history data in that range")
+        source_points = len(cols["date"])
+        if max_points:
+            if mode == "line":
+                cols = history_format.downsample_line(cols, max_points)
+            else:
+                cols = history_format.downsample_ohlc(cols, max_points)
+
+        tag = history_format.etag(t, period, format, start, end, max_points, mode, interval, cols=cols)
+        headers = {
+            "ETag": tag,
+            "Cache-Control": "no-cache",
+            "X-History-Source-Points": str(source_points),
+        }
 
-        records = []
-        for _, row in df.iterrows():
-            records.append(
-                {
-                    "date": row["date"].strftime("%Y-%m-%d"),
-                    "open": float(row["open"]),
-                    "high": float(row["high"]),
-                    "low": float(row["low"]),
-                    "close": float(row["close"]),
-                    "volume": float(row["volume"])
-                    if not pd.isna(row["volume"])
-                    else 0.0,
-                }
-            )
+        if tag in request.headers.get("if-none-match", ""):
+            return Response(status_code=304, headers=headers)
 
-        return {"ticker": t, "prices": records}
+        if format == "binary":
+            headers["X-History-Layout"] = history_format.binary_layout(cols)
+            return Response(
+                content=history_format.to_binary(cols),
+                media_type="application/octet-stream",
+                headers=headers,
+            )
+        if format == "columns":
+            payload = history_format.to_columns(t, cols)
+        else:
+            payload = history_format.to_rows(t, cols)
+        payload["source_points"] = source_points
+        return JSONResponse(payload, headers=headers)
     except HTTPException:
         raise
     except Exception as e:
@@ -316,6 +807,8 @@ def get_stock_history(
 @app.delete('/api/stocks')
 def remove_allstocks():
     tracked_stocks.clear()
+    state_store.clear()
+    stock_stream.publish()
     return {'message': 'all stocks removed'}
 
 
@@ -335,12 +828,11 @@ def risk(
             raise HTTPException(status_code=400, detail='bad entry')
 
         start = (date.today() - timedelta(days=365)).strftime("%Y-%m-%d")
-        df = load_stocks([ticker], start).get(ticker)
-        print(df)
-        if df is None or df.empty:
+        latest = load_latest([ticker], start).get(ticker)
+        if latest is None:
             raise HTTPException(status_code=400, detail='no data')
 
-        atr = df['ATR'].iloc[-1]
+        atr = latest[1]['ATR']
         if atr <= 0:
             raise HTTPException(status_code=400, detail='atr problem')
 
@@ -367,25 +859,229 @@ def risk(
         raise HTTPException(status_code=400, detail=str(e))
 
 
+@app.get('/api/screener')
+def screen_stocks(
+    filter: Optional[str] = Query(default=None, max_length=500, description="e.g. rsi < 30 and close > sma"),
+    rank: Optional[str] = Query(default=None, max_length=500, description="e.g. change(close, 20)"),
+    order: str = Query(default="desc", pattern="^(asc|desc)$"),
+    limit: int = Query(default=50, ge=1, le=1000),
+):
+    """
+    Screen every ticker in the universe on its latest bar. filter and rank
+    are expressions over close, open, high, low, volume, rsi, macd,
+    macd_signal, sma, ema and atr (see screener.py).
+    """
+    try:
+        return screener_panel.screen(filter=filter, rank=rank, ascending=order == "asc", limit=limit)
+    except ExpressionError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.post('/api/risk')
+def portfolio_risk_sizing(req: PortfolioRiskRequest):
+    """
+    /risk sizing for many positions in one pass, plus the covariance of
+    their returns, portfolio volatility and correlated exposure (see
+    portfolio_risk.py). Positions that cannot be sized carry an error
+    instead of failing the request.
+    """
+    positions = [
+        {"ticker": p.ticker.strip().upper(), "entry_price": p.entry_price, "shares": p.shares}
+        for p in req.positions if p.ticker.strip()
+    ]
+    if not positions:
+        raise HTTPException(status_code=400, detail='positions required')
+    if len(positions) > 500:
+        raise HTTPException(status_code=400, detail='at most 500 positions')
+    if req.equity <= 0 or req.risk_per_trade <= 0 or req.atr_mult_sl <= 0 or req.atr_mult_tp <= 0:
+        raise HTTPException(status_code=400, detail='parameters must be positive')
+    if not 30 <= req.lookback_days <= 3650:
+        raise HTTPException(status_code=400, detail='lookback_days must be 30-3650')
+
+    try:
+        return portfolio_risk.assess(
+            positions,
+            equity=req.equity,
+            risk_per_trade=req.risk_per_trade,
+            atr_mult_sl=req.atr_mult_sl,
+            atr_mult_tp=req.atr_mult_tp,
+            lookback_days=req.lookback_days,
+        )
+    except Exception as e:
+        traceback.print_exc()
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.post('/api/simulate')
+def simulate_risk_params(req: SimulationRequest):
+    """
+    Backtest the /risk stop/target rule over a grid of atr_mult_sl x
+    atr_mult_tp x risk_per_trade for several tickers (see simulator.py).
+    """
+    tickers = list(dict.fromkeys(t.strip().upper() for t in req.tickers if t.strip()))
+    if not tickers:
+        raise HTTPException(status_code=400, detail='tickers required')
+    if req.signals not in ('target', 'model'):
+        raise HTTPException(status_code=400, detail='signals must be target or model')
+    if not req.atr_mult_sl or not req.atr_mult_tp or not req.risk_per_trade:
+        raise HTTPException(status_code=400, detail='parameter lists must not be empty')
+    if min(req.atr_mult_sl) <= 0 or min(req.atr_mult_tp) <= 0 or min(req.risk_per_trade) <= 0:
+        raise HTTPException(status_code=400, detail='parameters must be positive')
+    if not 1 <= req.max_hold <= simulator.MAX_HOLD:
+        raise HTTPException(status_code=400, detail=f'max_hold must be 1-{simulator.MAX_HOLD} bars')
+    if len(tickers) > simulator.MAX_TICKERS:
+        raise HTTPException(status_code=400, detail=f'at most {simulator.MAX_TICKERS} tickers')
+    if not 0 < req.years <= simulator.MAX_YEARS:
+        raise HTTPException(status_code=400, detail=f'years must be more than 0 and at most {simulator.MAX_YEARS}')
+    if not 1 <= req.top <= simulator.MAX_TOP:
+        raise HTTPException(status_code=400, detail=f'top must be 1-{simulator.MAX_TOP}')
+    if not req.equity > 0:
+        raise HTTPException(status_code=400, detail='equity must be positive')
+
+    try:
+        return simulator.sweep(
+            tickers,
+            req.atr_mult_sl,
+            req.atr_mult_tp,
+            req.risk_per_trade,
+            years_back=req.years,
+            max_hold=req.max_hold,
+            signals=req.signals,
+            model_lookup=model_registry.get,
+            top=req.top,
+            equity=req.equity,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.get("/api/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    """Stage/request histograms and counters plus cache stats, in Prometheus text format."""
+    samples = []
+    for cache, stats in (
+        ("models", model_registry.stats()),
+        ("predictions", prediction_cache.stats()),
+        ("quotes", quote_cache.stats()),
+    ):
+        samples.append(("augur_cache_entries", "gauge", {"cache": cache}, stats["entries"]))
+        for key in ("hits", "misses", "recent_hits", "stale_hits", "spill_hits", "evictions", "coalesced"):
+            if key in stats:
+                samples.append((f"augur_cache_{key}_total", "counter", {"cache": cache}, stats[key]))
+    samples.append(("augur_tracked_stocks", "gauge", {}, len(tracked_stocks)))
+    stream = stock_stream.stats()
+    samples.append(("augur_stream_subscribers", "gauge", {}, stream["subscribers"]))
+    for key in ("ticks", "diffs_sent", "resyncs", "refresh_errors"):
+        samples.append((f"augur_stream_{key}_total", "counter", {}, stream[key]))
+    return PlainTextResponse(
+        metrics.render(samples),
+        media_type="text/plain; version=0.0.4; charset=utf-8",
+    )
+
+
+@app.get("/api/admin/models/cache")
+def model_cache_stats():
+    """Hit/miss/load-time counters for the in-memory model registry."""
+    return model_registry.stats()
+
+
+@app.get("/api/admin/models/configs")
+def model_configs(ticker: Optional[str] = None):
+    """Hyperparameters chosen by model_selection.py and their CV scores."""
+    return model_selection.stored_configs(ticker)
+
+
+@app.get("/api/admin/predictions/cache")
+def prediction_cache_stats():
+    return prediction_cache.stats()
+
+
+@app.get("/api/admin/quotes/cache")
+def quote_cache_stats():
+    return quote_cache.stats()
+
+
+@app.get("/api/admin/stream")
+def stream_stats():
+    return stock_stream.stats()
+
+
+@app.get("/api/admin/state")
+def state_store_stats():
+    return state_store.stats()
+
+
+@app.get("/api/admin/screener")
+def screener_stats():
+    return screener_panel.stats()
+
+
 # 🔹 NEW: admin endpoint to train models on demand
-@app.post("/api/admin/train")
+@app.post("/api/admin/train", status_code=202)
 def admin_train_models(req: TrainRequest):
     """
-    Train ML models for one or more tickers on demand.
-    Frontend calls this when user clicks 'Train model' in the UI.
+    Queue background training for one or more tickers.
+    Frontend calls this when user clicks 'Train model' in the UI and then
+    polls /api/admin/jobs/{id} for each returned job.
     """
-    tickers = [t.strip().upper() for t in req.tickers if t.strip()]
+    tickers = list(dict.fromkeys(t.strip().upper() for t in req.tickers if t.strip()))
     if not tickers:
         raise HTTPException(status_code=400, detail="tickers list is empty")
 
     try:
-        train_for_tickers(tickers, years_back=3)
+        jobs = training_queue.submit(tickers, years_back=3, on_done=_pick_up_trained_model)
         return {
-            "trained": tickers,
-            "message": f"Trained/updated models for {', '.join(tickers)}",
+            "jobs": jobs,
+            "message": f"Queued training for {', '.join(j['ticker'] for j in jobs) or 'no tickers'}",
         }
     except Exception as e:
         raise HTTPException(
             status_code=500,
-            detail=f"Failed to train models: {str(e)}",
+            detail=f"Failed to queue training: {str(e)}",
         )
+
+
+class RetrainRequest(BaseModel):
+    tickers: Optional[List[str]] = None   # default: every active model
+    full: bool = False
+
+
+@app.post("/api/admin/retrain", status_code=202)
+def admin_retrain_models(req: RetrainRequest):
+    """
+    Queue retraining now instead of waiting for the scheduler. Unless full
+    is set, tickers whose data did not change are skipped and the others
+    are updated incrementally (see retrain.py).
+    """
+    tickers = req.tickers if req.tickers else retrain.active_tickers()
+    tickers = list(dict.fromkeys(t.strip().upper() for t in tickers if t.strip()))
+    if not tickers:
+        raise HTTPException(status_code=400, detail="no tickers to retrain")
+    try:
+        jobs = training_queue.submit(tickers, years_back=3, on_done=_pick_up_trained_model, incremental=not req.full)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to queue retraining: {str(e)}")
+    return {"jobs": jobs, "message": f"Queued retraining for {', '.join(j['ticker'] for j in jobs) or 'no tickers'}"}
+
+
+@app.get("/api/admin/retrain/runs")
+def list_training_runs(
+    limit: int = Query(default=200, ge=1, le=2000),
+    ticker: Optional[str] = None,
+    batch_id: Optional[str] = None,
+):
+    """Training history: one row per ticker per run, skipped ones included."""
+    return retrain.recent_runs(limit, ticker=ticker.upper() if ticker else None, batch_id=batch_id)
+
+
+@app.get("/api/admin/jobs")
+def list_training_jobs(limit: int = Query(default=50, ge=1, le=500)):
+    return training_queue.recent(limit)
+
+
+@app.get("/api/admin/jobs/{job_id}")
+def get_training_job(job_id: str):
+    job = training_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="job not found")
+    return job
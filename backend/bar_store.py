@@ -0,0 +1,109 @@
+# bar_store.py
+"""
+On-disk columnar cache of daily OHLCV bars, one .npz file per ticker.
+
+Each file holds one array per column (dates as int64 nanoseconds) plus the
+[start, end) date range that has already been requested from the provider,
+so loader.load_stocks only has to ask for the part it has not seen yet.
+
+lock(ticker) also takes an flock on <root>/.<TICKER>.lock, so server
+workers sharing the directory never sync the same ticker at once.
+"""
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from column_store import _FileLock
+from providers import OHLCV_COLUMNS
+
+
+baseDir = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_STORE_DIR = os.path.join(baseDir, "data", "bars")
+
+
+class BarStore:
+    def __init__(self, root=DEFAULT_STORE_DIR, memo_size=256):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+        # ticker -> (file mtime_ns, df, coverage); skips re-reading unchanged
+        # files, least recently read dropped past memo_size entries
+        self.memo_size = memo_size
+        self._memo = OrderedDict()
+        self._memo_lock = threading.Lock()
+
+    def _path(self, ticker):
+        return os.path.join(self.root, f"{ticker}.npz")
+
+    def lock(self, ticker):
+        """
+        Per-ticker lock, across threads and processes, so two requests
+        don't sync the same ticker at once. Hold it around write().
+        """
+        with self._locks_guard:
+            if ticker not in self._locks:
+                self._locks[ticker] = _FileLock(os.path.join(self.root, f".{ticker}.lock"))
+            return self._locks[ticker]
+
+    def read(self, ticker):
+        """
+        Return (df, coverage) for a cached ticker, where coverage is the
+        (start, end) pair of Timestamps already fetched, or (None, None).
+        The returned frame is shared; callers must not modify it in place.
+        """
+        path = self._path(ticker)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            return None, None
+        with self._memo_lock:
+            memo = self._memo.get(ticker)
+            if memo is not None and memo[0] == mtime:
+                self._memo.move_to_end(ticker)
+                return memo[1], memo[2]
+        try:
+            with np.load(path) as npz:
+                index = pd.DatetimeIndex(npz['date'].astype('datetime64[ns]'), name='Date')
+                df = pd.DataFrame({col: npz[col] for col in OHLCV_COLUMNS}, index=index)
+                start_ns, end_ns = npz['coverage']
+        except Exception as e:
+            print(f"[bar_store] ignoring unreadable cache for {ticker}: {e}")
+            return None, None
+        coverage = (pd.Timestamp(start_ns), pd.Timestamp(end_ns))
+        with self._memo_lock:
+            self._memo[ticker] = (mtime, df, coverage)
+            self._memo.move_to_end(ticker)
+            while len(self._memo) > self.memo_size:
+                self._memo.popitem(last=False)
+        return df, coverage
+
+    def write(self, ticker, df, coverage):
+        """Atomically replace the cached bars for ticker; the caller holds lock(ticker)."""
+        arrays = {col: df[col].to_numpy(dtype=np.float64) for col in OHLCV_COLUMNS}
+        arrays['date'] = df.index.values.astype('datetime64[ns]').astype(np.int64)
+        arrays['coverage'] = np.array([coverage[0].value, coverage[1].value], dtype=np.int64)
+
+        fd, tmp_path = tempfile.mkstemp(prefix=f".{ticker}.", suffix=".tmp", dir=self.root)
+        try:
+            with os.fdopen(fd, "wb") as fh:
+                np.savez(fh, **arrays)
+            os.replace(tmp_path, self._path(ticker))
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def clear(self, ticker=None):
+        tickers = [ticker] if ticker else [
+            name[:-4] for name in os.listdir(self.root) if name.endswith(".npz")
+        ]
+        for t in tickers:
+            with self._memo_lock:
+                self._memo.pop(t, None)
+            if os.path.exists(self._path(t)):
+                os.remove(self._path(t))
@@ -0,0 +1,71 @@
+# benchmarks/asgi_client.py
+"""
+Minimal in-process ASGI client so endpoint benchmarks need neither a
+running server nor httpx. Requests go straight into the FastAPI app.
+"""
+import asyncio
+import json
+
+
+class Response:
+    def __init__(self, status, headers, body):
+        self.status_code = status
+        self.headers = headers
+        self.content = body
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class ASGIClient:
+    def __init__(self, app):
+        self.app = app
+        self._loop = asyncio.new_event_loop()
+
+    def request(self, method, path, params=None, json_body=None, headers=None):
+        query = "&".join(f"{k}={v}" for k, v in (params or {}).items())
+        raw_headers = [(k.lower().encode(), str(v).encode()) for k, v in (headers or {}).items()]
+        body = b""
+        if json_body is not None:
+            body = json.dumps(json_body).encode()
+            raw_headers.append((b"content-type", b"application/json"))
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": method,
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode(),
+            "query_string": query.encode(),
+            "headers": raw_headers,
+            "client": ("bench", 0),
+            "server": ("bench", 80),
+            "root_path": "",
+        }
+        result = {"status": None, "headers": {}, "body": b""}
+
+        async def receive():
+            return {"type": "http.request", "body": body, "more_body": False}
+
+        async def send(message):
+            if message["type"] == "http.response.start":
+                result["status"] = message["status"]
+                result["headers"] = {k.decode(): v.decode() for k, v in message.get("headers", [])}
+            elif message["type"] == "http.response.body":
+                result["body"] += message.get("body", b"")
+
+        self._loop.run_until_complete(self.app(scope, receive, send))
+        return Response(result["status"], result["headers"], result["body"])
+
+    def get(self, path, **kwargs):
+        return self.request("GET", path, **kwargs)
+
+    def put(self, path, **kwargs):
+        return self.request("PUT", path, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.request("POST", path, **kwargs)
+
+    def close(self):
+        self._loop.close()
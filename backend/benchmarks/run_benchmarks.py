@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+# benchmarks/run_benchmarks.py
+"""
+Offline benchmark suite for the backend hot paths.
+
+Everything runs against SyntheticMarket data in a throwaway directory
+(bar store, models and SQLite db), so no network is needed and the
+repo's own models/db are never touched.
+
+    cd backend
+    python benchmarks/run_benchmarks.py                    # full run
+    python benchmarks/run_benchmarks.py --quick            # fewer iterations
+    python benchmarks/run_benchmarks.py --compare ../results/benchmarks/<old>.json
+
+Results (p50/p95/p99 latency in ms and throughput per benchmark) are
+written as JSON under results/benchmarks/ (git-ignored) so runs from
+different commits can be diffed.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REPO_DIR = os.path.dirname(BACKEND_DIR)
+sys.path.insert(0, BACKEND_DIR)
+
+
+def _isolate(workdir):
+    """Point every on-disk location the backend uses at workdir (before importing it)."""
+    os.environ["AUGUR_BAR_STORE"] = os.path.join(workdir, "data", "bars")
+    os.environ["AUGUR_MODEL_DIR"] = os.path.join(workdir, "models")
+    os.environ["AUGUR_DB_PATH"] = os.path.join(workdir, "bench.db")
+    os.environ["AUGUR_DATA_PROVIDER"] = "yfinance"   # replaced by install()
+
+
+def _percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * q
+    lo, hi = int(k), min(int(k) + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+def measure(name, fn, iterations, setup=None, warmup=1):
+    """Time fn() `iterations` times; setup() runs before each call, untimed."""
+    for _ in range(warmup):
+        if setup:
+            setup()
+        with contextlib.redirect_stdout(io.StringIO()):
+            fn()
+
+    timings = []
+    for _ in range(iterations):
+        if setup:
+            setup()
+        with contextlib.redirect_stdout(io.StringIO()):
+            started = time.perf_counter()
+            fn()
+            timings.append(time.perf_counter() - started)
+
+    timings.sort()
+    total = sum(timings)
+    result = {
+        "iterations": iterations,
+        "mean_ms": round(total / iterations * 1000, 4),
+        "p50_ms": round(_percentile(timings, 0.50) * 1000, 4),
+        "p95_ms": round(_percentile(timings, 0.95) * 1000, 4),
+        "p99_ms": round(_percentile(timings, 0.99) * 1000, 4),
+        "max_ms": round(timings[-1] * 1000, 4),
+        "ops_per_s": round(iterations / total, 2) if total else None,
+    }
+    print(f"{name:<36}{result['p50_ms']:>10.3f}{result['p95_ms']:>10.3f}"
+          f"{result['p99_ms']:>10.3f}{result['ops_per_s'] or 0:>12.1f}")
+    return result
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except Exception:
+        return None
+
+
+def run(args):
+    workdir = tempfile.mkdtemp(prefix="augur-bench-")
+    _isolate(workdir)
+
+    from benchmarks.synthetic import SyntheticMarket, install
+    from benchmarks.asgi_client import ASGIClient
+    import loader
+    import indicators
+    import train_models
+    import api_server
+
+    tickers = [f"SYN{i:02d}" for i in range(args.tickers)]
+    # models and predictions are daily; --interval adds the intraday loader benchmarks
+    market = SyntheticMarket(years=args.years)
+    install(market)
+    api_server.init_db()
+
+    scale = 0.2 if args.quick else 1.0
+
+    def n(count):
+        return max(3, int(count * scale))
+
+    start_1y = (date.today() - timedelta(days=365)).strftime("%Y-%m-%d")
+    start_all = (date.today() - timedelta(days=int(365.25 * args.years))).strftime("%Y-%m-%d")
+    store = loader.get_store()
+    results = {}
+
+    print(f"{'benchmark':<36}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'ops/s':>12}")
+
+    # ----- data loading -----
+    def clear_store():
+        if store is not None:
+            store.clear()
+        loader.get_indicator_engine().clear()
+
+    results["load_stocks.cold"] = measure(
+        "load_stocks (cold store)", lambda: loader.load_stocks(tickers, start_1y), n(10), setup=clear_store
+    )
+    results["load_stocks.warm"] = measure(
+        "load_stocks (warm store)", lambda: loader.load_stocks(tickers, start_1y), n(50)
+    )
+    results["load_latest.warm"] = measure(
+        "load_latest (warm store)", lambda: loader.load_latest(tickers, start_1y), n(200)
+    )
+
+    raw = loader.load_bars([tickers[0]], start_all)[tickers[0]]
+    results["compute_indicators"] = measure(
+        f"compute_indicators ({len(raw)} bars)", lambda: indicators.compute_indicators(raw.copy()), n(50)
+    )
+
+    if args.interval != "1d":
+        iv = args.interval
+        columns = loader.get_column_store()
+        results[f"load_bars.{iv}.cold"] = measure(
+            f"load_bars {iv} (cold store)",
+            lambda: loader.load_bars(tickers, start_1y, interval=iv),
+            n(5),
+            setup=lambda: columns.clear(interval=iv),
+        )
+        results[f"load_bars.{iv}.warm"] = measure(
+            f"load_bars {iv} (warm store)", lambda: loader.load_bars(tickers, start_1y, interval=iv), n(50)
+        )
+        results[f"load_stocks.{iv}.warm"] = measure(
+            f"load_stocks {iv} (warm store)", lambda: loader.load_stocks(tickers, start_1y, interval=iv), n(5)
+        )
+
+    # ----- training -----
+    train_data = loader.load_stocks(tickers, start_all)
+    one = {tickers[0]: train_data[tickers[0]]}
+    results["save_models.one_ticker"] = measure(
+        "save_models (1 ticker)", lambda: train_models.save_models(one), n(5), warmup=0
+    )
+    with contextlib.redirect_stdout(io.StringIO()):
+        train_models.save_models(train_data)
+
+    # ----- prediction -----
+    ticker = tickers[0]
+    results["get_prediction.uncached"] = measure(
+        "get_prediction (cache cold)",
+        lambda: api_server.get_prediction(ticker),
+        n(100),
+        setup=lambda: api_server.prediction_cache.invalidate([ticker]),
+    )
+    results["get_prediction.cached"] = measure(
+        "get_prediction (cache warm)", lambda: api_server.get_prediction(ticker), n(2000)
+    )
+
+    # ----- endpoints -----
+    client = ASGIClient(api_server.app)
+    for t in tickers:
+        api_server.tracked_stocks[t] = {"company_name": t, "price": 0, "prediction": -1}
+
+    def get_ok(path, **kwargs):
+        def call():
+            r = client.get(path, **kwargs)
+            assert r.status_code == 200, (path, r.status_code, r.content[:200])
+        return call
+
+    results["GET /api/stocks/{ticker}"] = measure(
+        "GET /api/stocks/{ticker}", get_ok(f"/api/stocks/{ticker}"), n(200)
+    )
+    results["GET /api/stocks/{ticker}/history?period=1y"] = measure(
+        "GET history 1y (rows)", get_ok(f"/api/stocks/{ticker}/history", params={"period": "1y"}), n(100)
+    )
+    results["GET /api/stocks/{ticker}/history?period=1y&format=columns"] = measure(
+        "GET history 1y (columns)",
+        get_ok(f"/api/stocks/{ticker}/history", params={"period": "1y", "format": "columns"}),
+        n(100),
+    )
+    if args.interval != "1d":
+        results[f"GET /api/stocks/{{ticker}}/history?interval={args.interval}&max_points=2000"] = measure(
+            f"GET history 1y {args.interval} (2000 pts)",
+            get_ok(f"/api/stocks/{ticker}/history",
+                   params={"period": "1y", "interval": args.interval, "format": "columns", "max_points": 2000}),
+            n(50),
+        )
+    results["GET /api/predictions"] = measure(
+        f"GET /api/predictions ({len(tickers)} tickers)",
+        get_ok("/api/predictions", params={"tickers": ",".join(tickers)}),
+        n(50),
+    )
+    results["GET /api/stocks/{ticker}/risk"] = measure(
+        "GET /api/stocks/{ticker}/risk",
+        get_ok(f"/api/stocks/{ticker}/risk", params={"entry_price": 100}),
+        n(200),
+    )
+    risk_body = {"positions": [{"ticker": t, "entry_price": 100, "shares": 10} for t in tickers]}
+
+    def post_risk():
+        r = client.post("/api/risk", json_body=risk_body)
+        assert r.status_code == 200, r.content[:200]
+
+    results["POST /api/risk"] = measure(f"POST /api/risk ({len(tickers)} positions)", post_risk, n(100))
+    screener_panel = api_server.screener_panel
+    universe = len(screener_panel.universe_fn())
+    results["screener.rebuild"] = measure(
+        f"screener rebuild ({universe} tickers)", lambda: screener_panel.refresh(force_rebuild=True), n(5)
+    )
+    results["GET /api/screener"] = measure(
+        f"GET /api/screener ({universe} tickers)",
+        get_ok("/api/screener", params={"filter": "rsi < 70 and close > sma", "rank": "change(close, 20)"}),
+        n(200),
+    )
+
+    def refresh():
+        r = client.put("/api/stocks/refresh")
+        assert r.status_code == 200, r.content[:200]
+
+    results["PUT /api/stocks/refresh"] = measure(
+        f"PUT /api/stocks/refresh ({len(tickers)} tickers)", refresh, n(20)
+    )
+    client.close()
+
+    return {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "config": {
+                "tickers": args.tickers,
+                "years": args.years,
+                "interval": args.interval,
+                "quick": args.quick,
+            },
+        },
+        "results": results,
+    }
+
+
+def compare(current, baseline_path):
+    with open(baseline_path) as fh:
+        baseline = json.load(fh)
+    print(f"\nvs {baseline_path} (commit {baseline['meta'].get('commit')}), p50:")
+    if baseline["meta"].get("config") != current["meta"]["config"]:
+        print(f"  WARNING: config differs ({baseline['meta'].get('config')}), numbers are not comparable")
+    for name, res in current["results"].items():
+        old = baseline["results"].get(name)
+        if not old or not old.get("p50_ms"):
+            print(f"  {name:<58} new")
+            continue
+        change = (res["p50_ms"] - old["p50_ms"]) / old["p50_ms"] * 100
+        print(f"  {name:<58}{old['p50_ms']:>10.3f} -> {res['p50_ms']:<10.3f}{change:+7.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline backend benchmarks on synthetic data")
+    parser.add_argument("--tickers", type=int, default=10, help="number of synthetic tickers")
+    parser.add_argument("--years", type=float, default=3, help="years of history per ticker")
+    parser.add_argument("--interval", default="1d", choices=["1d", "1m", "5m", "15m", "30m", "1h"],
+                        help="also benchmark intraday loading and history at this bar interval")
+    parser.add_argument("--quick", action="store_true", help="run ~5x fewer iterations")
+    parser.add_argument("--output", default=None, help="where to write the JSON results")
+    parser.add_argument("--compare", default=None, help="earlier results JSON to diff against")
+    args = parser.parse_args()
+
+    report = run(args)
+
+    output = args.output
+    if output is None:
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        output = os.path.join(
+            REPO_DIR, "results", "benchmarks", f"bench-{report['meta']['commit'] or 'nogit'}-{stamp}.json"
+        )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as fh:
+        json.dump(report, fh, indent=2)
+    print(f"\nwrote {output}")
+
+    if args.compare:
+        compare(report, args.compare)
+
+
+if __name__ == "__main__":
+    main()
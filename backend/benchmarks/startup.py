@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+# benchmarks/startup.py
+"""
+Cold-start benchmark for the API server.
+
+Every run uses a fresh interpreter (in its own throwaway data directory),
+so nothing is already imported or cached:
+
+    interpreter   python -c pass, the floor everything else sits on
+    import        `import api_server`, and which heavy libraries it pulled in
+    ready         spawn uvicorn -> first 200 from GET /api/stocks
+
+    cd backend
+    python benchmarks/startup.py              # 5 runs of each
+    python benchmarks/startup.py --runs 10 --output startup.json
+"""
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from datetime import datetime
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from benchmarks.run_benchmarks import _git_commit, _percentile  # noqa: E402
+
+HEAVY_MODULES = ("yfinance", "ta", "joblib", "sklearn", "xgboost", "train_models", "pandas")
+
+_IMPORT_PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import api_server
+elapsed = time.perf_counter() - started
+print(json.dumps({"seconds": elapsed, "loaded": [m for m in %r if m in sys.modules]}))
+""" % (HEAVY_MODULES,)
+
+
+def _env(workdir):
+    env = dict(os.environ)
+    env.update({
+        "AUGUR_BAR_STORE": os.path.join(workdir, "data", "bars"),
+        "AUGUR_MODEL_DIR": os.path.join(workdir, "models"),
+        "AUGUR_DB_PATH": os.path.join(workdir, "startup.db"),
+    })
+    return env
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def time_interpreter():
+    started = time.perf_counter()
+    subprocess.run([sys.executable, "-c", "pass"], check=True)
+    return time.perf_counter() - started
+
+
+def time_import(workdir):
+    out = subprocess.run(
+        [sys.executable, "-c", _IMPORT_PROBE],
+        cwd=BACKEND_DIR, env=_env(workdir), check=True, capture_output=True, text=True,
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def time_ready(workdir, timeout=60.0):
+    """Seconds from spawning uvicorn until GET /api/stocks answers 200."""
+    port = _free_port()
+    started = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "api_server:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=_env(workdir), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            if proc.poll() is not None:
+                raise RuntimeError(f"server exited with code {proc.returncode}")
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/api/stocks", timeout=1) as resp:
+                    if resp.status == 200:
+                        return time.perf_counter() - started
+            except OSError:
+                time.sleep(0.01)
+        raise RuntimeError(f"server not ready after {timeout}s")
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+
+
+def _summary(seconds):
+    seconds = sorted(seconds)
+    return {
+        "runs": len(seconds),
+        "p50_ms": round(_percentile(seconds, 0.50) * 1000, 1),
+        "min_ms": round(seconds[0] * 1000, 1),
+        "max_ms": round(seconds[-1] * 1000, 1),
+    }
+
+
+def run(runs):
+    timings = {"interpreter": [], "import": [], "ready": []}
+    loaded = set()
+    for _ in range(runs):
+        workdir = tempfile.mkdtemp(prefix="augur-startup-")
+        timings["interpreter"].append(time_interpreter())
+        probe = time_import(workdir)
+        timings["import"].append(probe["seconds"])
+        loaded.update(probe["loaded"])
+        timings["ready"].append(time_ready(workdir))
+
+    results = {name: _summary(values) for name, values in timings.items()}
+    print(f"{'':<14}{'p50 ms':>10}{'min ms':>10}{'max ms':>10}")
+    for name, res in results.items():
+        print(f"{name:<14}{res['p50_ms']:>10.1f}{res['min_ms']:>10.1f}{res['max_ms']:>10.1f}")
+    print(f"heavy modules loaded by `import api_server`: {', '.join(sorted(loaded)) or 'none'}")
+    return {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": sys.version.split()[0],
+        },
+        "results": results,
+        "import_loaded": sorted(loaded),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure API server import and ready times")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--output", default=None, help="write the results as JSON here")
+    args = parser.parse_args()
+
+    report = run(args.runs)
+    if args.output:
+        with open(args.output, "w") as fh:
+            json.dump(report, fh, indent=2)
+        print(f"\nwrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+# benchmarks/synthetic.py
+"""
+Deterministic synthetic market data for offline benchmarks.
+
+SyntheticMarket generates OHLCV bars as a geometric random walk seeded per
+ticker, so every run (and every commit) sees exactly the same prices.
+install() routes all market data in the backend to it: the loader gets a
+SyntheticProvider and the `yf` module behind providers._yfinance() (used
+by providers.py, quotes.py and api_server.py) is replaced by FakeYFinance
+(download + Ticker.info/.history).
+"""
+import zlib
+
+import numpy as np
+import pandas as pd
+
+
+_INTRADAY_FREQ = {"1m": "1min", "5m": "5min", "15m": "15min", "30m": "30min", "1h": "60min"}
+
+_PERIOD_DAYS = {
+    "1d": 1, "5d": 5, "1mo": 31, "3mo": 92, "6mo": 183,
+    "1y": 365, "2y": 730, "5y": 1826, "10y": 3652, "ytd": 365, "max": 36500,
+}
+
+
+class SyntheticMarket:
+    def __init__(self, years=3, interval="1d", end=None, drift=0.0003, vol=0.015, seed=7):
+        self.years = years
+        self.interval = interval
+        self.end = pd.Timestamp(end or pd.Timestamp.today().normalize())
+        self.drift = drift
+        self.vol = vol
+        self.seed = seed
+        self._cache = {}
+        self._siblings = {interval: self}
+
+    def at(self, interval):
+        """The same market (same seed and dates) sampled at another bar size."""
+        if interval not in self._siblings:
+            sibling = SyntheticMarket(self.years, interval, self.end, self.drift, self.vol, self.seed)
+            sibling._siblings = self._siblings
+            self._siblings[interval] = sibling
+        return self._siblings[interval]
+
+    def _index(self):
+        start = self.end - pd.Timedelta(days=int(365.25 * self.years))
+        days = pd.bdate_range(start, self.end - pd.Timedelta(days=1))
+        if self.interval == "1d":
+            return pd.DatetimeIndex(days, name="Date")
+        freq = _INTRADAY_FREQ[self.interval]
+        session = pd.timedelta_range("09:30:00", "15:59:00", freq=freq)
+        stamps = (days.values[:, None] + session.values[None, :]).ravel()
+        return pd.DatetimeIndex(stamps, name="Date")
+
+    def bars(self, ticker):
+        """Full OHLCV history for ticker (cached per instance)."""
+        if ticker in self._cache:
+            return self._cache[ticker]
+        rng = np.random.default_rng([self.seed, zlib.crc32(ticker.encode())])
+        index = self._index()
+        n = len(index)
+        start_price = 20 + (zlib.crc32(ticker.encode()) % 480)
+
+        # drift and vol are per trading day; scale them down to the bar size
+        frac = 1.0 if self.interval == "1d" else pd.Timedelta(_INTRADAY_FREQ[self.interval]) / pd.Timedelta("390min")
+        drift, vol = self.drift * frac, self.vol * np.sqrt(frac)
+        log_ret = rng.normal(drift, vol, n)
+        close = start_price * np.exp(np.cumsum(log_ret))
+        open_ = np.concatenate([[start_price], close[:-1]]) * np.exp(rng.normal(0, vol / 4, n))
+        spread = np.abs(rng.normal(0, vol / 2, n))
+        high = np.maximum(open_, close) * (1 + spread)
+        low = np.minimum(open_, close) * (1 - spread)
+        volume = rng.integers(500_000, 20_000_000, n).astype(float)
+
+        df = pd.DataFrame(
+            {"Open": open_, "High": high, "Low": low, "Close": close, "Adj Close": close, "Volume": volume},
+            index=index,
+        )
+        self._cache[ticker] = df
+        return df
+
+    def window(self, ticker, start=None, end=None):
+        df = self.bars(ticker)
+        if start is not None:
+            df = df[df.index >= pd.Timestamp(start)]
+        if end is not None:
+            df = df[df.index < pd.Timestamp(end)]
+        return df
+
+
+class SyntheticProvider:
+    """loader provider backed by a SyntheticMarket."""
+
+    name = "synthetic"
+
+    def __init__(self, market):
+        self.market = market
+
+    def fetch(self, tickers, start, end, interval="1d"):
+        result = {}
+        for ticker in tickers:
+            df = self.market.at(interval).window(ticker, start, end)
+            if not df.empty:
+                result[ticker] = df.copy()
+        return result
+
+    def latest_prices(self, tickers):
+        return {t: round(float(self.market.bars(t)["Close"].iloc[-1]), 2) for t in tickers}
+
+
+class _FakeTicker:
+    def __init__(self, market, ticker):
+        self._market = market
+        self.ticker = ticker
+
+    @property
+    def info(self):
+        close = float(self._market.bars(self.ticker)["Close"].iloc[-1])
+        return {
+            "symbol": self.ticker,
+            "currentPrice": close,
+            "regularMarketPrice": close,
+            "longName": f"{self.ticker} Synthetic Inc.",
+            "shortName": self.ticker,
+        }
+
+    def history(self, period="1mo", interval="1d", start=None, end=None, **kwargs):
+        if start is None:
+            start = self._market.end - pd.Timedelta(days=_PERIOD_DAYS.get(period, 31))
+        df = self._market.window(self.ticker, start, end)
+        df = df.drop(columns=["Adj Close"]).copy()
+        df.index = df.index.tz_localize("America/New_York")
+        return df
+
+
+class FakeYFinance:
+    """Stands in for the yfinance module: download() and Ticker()."""
+
+    def __init__(self, market):
+        self.market = market
+
+    def Ticker(self, ticker):
+        return _FakeTicker(self.market, ticker.upper())
+
+    def download(self, tickers, start=None, end=None, period=None, interval="1d",
+                 group_by="column", **kwargs):
+        if isinstance(tickers, str):
+            tickers = tickers.replace(",", " ").split()
+        if period is not None and start is None:
+            start = self.market.end - pd.Timedelta(days=_PERIOD_DAYS.get(period, 31))
+        frames = {t: self.market.at(interval).window(t, start, end) for t in tickers}
+        frames = {t: df for t, df in frames.items() if not df.empty}
+        if not frames:
+            return pd.DataFrame()
+        if group_by == "ticker":
+            return pd.concat(frames, axis=1)
+        return pd.concat(frames, axis=1).swaplevel(0, 1, axis=1)
+
+
+def install(market):
+    """
+    Route the backend's market data to `market`: set the loader provider and
+    replace the `yf` attribute of providers.py, which every yfinance caller
+    goes through.
+    """
+    import loader
+    import providers
+    import quotes
+
+    fake = FakeYFinance(market)
+    loader.set_provider(SyntheticProvider(market))
+    providers.yf = fake
+    quotes.quote_cache.invalidate()
+    return fake
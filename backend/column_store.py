@@ -0,0 +1,285 @@
+# column_store.py
+"""
+Memory-mapped columnar cache of intraday bars, one directory per ticker and
+interval:
+
+    <root>/<interval>/<TICKER>/ts.i64         bar timestamps, int64 ns, ascending
+                               open.f32 ... adj_close.f32, volume.f64
+                               meta.json      {"rows": n, "coverage": [start_ns, end_ns]}
+
+A year of 1m bars is ~100k rows per ticker, so instead of loading whole
+DataFrames, readers np.memmap the files read-only and slice them by time
+with searchsorted. frame() wraps such a slice in a DataFrame without
+copying it: the bytes stay in the page cache, shared by every reader and
+worker, rather than in each process' heap.
+
+Writes are append-only. New bars are written past the end of every column
+file, then meta.json is replaced atomically. Readers only trust its row
+count, so a half-written append is never seen and is overwritten by the
+next one. The one exception is a last bar at or after the coverage end
+(the session still forming): the next append may replace it in place, so
+frame() copies a slice that includes it instead of handing out a view.
+Bars older than the stored ones (a backfill) are rare; the ticker's files
+are then rewritten and swapped in as a new directory.
+
+Writers hold lock(ticker, interval), which also takes an flock on
+<root>/<interval>/.<TICKER>.lock, so server workers sharing the directory
+never write the same ticker at once.
+"""
+import fcntl
+import json
+import os
+import shutil
+import threading
+
+import numpy as np
+import pandas as pd
+
+from providers import OHLCV_COLUMNS
+
+
+baseDir = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_COLUMN_DIR = os.path.join(baseDir, "data", "columns")
+
+# column -> (file name, dtype); prices are float32, plenty for quotes in cents
+_FILES = {
+    'Open': ("open.f32", np.float32),
+    'High': ("high.f32", np.float32),
+    'Low': ("low.f32", np.float32),
+    'Close': ("close.f32", np.float32),
+    'Adj Close': ("adj_close.f32", np.float32),
+    'Volume': ("volume.f64", np.float64),
+}
+_TS_FILE = "ts.i64"
+
+
+class ColumnStore:
+    def __init__(self, root=DEFAULT_COLUMN_DIR):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+        # (ticker, interval) -> (meta mtime_ns, rows, coverage, {column: memmap})
+        self._memo = {}
+        self.appended_rows = 0
+        self.rewrites = 0
+
+    def _dir(self, ticker, interval):
+        return os.path.join(self.root, interval, ticker)
+
+    def lock(self, ticker, interval):
+        """
+        Per-(ticker, interval) lock, across threads and processes, so two
+        requests don't sync the same bars at once. Hold it around append().
+        """
+        key = (ticker, interval)
+        with self._locks_guard:
+            if key not in self._locks:
+                folder = os.path.join(self.root, interval)
+                self._locks[key] = _FileLock(os.path.join(folder, f".{ticker}.lock"))
+            return self._locks[key]
+
+    # ----- reads -----
+    def _open(self, ticker, interval):
+        """(rows, coverage, {column: read-only memmap}) or None if nothing is stored."""
+        meta_path = os.path.join(self._dir(ticker, interval), "meta.json")
+        try:
+            mtime = os.stat(meta_path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+        key = (ticker, interval)
+        memo = self._memo.get(key)
+        if memo is not None and memo[0] == mtime:
+            return memo[1:]
+        try:
+            with open(meta_path) as fh:
+                meta = json.load(fh)
+            rows = int(meta["rows"])
+            coverage = (pd.Timestamp(meta["coverage"][0]), pd.Timestamp(meta["coverage"][1]))
+            arrays = {}
+            if rows:
+                folder = self._dir(ticker, interval)
+                arrays["ts"] = np.memmap(os.path.join(folder, _TS_FILE), dtype=np.int64, mode="r", shape=(rows,))
+                for col, (name, dtype) in _FILES.items():
+                    arrays[col] = np.memmap(os.path.join(folder, name), dtype=dtype, mode="r", shape=(rows,))
+        except Exception as e:
+            print(f"[column_store] ignoring unreadable cache for {ticker} {interval}: {e}")
+            return None
+        self._memo[key] = (mtime, rows, coverage, arrays)
+        return rows, coverage, arrays
+
+    def coverage(self, ticker, interval):
+        """(start, end) Timestamps already fetched for ticker, or None."""
+        opened = self._open(ticker, interval)
+        return opened[1] if opened else None
+
+    def frame(self, ticker, interval, start=None, end=None):
+        """
+        Bars with start <= time < end as a DataFrame whose columns and index
+        are views of the mapped files (no copy), or None if nothing is
+        stored. A slice that includes a last bar an append may still
+        replace is copied. The frame is read-only; add columns freely, but
+        do not assign into the OHLCV ones.
+        """
+        opened = self._open(ticker, interval)
+        if opened is None:
+            return None
+        rows, coverage, arrays = opened
+        if not rows:
+            return _empty_frame()
+        ts = arrays["ts"]
+        lo = int(np.searchsorted(ts, pd.Timestamp(start).value, side="left")) if start is not None else 0
+        hi = int(np.searchsorted(ts, pd.Timestamp(end).value, side="left")) if end is not None else rows
+        # views of bytes append() may overwrite would change under the caller
+        copy = hi == rows and _replaceable(int(ts[-1]), coverage)
+        take = np.array if copy else np.asarray
+        index = pd.DatetimeIndex(take(ts[lo:hi]).view("datetime64[ns]"), name='Date', copy=False)
+        return pd.DataFrame(
+            {col: take(arrays[col][lo:hi]) for col in OHLCV_COLUMNS}, index=index, copy=False
+        )
+
+    # ----- writes -----
+    def append(self, ticker, interval, df, coverage):
+        """
+        Store the bars of df (a normalize_ohlcv frame) and record coverage;
+        the caller holds lock(ticker, interval).
+        Bars after the last stored one are appended; a bar at the same time
+        as the last one replaces it if it is at or after the stored coverage
+        end (still forming, see frame()) and is dropped otherwise. Bars
+        before the first stored one trigger a full rewrite.
+        """
+        opened = self._open(ticker, interval)
+        rows, stored, arrays = opened if opened else (0, None, {})
+        ts = df.index.values.astype('datetime64[ns]').astype(np.int64)
+
+        if rows and len(ts) and ts[0] < arrays["ts"][0]:
+            merged = pd.concat([self.frame(ticker, interval), df])
+            merged = merged[~merged.index.duplicated(keep='last')].sort_index()
+            self._rewrite(ticker, interval, merged, coverage)
+            return
+
+        pos = rows
+        if rows and len(ts):
+            last = int(arrays["ts"][-1])
+            keep = ts >= last if _replaceable(last, stored) else ts > last
+            df, ts = df[keep], ts[keep]
+            if len(ts) and ts[0] == last:
+                pos = rows - 1
+
+        folder = self._dir(ticker, interval)
+        os.makedirs(folder, exist_ok=True)
+        if len(ts):
+            _write_at(os.path.join(folder, _TS_FILE), pos, ts)
+            for col, (name, dtype) in _FILES.items():
+                _write_at(os.path.join(folder, name), pos, df[col].to_numpy(dtype=dtype))
+        self.appended_rows += pos + len(ts) - rows
+        _write_meta(folder, pos + len(ts), coverage)
+
+    def _rewrite(self, ticker, interval, df, coverage):
+        final = self._dir(ticker, interval)
+        tmp = f"{final}.tmp-{os.getpid()}"
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+        _write_at(os.path.join(tmp, _TS_FILE), 0, df.index.values.astype('datetime64[ns]').astype(np.int64))
+        for col, (name, dtype) in _FILES.items():
+            _write_at(os.path.join(tmp, name), 0, df[col].to_numpy(dtype=dtype))
+        _write_meta(tmp, len(df), coverage)
+
+        # swap directories; open maps keep the old files alive until dropped
+        old = f"{final}.old-{os.getpid()}"
+        if os.path.exists(final):
+            os.replace(final, old)
+        os.replace(tmp, final)
+        shutil.rmtree(old, ignore_errors=True)
+        self._memo.pop((ticker, interval), None)
+        self.rewrites += 1
+
+    def clear(self, ticker=None, interval=None):
+        intervals = [interval] if interval else [
+            name for name in os.listdir(self.root) if os.path.isdir(os.path.join(self.root, name))
+        ]
+        for iv in intervals:
+            folder = os.path.join(self.root, iv)
+            tickers = [ticker] if ticker else (
+                [name for name in os.listdir(folder) if not name.startswith(".")] if os.path.isdir(folder) else []
+            )
+            for t in tickers:
+                self._memo.pop((t, iv), None)
+                shutil.rmtree(os.path.join(folder, t), ignore_errors=True)
+
+    def stats(self):
+        return {
+            "root": self.root,
+            "mapped": len(self._memo),
+            "appended_rows": self.appended_rows,
+            "rewrites": self.rewrites,
+        }
+
+
+class _FileLock:
+    """A threading.Lock plus an exclusive flock on path, for other processes."""
+
+    def __init__(self, path):
+        self.path = path
+        self._thread_lock = threading.Lock()
+        self._fh = None
+
+    def acquire(self):
+        self._thread_lock.acquire()
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            fh = open(self.path, "a")
+        except BaseException:
+            self._thread_lock.release()
+            raise
+        try:
+            fcntl.flock(fh, fcntl.LOCK_EX)
+        except BaseException:
+            fh.close()
+            self._thread_lock.release()
+            raise
+        self._fh = fh
+
+    def release(self):
+        fh, self._fh = self._fh, None
+        try:
+            fcntl.flock(fh, fcntl.LOCK_UN)
+            fh.close()
+        finally:
+            self._thread_lock.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+def _replaceable(last_ns, coverage):
+    """Whether an append may still overwrite a last bar at last_ns in place."""
+    return last_ns >= coverage[1].value
+
+
+def _empty_frame():
+    return pd.DataFrame(
+        {col: np.empty(0, dtype=_FILES[col][1]) for col in OHLCV_COLUMNS},
+        index=pd.DatetimeIndex([], dtype='datetime64[ns]', name='Date'),
+    )
+
+
+def _write_at(path, pos, values):
+    """Write values starting at element pos and cut off anything after them."""
+    values = np.ascontiguousarray(values)
+    with open(path, "r+b" if os.path.exists(path) else "w+b") as fh:
+        fh.seek(pos * values.itemsize)
+        fh.write(values.tobytes())
+        fh.truncate()
+
+
+def _write_meta(folder, rows, coverage):
+    path = os.path.join(folder, "meta.json")
+    tmp = f"{path}.tmp-{os.getpid()}"
+    with open(tmp, "w") as fh:
+        json.dump({"rows": rows, "coverage": [coverage[0].value, coverage[1].value]}, fh)
+    os.replace(tmp, path)
@@ -0,0 +1,350 @@
+# compiled_model.py
+"""
+Compact, memory-mappable inference format for the trained ensembles.
+
+A pickled VotingClassifier (LogisticRegression + RandomForest + XGBoost)
+is slow to unpickle and holds every sklearn/xgboost object in memory.
+export() flattens it into a models/<TICKER>_compiled/ directory:
+
+    meta.json            features, classes, voters, XGBoost base score, ...
+    lr_coef.npy          linear weights + intercept
+    rf_*.npy, xgb_*.npy  all trees of a forest concatenated into flat node
+                         arrays (feature, threshold, left, right, leaf value)
+
+CompiledModel opens the .npy files with mmap_mode='r'. The OS keeps one
+copy of the pages however many worker processes load the same model.
+Its predict() walks every tree of a forest at once, one numpy step per
+tree level. It reproduces each estimator's own decision rule (float32
+features for trees, `<=` for sklearn and `<` for XGBoost splits, XGBoost's
+float32 margin and sigmoid, tree-order probability sums), so the hard vote
+matches the pickled model. export() checks that on the data it is given
+and refuses to write a compiled model that disagrees.
+
+    python compiled_model.py AAPL MSFT     # export existing pickles
+    python compiled_model.py --all
+"""
+import argparse
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+
+
+FORMAT_VERSION = 1
+
+
+# -----------------------------------------------------------
+# FLATTENING
+# -----------------------------------------------------------
+def _flatten_sklearn_trees(trees):
+    """Concatenate sklearn tree_ structures; leaves point to themselves."""
+    features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+    depth, offset = 0, 0
+    for tree in trees:
+        t = tree.tree_
+        n = t.node_count
+        leaf = t.children_left == -1
+        own = np.arange(n, dtype=np.int32) + offset
+        features.append(np.where(leaf, 0, t.feature).astype(np.int32))
+        thresholds.append(t.threshold.astype(np.float64))
+        lefts.append(np.where(leaf, own, t.children_left + offset).astype(np.int32))
+        rights.append(np.where(leaf, own, t.children_right + offset).astype(np.int32))
+        values.append(t.value[:, 0, :].astype(np.float64))
+        roots.append(offset)
+        depth = max(depth, t.max_depth)
+        offset += n
+    return {
+        'feature': np.concatenate(features),
+        'threshold': np.concatenate(thresholds),
+        'left': np.concatenate(lefts),
+        'right': np.concatenate(rights),
+        'value': np.concatenate(values),
+        'roots': np.asarray(roots, dtype=np.int32),
+    }, depth
+
+
+def _flatten_xgb(xgb):
+    """Flatten an XGBClassifier (binary:logistic) booster from its JSON model."""
+    booster = xgb.get_booster()
+    model = json.loads(booster.save_raw('json'))['learner']
+    objective = model['objective']['name']
+    if objective != 'binary:logistic':
+        raise ValueError(f"unsupported XGBoost objective {objective}")
+    base_score = float(model['learner_model_param']['base_score'].strip('[]'))
+
+    trees = model['gradient_booster']['model']['trees']
+    try:
+        # predict() only uses the trees up to the best round when early stopping ran
+        trees = trees[:xgb.best_iteration + 1]
+    except AttributeError:
+        pass
+
+    features, thresholds, lefts, rights, missing, roots = [], [], [], [], [], []
+    depth, offset = 0, 0
+    for tree in trees:
+        left = np.asarray(tree['left_children'], dtype=np.int64)
+        right = np.asarray(tree['right_children'], dtype=np.int64)
+        default_left = np.asarray(tree['default_left'], dtype=bool)
+        n = len(left)
+        leaf = left == -1
+        own = np.arange(n) + offset
+        features.append(np.where(leaf, 0, tree['split_indices']).astype(np.int32))
+        # leaves keep their value in split_conditions
+        thresholds.append(np.asarray(tree['split_conditions'], dtype=np.float32))
+        lefts.append(np.where(leaf, own, left + offset).astype(np.int32))
+        rights.append(np.where(leaf, own, right + offset).astype(np.int32))
+        missing.append(np.where(leaf, own, np.where(default_left, left, right) + offset).astype(np.int32))
+        roots.append(offset)
+        depth = max(depth, _xgb_depth(left, right))
+        offset += n
+    return {
+        'feature': np.concatenate(features),
+        'threshold': np.concatenate(thresholds),
+        'left': np.concatenate(lefts),
+        'right': np.concatenate(rights),
+        'missing': np.concatenate(missing),
+        'roots': np.asarray(roots, dtype=np.int32),
+    }, depth, base_score
+
+
+def _xgb_depth(left, right):
+    depth, level = 0, [0]
+    while True:
+        level = [c for node in level for c in (left[node], right[node]) if c != -1]
+        if not level:
+            return depth
+        depth += 1
+
+
+def compile_estimator(model, features):
+    """Return (meta, arrays) for a fitted VotingClassifier or XGBClassifier."""
+    from sklearn.ensemble import VotingClassifier, RandomForestClassifier
+    from sklearn.linear_model import LogisticRegression
+    from xgboost import XGBClassifier
+
+    if isinstance(model, VotingClassifier):
+        if model.voting != 'hard':
+            raise ValueError("only hard voting is supported")
+        named = list(zip([name for name, _ in model.estimators], model.estimators_))
+        classes = model.classes_
+    else:
+        named = [('xgb', model)]
+        classes = model.classes_
+
+    meta = {
+        'format': FORMAT_VERSION,
+        'features': list(features),
+        'classes': np.asarray(classes).tolist(),
+        'voters': [],
+    }
+    arrays = {}
+    for name, est in named:
+        if isinstance(est, LogisticRegression):
+            arrays[f'{name}_coef'] = np.concatenate([est.coef_.ravel(), est.intercept_]).astype(np.float64)
+            meta['voters'].append({'name': name, 'kind': 'linear'})
+        elif isinstance(est, RandomForestClassifier):
+            flat, depth = _flatten_sklearn_trees(est.estimators_)
+            arrays.update({f'{name}_{k}': v for k, v in flat.items()})
+            meta['voters'].append({'name': name, 'kind': 'forest', 'depth': int(depth)})
+        elif isinstance(est, XGBClassifier):
+            flat, depth, base_score = _flatten_xgb(est)
+            arrays.update({f'{name}_{k}': v for k, v in flat.items()})
+            meta['voters'].append({'name': name, 'kind': 'xgb', 'depth': int(depth), 'base_score': base_score})
+        else:
+            raise ValueError(f"cannot compile {type(est).__name__}")
+    return meta, arrays
+
+
+# -----------------------------------------------------------
+# INFERENCE
+# -----------------------------------------------------------
+def _walk(X, a, depth, strict):
+    """Leaf node index for every (row, tree); leaves point to themselves."""
+    rows = np.arange(X.shape[0])[:, None]
+    node = np.broadcast_to(a['roots'], (X.shape[0], len(a['roots']))).copy()
+    for _ in range(depth):
+        x = X[rows, a['feature'][node]]
+        threshold = a['threshold'][node]
+        go_left = x < threshold if strict else x <= threshold
+        nxt = np.where(go_left, a['left'][node], a['right'][node])
+        if 'missing' in a:
+            nxt = np.where(np.isnan(x), a['missing'][node], nxt)
+        node = nxt
+    return node
+
+
+class CompiledModel:
+    def __init__(self, path, mmap=True):
+        self.path = path
+        with open(os.path.join(path, 'meta.json')) as fh:
+            self.meta = json.load(fh)
+        if self.meta.get('format') != FORMAT_VERSION:
+            raise ValueError(f"unsupported compiled model format {self.meta.get('format')}")
+        self.features = self.meta['features']
+        self.classes_ = np.asarray(self.meta['classes'])
+        self._arrays = {}
+        self.nbytes = 0
+        for name in os.listdir(path):
+            if name.endswith('.npy'):
+                self._arrays[name[:-4]] = np.load(os.path.join(path, name), mmap_mode='r' if mmap else None)
+                self.nbytes += os.path.getsize(os.path.join(path, name))
+        self._groups = {v['name']: self._group(v['name']) for v in self.meta['voters']}
+
+    def _group(self, name):
+        prefix = name + '_'
+        return {k[len(prefix):]: v for k, v in self._arrays.items() if k.startswith(prefix)}
+
+    def _vote(self, voter, X):
+        """0/1 index into classes_ for every row, as the original estimator decides it."""
+        a = self._groups[voter['name']]
+        if voter['kind'] == 'linear':
+            coef = np.asarray(a['coef'])
+            scores = (X @ coef[:-1].reshape(-1, 1)).reshape(-1) + coef[-1]
+            return (scores > 0).astype(np.int64)
+
+        X32 = X.astype(np.float32)
+        leaves = _walk(X32, a, voter['depth'], strict=voter['kind'] == 'xgb')
+        if voter['kind'] == 'forest':
+            value = np.asarray(a['value'])
+            # sum tree by tree, like sklearn's accumulation, then average
+            proba = np.cumsum(value[leaves], axis=1)[:, -1, :] / leaves.shape[1]
+            return np.argmax(proba, axis=1)
+
+        margin = np.float32(-np.log(np.float32(1.0) / np.float32(voter['base_score']) - np.float32(1.0)))
+        leaf_values = np.asarray(a['threshold'])[leaves]
+        total = np.cumsum(
+            np.concatenate([np.full((X.shape[0], 1), margin, dtype=np.float32), leaf_values], axis=1),
+            axis=1, dtype=np.float32,
+        )[:, -1]
+        proba = np.float32(1.0) / (np.float32(1.0) + np.exp(-total, dtype=np.float32))
+        return (proba > 0.5).astype(np.int64)
+
+    def predict(self, X):
+        if hasattr(X, 'columns'):
+            X = X[self.features].to_numpy(dtype=np.float64)
+        X = np.atleast_2d(np.asarray(X, dtype=np.float64))
+        votes = np.stack([self._vote(v, X) for v in self.meta['voters']], axis=1)
+        if votes.shape[1] == 1:
+            winner = votes[:, 0]
+        else:
+            # majority of the voters; ties go to the lower class like np.bincount().argmax()
+            winner = (votes.sum(axis=1) * 2 > votes.shape[1]).astype(np.int64)
+        return self.classes_[winner]
+
+
+# -----------------------------------------------------------
+# EXPORT / LOAD
+# -----------------------------------------------------------
+def compiled_path(model_dir, ticker):
+    return os.path.join(model_dir, f"{ticker}_compiled")
+
+
+def load(model_dir, ticker, model_file=None):
+    """
+    CompiledModel for ticker, or None if there is none or it was compiled
+    from a different pickle than model_file (the current one).
+    """
+    path = compiled_path(model_dir, ticker)
+    if not os.path.exists(os.path.join(path, 'meta.json')):
+        return None
+    try:
+        compiled = CompiledModel(path)
+    except Exception as e:
+        print(f"[compiled_model] ignoring unreadable compiled model for {ticker}: {e}")
+        return None
+    if model_file is not None:
+        try:
+            source = os.stat(model_file)
+        except FileNotFoundError:
+            return None
+        if compiled.meta.get('source_mtime_ns') != source.st_mtime_ns or \
+                compiled.meta.get('source_size') != source.st_size:
+            return None
+    return compiled
+
+
+def export(ticker, model, features, model_dir, model_file=None, X_check=None):
+    """
+    Write the compiled form of a fitted model next to its pickle. With
+    X_check, the compiled predictions are compared to model.predict and
+    nothing is written if any row differs. Returns the directory or None.
+    """
+    meta, arrays = compile_estimator(model, features)
+    if model_file is not None:
+        source = os.stat(model_file)
+        meta['source_mtime_ns'] = source.st_mtime_ns
+        meta['source_size'] = source.st_size
+    meta['exported_at'] = time.time()
+
+    final = compiled_path(model_dir, ticker)
+    tmp = f"{final}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    for name, arr in arrays.items():
+        np.save(os.path.join(tmp, f"{name}.npy"), np.ascontiguousarray(arr))
+    with open(os.path.join(tmp, 'meta.json'), 'w') as fh:
+        json.dump(meta, fh)
+
+    if X_check is not None and len(X_check):
+        expected = np.asarray(model.predict(X_check))
+        got = CompiledModel(tmp, mmap=False).predict(X_check)
+        mismatches = int(np.count_nonzero(expected != got))
+        if mismatches:
+            shutil.rmtree(tmp, ignore_errors=True)
+            print(f"[compiled_model] {ticker}: {mismatches}/{len(expected)} predictions differ, not exported")
+            return None
+
+    # swap directories; readers fall back to the pickle during the gap
+    old = f"{final}.old-{os.getpid()}"
+    if os.path.exists(final):
+        os.replace(final, old)
+    os.replace(tmp, final)
+    shutil.rmtree(old, ignore_errors=True)
+    return final
+
+
+def main():
+    import joblib
+    from train_models import modelDir
+
+    parser = argparse.ArgumentParser(description="Export pickled models to the compiled format")
+    parser.add_argument("tickers", nargs="*")
+    parser.add_argument("--all", action="store_true", help="export every *_model.pkl in the model dir")
+    parser.add_argument("--no-check", action="store_true", help="skip comparing against the pickle on recent bars")
+    args = parser.parse_args()
+
+    tickers = [t.upper() for t in args.tickers]
+    if args.all:
+        tickers = sorted(name[:-len("_model.pkl")] for name in os.listdir(modelDir) if name.endswith("_model.pkl"))
+    if not tickers:
+        parser.error("give tickers or --all")
+
+    check_data = {}
+    if not args.no_check:
+        from datetime import date, timedelta
+        from loader import load_stocks
+        start = (date.today() - timedelta(days=3 * 365)).strftime("%Y-%m-%d")
+        check_data = load_stocks(tickers, start)
+
+    for ticker in tickers:
+        model_file = os.path.join(modelDir, f"{ticker}_model.pkl")
+        features_file = os.path.join(modelDir, f"{ticker}_features.pkl")
+        if not os.path.exists(model_file) or not os.path.exists(features_file):
+            print(f"{ticker}: no model")
+            continue
+        model = joblib.load(model_file)
+        features = joblib.load(features_file)
+        df = check_data.get(ticker)
+        X_check = df[features] if df is not None else None
+        path = export(ticker, model, features, modelDir, model_file=model_file, X_check=X_check)
+        if path:
+            size = sum(os.path.getsize(os.path.join(path, n)) for n in os.listdir(path))
+            checked = f", checked on {len(X_check)} rows" if X_check is not None else ""
+            print(f"{ticker}: {os.path.getsize(model_file) / 1e6:.2f} MB pickle -> "
+                  f"{size / 1e6:.2f} MB compiled{checked}")
+
+
+if __name__ == "__main__":
+    main()
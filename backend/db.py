@@ -10,12 +10,14 @@ from sqlalchemy import (
     DateTime,
     create_engine,
     Boolean,
+    Text,
+    event,
 )
 from sqlalchemy.orm import declarative_base, sessionmaker
 
 # --- SQLite file in the backend folder ---
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-DB_PATH = os.path.join(BASE_DIR, "models_meta.db")
+DB_PATH = os.environ.get("AUGUR_DB_PATH", os.path.join(BASE_DIR, "models_meta.db"))
 DATABASE_URL = f"sqlite:///{DB_PATH}"
 
 engine = create_engine(
@@ -23,6 +25,20 @@ engine = create_engine(
     connect_args={"check_same_thread": False},  # needed for SQLite + FastAPI
 )
 
+
+
+@event.listens_for(engine, "connect")
+def _sqlite_pragmas(dbapi_connection, connection_record):
+    # WAL lets readers (other workers, the warmup thread) run during a write;
+    # NORMAL sync is durable across application crashes, which is all a
+    # cache of re-fetchable state needs
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA busy_timeout=5000")
+    cursor.close()
+
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
@@ -52,6 +68,144 @@ class TrainedModel(Base):
     is_active = Column(Boolean, default=True, nullable=False)
 
 
+class TrainingJob(Base):
+    """
+    One background training run for a single ticker (see jobs.py).
+    status: queued -> running -> succeeded | failed
+    """
+    __tablename__ = "training_jobs"
+
+    id = Column(String, primary_key=True)
+    ticker = Column(String, index=True, nullable=False)
+    status = Column(String, default="queued", nullable=False)
+    years_back = Column(Integer, default=3, nullable=False)
+
+    submitted_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    error = Column(String, nullable=True)
+
+
+class TrainingRun(Base):
+    """
+    One training decision for one ticker (see retrain.py): skipped because
+    its data did not change, an incremental update, or a full refit.
+    Runs started together share a batch_id.
+    """
+    __tablename__ = "training_runs"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    batch_id = Column(String, index=True, nullable=False)
+    ticker = Column(String, index=True, nullable=False)
+    mode = Column(String, nullable=False)           # skipped | incremental | full | failed
+    reason = Column(String, nullable=True)
+    fingerprint = Column(String, nullable=True)     # of the training rows
+    data_start = Column(String, nullable=True)      # "YYYY-MM-DD" the data was loaded from
+    last_bar = Column(String, nullable=True)        # "YYYY-MM-DD" of the newest row
+    rows = Column(Integer, nullable=True)
+    new_rows = Column(Integer, nullable=True)       # rows after the previous run's last_bar
+    pre_score = Column(Float, nullable=True)        # previous model's accuracy on the new rows
+    score = Column(Float, nullable=True)            # hold-out accuracy (full refits)
+    seconds = Column(Float, nullable=True)
+    started_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    error = Column(String, nullable=True)
+
+
+class ModelConfig(Base):
+    """
+    Hyperparameters chosen for a ticker's model by model_selection.py, with
+    the time-series CV scores they won on. train_models builds the ticker's
+    TrainedModel with them.
+    """
+    __tablename__ = "model_configs"
+
+    ticker = Column(String, primary_key=True)
+    params = Column(Text, nullable=False)           # JSON {"lr": {...}, "rf": {...}, "xgb": {...}}
+    cv_scores = Column(Text, nullable=False)        # JSON per-fold accuracy of the chosen config
+    cv_mean = Column(Float, nullable=True)
+    cv_std = Column(Float, nullable=True)
+    default_mean = Column(Float, nullable=True)     # CV accuracy of MODEL_PARAMS on the same folds
+    candidates = Column(Integer, nullable=True)     # configurations sampled
+    fits = Column(Integer, nullable=True)           # (configuration, fold) fits run
+    data_start = Column(String, nullable=True)      # "YYYY-MM-DD"
+    data_end = Column(String, nullable=True)        # "YYYY-MM-DD"
+    seconds = Column(Float, nullable=True)
+    searched_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+class CachedPrediction(Base):
+    """
+    Optional on-disk spill of prediction_cache: the last prediction per
+    ticker together with the bar date and model version it was made from.
+    """
+    __tablename__ = "prediction_cache"
+
+    ticker = Column(String, primary_key=True)
+    bar_date = Column(String, nullable=False)       # "YYYY-MM-DD"
+    model_version = Column(String, nullable=False)
+    prediction = Column(Integer, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+class TrackedStock(Base):
+    """
+    Durable copy of api_server.tracked_stocks (see state_store.py): the
+    watchlist, each ticker's last quote, and the feature row and model
+    version its last prediction was made from.
+    """
+    __tablename__ = "tracked_stocks"
+
+    ticker = Column(String, primary_key=True)
+    company_name = Column(String, nullable=True)
+    price = Column(Float, nullable=True)
+    prediction = Column(Integer, nullable=True)
+    quoted_at = Column(Float, nullable=True)        # unix time of the price
+    bar_date = Column(String, nullable=True)        # "YYYY-MM-DD" of the feature row
+    features = Column(Text, nullable=True)          # JSON {feature: value}
+    model_version = Column(String, nullable=True)
+    added_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+class StateVersion(Base):
+    """
+    Write counter of a shared table (see state_store.py), bumped in the
+    same transaction as every write to it, so workers can tell whether
+    someone else changed the table without reading it.
+    """
+    __tablename__ = "state_versions"
+
+    name = Column(String, primary_key=True)
+    version = Column(Integer, default=0, nullable=False)
+
+
+class Lease(Base):
+    """
+    Cross-process lock with an expiry (see leases.py), e.g. "train:AAPL" so
+    only one server worker trains a ticker at a time.
+    """
+    __tablename__ = "leases"
+
+    name = Column(String, primary_key=True)
+    holder = Column(String, nullable=False)        # "hostname:pid"
+    expires_at = Column(Float, nullable=False)     # unix time
+
+
+class CachedQuote(Base):
+    """
+    Optional on-disk spill of quotes.quote_cache, shared by server workers.
+    symbol is NULL for a ticker that does not exist.
+    """
+    __tablename__ = "quote_cache"
+
+    ticker = Column(String, primary_key=True)
+    symbol = Column(String, nullable=True)
+    company_name = Column(String, nullable=True)
+    name_at = Column(Float, nullable=True)         # unix time
+    price = Column(Float, nullable=True)
+    price_at = Column(Float, nullable=True)        # unix time
+
+
 def init_db():
     """
     Called once at startup to create tables if they don't exist.
@@ -0,0 +1,199 @@
+# history_format.py
+"""
+Encoders for /api/stocks/{ticker}/history.
+
+All three formats are built straight from the DataFrame columns without a
+per-row Python loop:
+
+  rows     {"ticker", "prices": [{"date", "open", ...}, ...]}   (original)
+  columns  {"ticker", "date": [...], "open": [...], ..., "volume": [...]}
+  binary   little-endian packed arrays, see BINARY_LAYOUT
+
+Intraday bars (history_columns(..., intraday=True)) are dated to the
+minute ("2024-05-01T09:30" in JSON, minutes since the epoch in binary,
+INTRADAY_BINARY_LAYOUT) and keep the float32 columns of the column store
+without copying them.
+"""
+import hashlib
+import struct
+
+import numpy as np
+import pandas as pd
+
+
+FIELDS = ["open", "high", "low", "close", "volume"]
+
+# uint32 row count, then int32 days since 1970-01-01, then one float32
+# array per field in FIELDS order
+BINARY_LAYOUT = "n:u32,date:i32-epoch-days," + ",".join(f"{f}:f32" for f in FIELDS)
+INTRADAY_BINARY_LAYOUT = BINARY_LAYOUT.replace("epoch-days", "epoch-minutes")
+
+# yfinance history periods, for sources that need an explicit start
+PERIOD_DAYS = {
+    "1d": 1, "5d": 5, "1mo": 31, "3mo": 92, "6mo": 183,
+    "1y": 365, "2y": 730, "5y": 1826, "10y": 3652, "ytd": 365, "max": 36500,
+}
+
+
+def history_columns(history, intraday=False):
+    """
+    Pull date + OHLCV arrays out of a yfinance history DataFrame. Intraday
+    columns are taken as they are (float32 views of the column store).
+    """
+    index = pd.DatetimeIndex(history.index)
+    if index.tz is not None:
+        index = index.tz_localize(None)
+
+    if intraday:
+        return {
+            "date": index.values.astype("datetime64[m]"),
+            "open": history["Open"].to_numpy(),
+            "high": history["High"].to_numpy(),
+            "low": history["Low"].to_numpy(),
+            "close": history["Close"].to_numpy(),
+            "volume": history["Volume"].to_numpy(),
+        }
+
+    cols = {
+        "date": index.normalize().values.astype("datetime64[D]"),
+        "open": history["Open"].to_numpy(dtype=np.float64),
+        "high": history["High"].to_numpy(dtype=np.float64),
+        "low": history["Low"].to_numpy(dtype=np.float64),
+        "close": history["Close"].to_numpy(dtype=np.float64),
+        "volume": np.nan_to_num(history["Volume"].to_numpy(dtype=np.float64), nan=0.0),
+    }
+    return cols
+
+
+def binary_layout(cols):
+    return INTRADAY_BINARY_LAYOUT if _date_unit(cols) == "m" else BINARY_LAYOUT
+
+
+def _date_unit(cols):
+    return np.datetime_data(cols["date"].dtype)[0]
+
+
+def _values(arr):
+    # float32 -> list would print 101.12 as 101.12000274658203
+    if arr.dtype == np.float32:
+        return np.round(arr.astype(np.float64), 4).tolist()
+    return arr.tolist()
+
+
+def etag(*parts, cols):
+    """Strong ETag over the request parameters and the column bytes."""
+    h = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        h.update(str(part).encode())
+        h.update(b"\0")
+    for name in ["date"] + FIELDS:
+        h.update(np.ascontiguousarray(cols[name]).tobytes())
+    return f'"{h.hexdigest()}"'
+
+
+def to_rows(ticker, cols):
+    dates = np.datetime_as_string(cols["date"], unit=_date_unit(cols)).tolist()
+    values = [_values(cols[f]) for f in FIELDS]
+    keys = ["date"] + FIELDS
+    return {
+        "ticker": ticker,
+        "prices": [dict(zip(keys, row)) for row in zip(dates, *values)],
+    }
+
+
+def to_columns(ticker, cols):
+    payload = {"ticker": ticker, "date": np.datetime_as_string(cols["date"], unit=_date_unit(cols)).tolist()}
+    for f in FIELDS:
+        payload[f] = _values(cols[f])
+    return payload
+
+
+def to_binary(cols):
+    n = len(cols["date"])
+    parts = [
+        struct.pack("<I", n),
+        cols["date"].astype(np.int64).astype("<i4").tobytes(),
+    ]
+    parts.extend(cols[f].astype("<f4").tobytes() for f in FIELDS)
+    return b"".join(parts)
+
+
+# -----------------------------------------------------------
+# RANGE + DOWNSAMPLING
+# -----------------------------------------------------------
+def slice_range(cols, start=None, end=None):
+    """Bars with start <= date <= end (numpy datetime64 or None for open-ended)."""
+    dates = cols["date"]
+    lo = np.searchsorted(dates, start, side="left") if start is not None else 0
+    hi = np.searchsorted(dates, end, side="right") if end is not None else len(dates)
+    return {name: values[lo:hi] for name, values in cols.items()}
+
+
+def _bucket_edges(n, buckets):
+    # equal-count buckets over n bars: edges[i] is the first bar of bucket i
+    return np.linspace(0, n, buckets + 1).astype(np.int64)[:-1]
+
+
+def downsample_ohlc(cols, max_points):
+    """
+    Candlestick downsampling: merge runs of consecutive bars into at most
+    max_points bars. Each merged bar keeps the first open, highest high,
+    lowest low, last close and summed volume, and is dated by its first bar.
+    """
+    n = len(cols["date"])
+    if n <= max_points:
+        return cols
+    starts = _bucket_edges(n, max_points)
+    ends = np.append(starts[1:], n) - 1
+    return {
+        "date": cols["date"][starts],
+        "open": cols["open"][starts],
+        "high": np.maximum.reduceat(cols["high"], starts),
+        "low": np.minimum.reduceat(cols["low"], starts),
+        "close": cols["close"][ends],
+        "volume": np.add.reduceat(cols["volume"], starts),
+    }
+
+
+def lttb_indices(y, max_points):
+    """
+    Largest-Triangle-Three-Buckets: indices of max_points samples of y that
+    keep its visual shape. The first and last points are always kept; each
+    bucket in between contributes the point forming the largest triangle
+    with the point kept from the previous bucket and the mean of the next.
+    The pick depends on the previous bucket's pick, so buckets are walked
+    in order, but all the work inside a bucket is one numpy expression.
+    """
+    n = len(y)
+    if n <= max_points or max_points < 3:
+        return np.arange(n) if n <= max_points else np.array([0, n - 1])
+    x = np.arange(n, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+
+    # buckets over the inner points 1..n-2
+    edges = np.linspace(1, n - 1, max_points - 1).astype(np.int64)
+    # next-bucket means for every bucket at once (the last one uses the final point)
+    sums = np.add.reduceat(y[1:n - 1], edges[:-1] - 1)
+    counts = np.diff(edges)
+    means_y = np.append(sums[1:] / counts[1:], y[-1])
+    means_x = np.append((edges[1:-1] + edges[2:] - 1) / 2.0, x[-1])
+
+    picked = np.empty(max_points, dtype=np.int64)
+    picked[0], picked[-1] = 0, n - 1
+    a = 0
+    for i in range(max_points - 2):
+        lo, hi = edges[i], edges[i + 1]
+        ax, ay = x[a], y[a]
+        area = np.abs((ax - means_x[i]) * (y[lo:hi] - ay) - (ax - x[lo:hi]) * (means_y[i] - ay))
+        a = lo + int(np.argmax(area))
+        picked[i + 1] = a
+    return picked
+
+
+def downsample_line(cols, max_points):
+    """Line-chart downsampling: LTTB over the close; the kept bars are unchanged."""
+    n = len(cols["date"])
+    if n <= max_points:
+        return cols
+    keep = lttb_indices(cols["close"], max_points)
+    return {name: values[keep] for name, values in cols.items()}
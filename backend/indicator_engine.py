@@ -0,0 +1,299 @@
+# indicator_engine.py
+"""
+Incremental version of indicators.compute_indicators.
+
+IndicatorState keeps the running state of every indicator we feed the
+models (SMA/EMA 20, RSI 14, MACD 12/19/9, ATR 14) and folds in one bar at
+a time in O(1). It follows the exact recurrences the `ta` library uses
+(pandas ewm with adjust=False, Wilder smoothing, ta's ATR seeding), so the
+values match compute_indicators up to float rounding once both have seen
+the same history.
+
+The arithmetic only uses numpy ufuncs, so the same class also works with
+per-ticker arrays as state (one column per ticker).
+
+IndicatorEngine holds one state per ticker and can checkpoint them to
+disk, so the next process only has to fold in the bars it has not seen.
+"""
+import json
+import os
+import threading
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+
+SMA_WINDOW = 20
+EMA_WINDOW = 20
+RSI_WINDOW = 14
+MACD_FAST, MACD_SLOW, MACD_SIGN = 12, 19, 9
+ATR_WINDOW = 14
+
+INDICATOR_COLUMNS = ['SMA_3', 'EMA_3', 'RSI', 'MACD', 'MACD_signal', 'ATR']
+
+
+def _ewm(prev, value, alpha):
+    return prev + alpha * (value - prev)
+
+
+class IndicatorState:
+    def __init__(self):
+        self.count = 0
+        self.prev_close = None
+
+        self.window = deque(maxlen=SMA_WINDOW)
+        self.window_sum = 0.0
+
+        self.ema = None
+        self.ema_fast = None
+        self.ema_slow = None
+        self.signal = None
+        self.signal_count = 0
+
+        self.avg_up = None
+        self.avg_down = None
+
+        self.tr_sum = 0.0
+        self.atr = 0.0
+
+        self.last = {col: np.nan for col in INDICATOR_COLUMNS}
+
+    def update(self, high, low, close):
+        """Fold in one bar and return the indicator values for it (NaN until warmed up)."""
+        self.count += 1
+        n = self.count
+
+        # SMA: running sum over a fixed window
+        if len(self.window) == SMA_WINDOW:
+            self.window_sum = self.window_sum - self.window[0]
+        self.window.append(close)
+        self.window_sum = self.window_sum + close
+        sma = self.window_sum / SMA_WINDOW if n >= SMA_WINDOW else np.nan
+
+        # EMAs (span -> alpha = 2 / (span + 1)), seeded with the first close
+        if n == 1:
+            self.ema = self.ema_fast = self.ema_slow = close
+        else:
+            self.ema = _ewm(self.ema, close, 2.0 / (EMA_WINDOW + 1))
+            self.ema_fast = _ewm(self.ema_fast, close, 2.0 / (MACD_FAST + 1))
+            self.ema_slow = _ewm(self.ema_slow, close, 2.0 / (MACD_SLOW + 1))
+        ema = self.ema if n >= EMA_WINDOW else np.nan
+
+        # MACD is defined once the slow EMA is; the signal EMA starts there
+        macd = self.ema_fast - self.ema_slow if n >= MACD_SLOW else np.nan
+        if n >= MACD_SLOW:
+            self.signal_count += 1
+            if self.signal_count == 1:
+                self.signal = macd
+            else:
+                self.signal = _ewm(self.signal, macd, 2.0 / (MACD_SIGN + 1))
+        signal = self.signal if self.signal_count >= MACD_SIGN else np.nan
+
+        # RSI: Wilder smoothing of gains/losses; ta counts the first bar as a 0 move
+        diff = close - self.prev_close if n > 1 else close * 0.0
+        up = np.maximum(diff, 0.0)
+        down = np.maximum(-diff, 0.0)
+        if n == 1:
+            self.avg_up, self.avg_down = up, down
+        else:
+            self.avg_up = _ewm(self.avg_up, up, 1.0 / RSI_WINDOW)
+            self.avg_down = _ewm(self.avg_down, down, 1.0 / RSI_WINDOW)
+        if n >= RSI_WINDOW:
+            with np.errstate(divide='ignore', invalid='ignore'):
+                rsi = np.where(
+                    self.avg_down == 0, 100.0,
+                    100.0 - 100.0 / (1.0 + self.avg_up / self.avg_down),
+                )
+            rsi = rsi[()] if np.ndim(rsi) == 0 else rsi
+        else:
+            rsi = np.nan
+
+        # ATR: mean of the first ATR_WINDOW true ranges, then Wilder; 0 before that
+        if n == 1:
+            tr = high - low
+        else:
+            prev = self.prev_close
+            tr = np.maximum(high - low, np.maximum(np.abs(high - prev), np.abs(low - prev)))
+        if n < ATR_WINDOW:
+            self.tr_sum = self.tr_sum + tr
+            self.atr = tr * 0.0
+        elif n == ATR_WINDOW:
+            self.atr = (self.tr_sum + tr) / ATR_WINDOW
+        else:
+            self.atr = (self.atr * (ATR_WINDOW - 1) + tr) / ATR_WINDOW
+
+        self.prev_close = close
+        self.last = {
+            'SMA_3': sma,
+            'EMA_3': ema,
+            'RSI': rsi,
+            'MACD': macd,
+            'MACD_signal': signal,
+            'ATR': self.atr,
+        }
+        return dict(self.last)
+
+    def values(self):
+        """Indicator values for the last bar folded in."""
+        return dict(self.last)
+
+    @property
+    def ready(self):
+        """True once every indicator has a value (same rows dropna keeps)."""
+        return self.signal_count >= MACD_SIGN
+
+    def to_dict(self):
+        def plain(v):
+            return np.asarray(v).tolist() if v is not None else None
+        return {
+            'count': self.count,
+            'prev_close': plain(self.prev_close),
+            'window': [plain(v) for v in self.window],
+            'window_sum': plain(self.window_sum),
+            'ema': plain(self.ema),
+            'ema_fast': plain(self.ema_fast),
+            'ema_slow': plain(self.ema_slow),
+            'signal': plain(self.signal),
+            'signal_count': self.signal_count,
+            'avg_up': plain(self.avg_up),
+            'avg_down': plain(self.avg_down),
+            'tr_sum': plain(self.tr_sum),
+            'atr': plain(self.atr),
+            'last': {k: plain(v) for k, v in self.last.items()},
+        }
+
+    def copy(self):
+        state = IndicatorState.__new__(IndicatorState)
+        state.__dict__.update(self.__dict__)
+        state.window = deque(self.window, maxlen=SMA_WINDOW)
+        state.last = dict(self.last)
+        return state
+
+    @classmethod
+    def from_dict(cls, d):
+        def arr(v):
+            return np.asarray(v, dtype=np.float64)[()] if v is not None else None
+        state = cls()
+        state.count = d['count']
+        state.prev_close = arr(d['prev_close'])
+        state.window = deque((arr(v) for v in d['window']), maxlen=SMA_WINDOW)
+        state.window_sum = arr(d['window_sum'])
+        state.ema = arr(d['ema'])
+        state.ema_fast = arr(d['ema_fast'])
+        state.ema_slow = arr(d['ema_slow'])
+        state.signal = arr(d['signal'])
+        state.signal_count = d['signal_count']
+        state.avg_up = arr(d['avg_up'])
+        state.avg_down = arr(d['avg_down'])
+        state.tr_sum = arr(d['tr_sum'])
+        state.atr = arr(d['atr'])
+        state.last = {k: arr(v) for k, v in d['last'].items()}
+        return state
+
+
+def stream_indicators(df):
+    """
+    Replay df (OHLCV) through a fresh IndicatorState and return the
+    indicator columns, aligned with df. Mainly for checking parity with
+    compute_indicators.
+    """
+    state = IndicatorState()
+    rows = [
+        state.update(h, l, c)
+        for h, l, c in zip(df['High'].to_numpy(float), df['Low'].to_numpy(float), df['Close'].to_numpy(float))
+    ]
+    return pd.DataFrame(rows, index=df.index, columns=INDICATOR_COLUMNS)
+
+
+class IndicatorEngine:
+    """
+    Per-ticker IndicatorStates keyed by the date of the last bar folded in.
+    With a checkpoint_dir, states are saved as <TICKER>.json after each
+    update and restored on first use.
+
+    advance() holds a per-ticker lock from reading the state to writing its
+    checkpoint, and folds new bars into a copy that is then swapped in, so
+    concurrent callers never apply the same bars twice and a state handed
+    out earlier never changes under its reader.
+    """
+
+    def __init__(self, checkpoint_dir=None):
+        self.checkpoint_dir = checkpoint_dir
+        if checkpoint_dir:
+            os.makedirs(checkpoint_dir, exist_ok=True)
+        self._states = {}   # ticker -> (IndicatorState, last bar Timestamp)
+        self._lock = threading.Lock()
+        self._ticker_locks = {}
+
+    def _ticker_lock(self, ticker):
+        with self._lock:
+            if ticker not in self._ticker_locks:
+                self._ticker_locks[ticker] = threading.Lock()
+            return self._ticker_locks[ticker]
+
+    def _path(self, ticker):
+        return os.path.join(self.checkpoint_dir, f"{ticker}.json")
+
+    def get(self, ticker):
+        """(state, last bar date) for ticker, restoring a checkpoint if needed."""
+        with self._lock:
+            if ticker in self._states:
+                return self._states[ticker]
+        if not self.checkpoint_dir or not os.path.exists(self._path(ticker)):
+            return None, None
+        try:
+            with open(self._path(ticker)) as fh:
+                saved = json.load(fh)
+            entry = (IndicatorState.from_dict(saved['state']), pd.Timestamp(saved['last_date']))
+        except Exception as e:
+            print(f"[indicator_engine] ignoring bad checkpoint for {ticker}: {e}")
+            return None, None
+        with self._lock:
+            self._states[ticker] = entry
+        return entry
+
+    def checkpoint(self, ticker, entry=None):
+        state, last_date = entry or self.get(ticker)
+        if state is None or not self.checkpoint_dir:
+            return
+        tmp_path = self._path(ticker) + ".tmp"
+        with open(tmp_path, "w") as fh:
+            json.dump({'last_date': last_date.isoformat(), 'state': state.to_dict()}, fh)
+        os.replace(tmp_path, self._path(ticker))
+
+    def advance(self, ticker, bars):
+        """
+        Fold every bar in `bars` (OHLCV DataFrame) newer than the stored state
+        into it. Without a state (or if bars do not reach back to it), the
+        state is rebuilt from all of `bars`. Returns the updated state.
+        """
+        if bars is None or bars.empty:
+            return self.get(ticker)[0]
+        with self._ticker_lock(ticker):
+            state, last_date = self.get(ticker)
+            if state is None or last_date not in bars.index:
+                state, last_date = IndicatorState(), None
+            new_bars = bars if last_date is None else bars[bars.index > last_date]
+            if new_bars.empty:
+                return state
+
+            state = state.copy()
+            for h, l, c in zip(
+                new_bars['High'].to_numpy(float),
+                new_bars['Low'].to_numpy(float),
+                new_bars['Close'].to_numpy(float),
+            ):
+                state.update(h, l, c)
+            entry = (state, new_bars.index[-1])
+            with self._lock:
+                self._states[ticker] = entry
+            self.checkpoint(ticker, entry)
+            return state
+
+    def clear(self, ticker=None):
+        with self._lock:
+            if ticker is None:
+                self._states.clear()
+            else:
+                self._states.pop(ticker, None)
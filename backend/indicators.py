@@ -1,9 +1,13 @@
-import pandas as pd
-from ta.momentum import RSIIndicator
-from ta.trend import MACD, EMAIndicator, SMAIndicator
-from ta.volatility import AverageTrueRange
+import metrics
 
+@metrics.timed("compute_indicators")
 def compute_indicators(df):
+    # ta is only needed for full recomputes (training, validation); the
+    # serving path uses indicator_engine, so keep it out of server startup
+    from ta.momentum import RSIIndicator
+    from ta.trend import MACD, EMAIndicator, SMAIndicator
+    from ta.volatility import AverageTrueRange
+
     close = df['Close']
     df['SMA_3'] = SMAIndicator(close, window=20).sma_indicator()
     df['EMA_3'] = EMAIndicator(close, window=20).ema_indicator()
@@ -14,5 +18,11 @@ def compute_indicators(df):
     atr = AverageTrueRange(high=df['High'], low=df['Low'], close=df['Close'], window=14, fillna=True)
     df['ATR'] = atr.average_true_range()
     df['Target'] = ((close.shift(-1) / close - 1) > 0.003).astype(int)  # 0.3% threshold
-    df.dropna(inplace=True)
-    return df
+    # the NaNs are normally just the indicators' warm-up rows: slicing them
+    # off keeps the OHLCV columns as views (e.g. of memory-mapped bars),
+    # where dropna would copy every column
+    valid = df.notna().all(axis=1).to_numpy()
+    first = int(valid.argmax()) if valid.any() else len(valid)
+    if valid[first:].all():
+        return df.iloc[first:]
+    return df.dropna()
@@ -0,0 +1,263 @@
+# jobs.py
+"""
+Background training jobs.
+
+Training used to run inside the HTTP request. Now each ticker to train
+becomes a TrainingJob row and runs train_for_tickers in a process pool;
+the request returns the job ids straight away and clients poll
+GET /api/admin/jobs/{id}. A second request for a ticker that already has
+a queued or running job gets that same job back instead of a new one.
+
+With several server workers each has its own queue, so a job also holds
+the "train:<TICKER>" lease (leases.py) while it is queued or running.
+A worker that cannot take the lease returns the other worker's job
+instead. The lease is renewed while the job runs, so a crashed worker's
+jobs can be recovered.
+"""
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import leases
+from db import SessionLocal, TrainingJob
+
+
+ACTIVE_STATUSES = ("queued", "running")
+
+LEASE_TTL = float(os.environ.get("AUGUR_TRAIN_LEASE_SECONDS", 120))
+
+
+def _lease_name(ticker):
+    return f"train:{ticker}"
+
+
+def _update_job(job_id, **fields):
+    db = SessionLocal()
+    try:
+        job = db.get(TrainingJob, job_id)
+        if job is None:
+            return
+        for key, value in fields.items():
+            setattr(job, key, value)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        print(f"[jobs] could not update job {job_id}: {e}")
+    finally:
+        db.close()
+
+
+def _run_training(job_id, ticker, years_back, incremental=False):
+    """Runs in a worker process."""
+    _update_job(job_id, status="running", started_at=datetime.utcnow())
+    if incremental:
+        from retrain import retrain_tickers
+
+        runs = retrain_tickers([ticker], years_back=years_back)
+        if not runs or all(run["mode"] == "failed" for run in runs):
+            raise RuntimeError(f"could not retrain {ticker}: {runs[0]['reason'] if runs else 'no data'}")
+        return [ticker]
+
+    from train_models import train_for_tickers
+
+    trained = train_for_tickers([ticker], years_back=years_back)
+    if ticker not in trained:
+        raise RuntimeError(f"no data to train {ticker}")
+    return trained
+
+
+def job_to_dict(job):
+    return {
+        "id": job.id,
+        "ticker": job.ticker,
+        "status": job.status,
+        "years_back": job.years_back,
+        "submitted_at": job.submitted_at.isoformat() if job.submitted_at else None,
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+        "error": job.error,
+    }
+
+
+class TrainingQueue:
+    def __init__(self, max_workers=2):
+        self.max_workers = max_workers
+        self._pool = None
+        self._lock = threading.Lock()
+        self._active = {}      # ticker -> job id
+        self._callbacks = {}   # job id -> [fn(job_dict)]
+        self._heartbeat = None
+
+    def _executor(self):
+        if self._pool is None:
+            # spawn, not fork: the server process has live threads
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._pool
+
+    def recover(self):
+        """
+        Mark jobs left queued/running by a server process that is gone as
+        failed. Jobs whose lease is still held belong to a live worker.
+        """
+        db = SessionLocal()
+        try:
+            stale = [
+                job for job in db.query(TrainingJob).filter(TrainingJob.status.in_(ACTIVE_STATUSES)).all()
+                if leases.holder_of(_lease_name(job.ticker)) is None
+            ]
+            for job in stale:
+                job.status = "failed"
+                job.error = "interrupted by server restart"
+                job.finished_at = datetime.utcnow()
+            db.commit()
+        finally:
+            db.close()
+
+    def submit(self, tickers, years_back=3, on_done=None, incremental=False):
+        """
+        Queue training for each ticker and return the job dicts. Tickers that
+        already have an active job are merged into it. A ticker whose lease
+        is held without an active job row (a holder that died on another
+        host, or a failed release) gets no job until the lease expires. on_done(job_dict) is
+        called in the server process when each job finishes. incremental
+        jobs go through retrain.retrain_tickers, which skips or updates
+        models whose data barely changed.
+        """
+        jobs = []
+        for ticker in tickers:
+            with self._lock:
+                job_id = self._active.get(ticker)
+                created = job_id is None
+                if created and not leases.acquire(_lease_name(ticker), LEASE_TTL):
+                    # another worker is training it; it picks up the model
+                    # here through the registry's version check
+                    job_id = self._active_elsewhere(ticker)
+                    created = False
+                    if job_id is None:
+                        print(f"[jobs] training lease for {ticker} is held but no active job was found; not queued")
+                        continue
+                elif created:
+                    job_id = uuid.uuid4().hex
+                    self._active[ticker] = job_id
+                    self._create(job_id, ticker, years_back)
+                    self._ensure_heartbeat()
+                if on_done is not None and job_id in self._active.values():
+                    self._callbacks.setdefault(job_id, []).append(on_done)
+
+            if created:
+                try:
+                    future = self._executor().submit(_run_training, job_id, ticker, years_back, incremental)
+                except Exception as e:
+                    with self._lock:
+                        self._active.pop(ticker, None)
+                        self._callbacks.pop(job_id, None)
+                    leases.release(_lease_name(ticker))
+                    _update_job(job_id, status="failed", error=str(e), finished_at=datetime.utcnow())
+                else:
+                    future.add_done_callback(
+                        lambda fut, job_id=job_id, ticker=ticker: self._finish(job_id, ticker, fut)
+                    )
+            jobs.append(self.get(job_id))
+        return jobs
+
+    def _create(self, job_id, ticker, years_back):
+        db = SessionLocal()
+        try:
+            db.add(TrainingJob(
+                id=job_id,
+                ticker=ticker,
+                status="queued",
+                years_back=years_back,
+                submitted_at=datetime.utcnow(),
+            ))
+            db.commit()
+        finally:
+            db.close()
+
+    def _finish(self, job_id, ticker, future):
+        error = future.exception()
+        if error is None:
+            _update_job(job_id, status="succeeded", finished_at=datetime.utcnow())
+        else:
+            print(f"[jobs] training {ticker} failed: {error}")
+            _update_job(job_id, status="failed", error=str(error), finished_at=datetime.utcnow())
+
+        with self._lock:
+            if self._active.get(ticker) == job_id:
+                del self._active[ticker]
+            callbacks = self._callbacks.pop(job_id, [])
+        leases.release(_lease_name(ticker))
+
+        job = self.get(job_id)
+        for fn in callbacks:
+            try:
+                fn(job)
+            except Exception as e:
+                print(f"[jobs] callback for job {job_id} failed: {e}")
+
+    def _active_elsewhere(self, ticker):
+        db = SessionLocal()
+        try:
+            job = (
+                db.query(TrainingJob)
+                .filter(TrainingJob.ticker == ticker, TrainingJob.status.in_(ACTIVE_STATUSES))
+                .order_by(TrainingJob.submitted_at.desc())
+                .first()
+            )
+            return job.id if job else None
+        finally:
+            db.close()
+
+    def _ensure_heartbeat(self):
+        # called with self._lock held
+        if self._heartbeat is None or not self._heartbeat.is_alive():
+            self._heartbeat = threading.Thread(target=self._renew_leases, name="train-leases", daemon=True)
+            self._heartbeat.start()
+
+    def _renew_leases(self):
+        """Keep the leases of this worker's jobs alive until they finish."""
+        while True:
+            time.sleep(LEASE_TTL / 3)
+            with self._lock:
+                tickers = list(self._active)
+                if not tickers:
+                    self._heartbeat = None
+                    return
+            for ticker in tickers:
+                try:
+                    if not leases.renew(_lease_name(ticker), LEASE_TTL):
+                        print(f"[jobs] lost the training lease for {ticker}")
+                except Exception as e:
+                    print(f"[jobs] could not renew the training lease for {ticker}: {e}")
+
+    def get(self, job_id):
+        db = SessionLocal()
+        try:
+            job = db.get(TrainingJob, job_id)
+            return job_to_dict(job) if job else None
+        finally:
+            db.close()
+
+    def recent(self, limit=50):
+        db = SessionLocal()
+        try:
+            rows = (
+                db.query(TrainingJob)
+                .order_by(TrainingJob.submitted_at.desc())
+                .limit(limit)
+                .all()
+            )
+            return [job_to_dict(job) for job in rows]
+        finally:
+            db.close()
+
+    def active_job(self, ticker):
+        with self._lock:
+            return self._active.get(ticker)
@@ -0,0 +1,86 @@
+# leases.py
+"""
+Named locks shared by all server workers, stored in the leases table.
+
+A lease belongs to one holder ("hostname:pid") until it is released or
+expires. A holder doing long work calls renew() before `ttl` runs out, so
+a worker that dies loses its leases after at most one ttl. On the same
+host a lease whose holder process is gone is treated as expired at once.
+
+    if leases.acquire("train:AAPL", ttl=120):
+        try:
+            ...
+        finally:
+            leases.release("train:AAPL")
+"""
+import os
+import socket
+import time
+
+from sqlalchemy import text
+
+from db import engine
+
+
+HOLDER = f"{socket.gethostname()}:{os.getpid()}"
+
+_ACQUIRE = text("""
+    INSERT INTO leases (name, holder, expires_at) VALUES (:name, :holder, :expires_at)
+    ON CONFLICT(name) DO UPDATE SET holder = excluded.holder, expires_at = excluded.expires_at
+    WHERE leases.holder = excluded.holder OR leases.expires_at < :now
+""")
+
+
+def _holder_alive(holder):
+    host, _, pid = holder.rpartition(":")
+    if host != socket.gethostname() or not pid.isdigit():
+        return True   # another machine: only the expiry can tell
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def acquire(name, ttl, holder=None):
+    """Take (or extend, if already ours) the lease; True on success."""
+    holder = holder or HOLDER
+    now = time.time()
+    with engine.begin() as conn:
+        current = conn.execute(text("SELECT holder FROM leases WHERE name = :name"), {"name": name}).scalar()
+        if current is not None and current != holder and not _holder_alive(current):
+            conn.execute(text("DELETE FROM leases WHERE name = :name AND holder = :holder"),
+                         {"name": name, "holder": current})
+        result = conn.execute(_ACQUIRE, {"name": name, "holder": holder, "expires_at": now + ttl, "now": now})
+        return result.rowcount == 1
+
+
+def renew(name, ttl, holder=None):
+    """Push out the expiry of a lease we hold; False if we lost it."""
+    holder = holder or HOLDER
+    with engine.begin() as conn:
+        result = conn.execute(
+            text("UPDATE leases SET expires_at = :expires_at WHERE name = :name AND holder = :holder"),
+            {"name": name, "holder": holder, "expires_at": time.time() + ttl},
+        )
+        return result.rowcount == 1
+
+
+def release(name, holder=None):
+    holder = holder or HOLDER
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM leases WHERE name = :name AND holder = :holder"),
+                     {"name": name, "holder": holder})
+
+
+def holder_of(name):
+    """Current live holder of the lease, or None."""
+    with engine.connect() as conn:
+        row = conn.execute(
+            text("SELECT holder, expires_at FROM leases WHERE name = :name"), {"name": name}
+        ).first()
+    if row is None or row.expires_at < time.time() or not _holder_alive(row.holder):
+        return None
+    return row.holder
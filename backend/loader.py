@@ -1,17 +1,283 @@
-import yfinance as yf
+import os
+import threading
+import time
+import numpy as np
 import pandas as pd
 from datetime import date
 from indicators import compute_indicators
+from providers import provider_from_env, normalize_ohlcv, INTERVALS
+from bar_store import BarStore, DEFAULT_STORE_DIR
+from column_store import ColumnStore
+from indicator_engine import IndicatorEngine
+import metrics
 
-def load_stocks(tickers, start_date):
-    end_date = date.today().strftime("%Y-%m-%d")
+_provider = None
+_store = None
+_column_store = None
+_engine = None
+
+# (ticker, interval, range) -> monotonic expiry of an empty provider answer:
+# holidays, a range before the open, a delisted symbol. Those ranges stay
+# uncovered, but are not asked for again until the entry expires.
+EMPTY_FETCH_TTL = float(os.environ.get("AUGUR_EMPTY_FETCH_TTL", 900))
+_empty = {}
+_empty_lock = threading.Lock()
+
+
+def get_provider():
+    global _provider
+    if _provider is None:
+        _provider = provider_from_env()
+    return _provider
+
+
+def set_provider(provider):
+    """Swap the market data provider (e.g. a FixtureProvider in tests)."""
+    global _provider
+    _provider = provider
+    with _empty_lock:
+        _empty.clear()
+
+
+def get_store():
+    """
+    Bar cache used by load_bars. AUGUR_BAR_STORE overrides the directory;
+    AUGUR_BAR_STORE=off disables caching and always fetches from the provider.
+    AUGUR_BAR_MEMO_SIZE bounds how many tickers' frames stay in memory.
+    """
+    global _store
+    if _store is None:
+        root = os.environ.get("AUGUR_BAR_STORE", DEFAULT_STORE_DIR)
+        memo_size = int(os.environ.get("AUGUR_BAR_MEMO_SIZE", 256))
+        _store = False if root.lower() == "off" else BarStore(root, memo_size=memo_size)
+    return _store or None
+
+
+def set_store(store):
+    global _store
+    _store = store if store is not None else False
+
+
+def get_column_store():
+    """
+    Memory-mapped store for intraday bars, in data/columns next to the bar
+    store (None when AUGUR_BAR_STORE=off).
+    """
+    global _column_store
+    if _column_store is None:
+        store = get_store()
+        _column_store = ColumnStore(os.path.join(os.path.dirname(store.root), "columns")) if store else False
+    return _column_store or None
+
+
+def set_column_store(store):
+    global _column_store
+    _column_store = store if store is not None else False
+
+
+def get_indicator_engine():
+    """Streaming indicator states, checkpointed next to the bar store."""
+    global _engine
+    if _engine is None:
+        store = get_store()
+        checkpoint_dir = os.path.join(os.path.dirname(store.root), "indicators") if store else None
+        _engine = IndicatorEngine(checkpoint_dir)
+    return _engine
+
+
+def _missing_ranges(coverage, start, end):
+    if coverage is None:
+        return [(start, end)]
+    ranges = []
+    if start < coverage[0]:
+        ranges.append((start, coverage[0]))
+    if end > coverage[1]:
+        ranges.append((coverage[1], end))
+    return ranges
+
+
+def _fetch(provider, plan, interval="1d"):
+    """
+    Run the planned fetches, one batched provider call per distinct range.
+    Returns the fetched frames and, per ticker, the ranges it is now known
+    for: those that returned bars, plus ranges without a business day,
+    which are not requested at all. A ticker the provider silently left
+    out of a batch is not marked, so its range is fetched again once the
+    empty answer expires (EMPTY_FETCH_TTL).
+    """
+    now = time.monotonic()
+    by_range = {}
+    with _empty_lock:
+        for key in [k for k, expires in _empty.items() if expires <= now]:
+            del _empty[key]
+        for ticker, ranges in plan.items():
+            for rng in ranges:
+                if (ticker, interval, rng) not in _empty:
+                    by_range.setdefault(rng, []).append(ticker)
+
+    fetched = {}
+    answered = {}
+    for (range_start, range_end), tickers in by_range.items():
+        if not np.busday_count(range_start.date(), range_end.date()):
+            for ticker in tickers:
+                answered.setdefault(ticker, set()).add((range_start, range_end))
+            continue
+        try:
+            with metrics.span("loader.provider_fetch"):
+                frames = provider.fetch(
+                    tickers, range_start.strftime("%Y-%m-%d"), range_end.strftime("%Y-%m-%d"), interval=interval
+                )
+        except Exception as e:
+            print(f"[loader] fetch {range_start.date()} → {range_end.date()} failed for {', '.join(tickers)}: {e}")
+            continue
+        for ticker in tickers:
+            df = frames.get(ticker)
+            if df is None or df.empty:
+                with _empty_lock:
+                    _empty[(ticker, interval, (range_start, range_end))] = now + EMPTY_FETCH_TTL
+                continue
+            fetched.setdefault(ticker, []).append(df)
+            answered.setdefault(ticker, set()).add((range_start, range_end))
+    return fetched, answered
+
+
+def _extend_coverage(coverage, start, end, answered):
+    """
+    coverage grown by the missing ranges (see _missing_ranges) that were
+    answered, or None if nothing is known yet.
+    """
+    if coverage is None:
+        return (start, end) if (start, end) in answered else None
+    first = start if (start, coverage[0]) in answered else coverage[0]
+    last = end if (coverage[1], end) in answered else coverage[1]
+    return first, last
+
+
+def load_bars(tickers, start_date, end_date=None, interval="1d"):
+    """
+    Return {ticker: raw OHLCV DataFrame} for [start_date, end_date).
+    Bars already in the store are read from disk and only the missing
+    head/tail of the range is requested from the provider.
+
+    Intraday intervals (see providers.INTRADAY_INTERVALS) default to an end
+    of tomorrow, so today's session is included, and are served from the
+    column store as read-only frames over memory-mapped files.
+    """
+    if interval not in INTERVALS:
+        raise ValueError(f"unsupported interval {interval!r}; expected one of {', '.join(INTERVALS)}")
+    intraday = interval != "1d"
+    if end_date is None:
+        end_date = pd.Timestamp(date.today()) + pd.Timedelta(days=1 if intraday else 0)
+    start, end = pd.Timestamp(start_date), pd.Timestamp(end_date)
+    provider = get_provider()
+    store = get_column_store() if intraday else get_store()
+
+    if store is None:
+        with metrics.span("loader.provider_fetch"):
+            frames = provider.fetch(tickers, start.strftime("%Y-%m-%d"), end.strftime("%Y-%m-%d"), interval=interval)
+        return {t: frames[t] for t in tickers if t in frames}
+    if intraday:
+        return _load_intraday(store, provider, tickers, start, end, interval)
+
+    locks = [store.lock(t) for t in sorted(set(tickers))]
+    for lock in locks:
+        lock.acquire()
+    try:
+        with metrics.span("loader.store_read"):
+            cached = {t: store.read(t) for t in tickers}
+        plan = {}
+        for ticker, (_, coverage) in cached.items():
+            ranges = _missing_ranges(coverage, start, end)
+            if ranges:
+                plan[ticker] = ranges
+
+        fetched, answered = _fetch(provider, plan) if plan else ({}, {})
+
+        stocks_data = {}
+        for ticker in tickers:
+            df, coverage = cached[ticker]
+            if ticker in plan and ticker in answered:
+                parts = ([df] if df is not None else []) + fetched.get(ticker, [])
+                df = normalize_ohlcv(pd.concat(parts)) if parts else normalize_ohlcv(None)
+                coverage = _extend_coverage(coverage, start, end, answered[ticker])
+                with metrics.span("loader.store_write"):
+                    store.write(ticker, df, coverage)
+
+            if df is None:
+                continue
+            lo, hi = df.index.searchsorted(start), df.index.searchsorted(end)
+            if hi > lo:
+                stocks_data[ticker] = df.iloc[lo:hi].copy()
+        return stocks_data
+    finally:
+        for lock in locks:
+            lock.release()
+
+
+def _load_intraday(store, provider, tickers, start, end, interval):
+    # the current session is still growing: never mark it as fully fetched
+    today = pd.Timestamp(date.today())
+    locks = [store.lock(t, interval) for t in sorted(set(tickers))]
+    for lock in locks:
+        lock.acquire()
+    try:
+        with metrics.span("loader.store_read"):
+            coverages = {t: store.coverage(t, interval) for t in tickers}
+        plan = {}
+        for ticker, coverage in coverages.items():
+            ranges = _missing_ranges(coverage, start, end)
+            if ranges:
+                plan[ticker] = ranges
+
+        fetched, answered = _fetch(provider, plan, interval) if plan else ({}, {})
+
+        for ticker in plan:
+            if ticker not in answered:
+                continue
+            parts = fetched.get(ticker, [])
+            df = normalize_ohlcv(pd.concat(parts) if parts else None, intraday=True)
+            first, last = _extend_coverage(coverages[ticker], start, end, answered[ticker])
+            coverage = (first, max(first, min(last, today)))
+            with metrics.span("loader.store_write"):
+                store.append(ticker, interval, df, coverage)
+
+        stocks_data = {}
+        for ticker in tickers:
+            df = store.frame(ticker, interval, start, end)
+            if df is not None and not df.empty:
+                stocks_data[ticker] = df
+        return stocks_data
+    finally:
+        for lock in locks:
+            lock.release()
+
+
+def load_stocks(tickers, start_date, interval="1d"):
     stocks_data = {}
+    for ticker, df in load_bars(tickers, start_date, interval=interval).items():
+        stocks_data[ticker] = compute_indicators(df)
+    return stocks_data
+
+
+def load_latest(tickers, start_date, bars=None):
+    """
+    Return {ticker: (last bar date, {indicator: value})} for the most recent
+    bar, using the streaming indicator engine: only bars newer than the
+    ticker's saved state are folded in, instead of recomputing every
+    indicator over the whole range. Tickers without enough history for all
+    indicators are left out. bars: a load_bars() result for the same range
+    to reuse instead of loading it again.
+    """
+    engine = get_indicator_engine()
+    if bars is None:
+        bars = load_bars(tickers, start_date)
+    latest = {}
     for ticker in tickers:
-        df = yf.download(ticker, start=start_date, end=end_date, interval="1d", group_by='column', auto_adjust=False)
-        if isinstance(df.columns, pd.MultiIndex):
-            df.columns = [col[1] if isinstance(col, tuple) else col for col in df.columns]
-        expected_cols = ['Open', 'High', 'Low', 'Close', 'Adj Close', 'Volume']
-        df.columns = [col if col in expected_cols else expected_cols[i] for i, col in enumerate(df.columns)]
-        df = compute_indicators(df)
-        stocks_data[ticker] = df
-    return stocks_data
\ No newline at end of file
+        df = bars.get(ticker)
+        if df is None or df.empty:
+            continue
+        with metrics.span("loader.indicator_advance"):
+            state = engine.advance(ticker, df)
+        if state is not None and state.ready:
+            latest[ticker] = (df.index[-1], state.values())
+    return latest
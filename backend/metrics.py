@@ -0,0 +1,279 @@
+# metrics.py
+"""
+Timing spans, counters and histograms for the backend hot paths.
+
+    with metrics.span("prediction.predict"):
+        ...
+
+    @metrics.timed("compute_indicators")
+    def compute_indicators(df): ...
+
+Every span goes into the augur_stage_seconds histogram, labelled with the
+stage name. MetricsMiddleware times each HTTP request into
+augur_http_request_seconds, labelled with the route template, and collects
+the spans that ran for that request. A request slower than
+AUGUR_SLOW_REQUEST_MS is written, with its spans, as one JSON line to
+AUGUR_SLOW_LOG, for a sampled fraction AUGUR_SLOW_SAMPLE of such requests.
+render() formats everything as Prometheus text for GET /api/metrics.
+
+With AUGUR_METRICS=0, span() returns one shared no-op context manager,
+timed() returns the function unchanged and the middleware is not
+installed. The hooks then cost one attribute lookup.
+"""
+import bisect
+import contextvars
+import functools
+import json
+import os
+import random
+import threading
+import time
+from contextlib import nullcontext
+
+
+ENABLED = os.environ.get("AUGUR_METRICS", "1") != "0"
+SLOW_REQUEST_MS = float(os.environ.get("AUGUR_SLOW_REQUEST_MS", 500))
+SLOW_SAMPLE = float(os.environ.get("AUGUR_SLOW_SAMPLE", 1.0))
+SLOW_LOG = os.environ.get(
+    "AUGUR_SLOW_LOG",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "slow_requests.log"),
+)
+
+# seconds; roughly Prometheus' defaults with finer steps under 10ms
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# spans kept per request for the slow log
+MAX_TRACE_SPANS = 200
+
+_NOOP = nullcontext()
+
+
+class Histogram:
+    __slots__ = ("counts", "total", "count")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)   # last slot is +Inf
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.total += value
+        self.count += 1
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}   # (name, labels tuple) -> Histogram
+        self._counters = {}     # (name, labels tuple) -> float
+        self._help = {}
+
+    def describe(self, name, help_text):
+        self._help[name] = help_text
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            hist = self._histograms.get(key)
+            if hist is None:
+                hist = self._histograms[key] = Histogram()
+            hist.observe(value)
+
+    def incr(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def clear(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+    def render(self, samples=()):
+        """
+        Prometheus text exposition format (version 0.0.4). samples are extra
+        (name, type, labels dict, value) values read at scrape time, such
+        as cache sizes.
+        """
+        with self._lock:
+            histograms = sorted(
+                (k, (list(h.counts), h.total, h.count)) for k, h in self._histograms.items()
+            )
+            counters = sorted(self._counters.items())
+
+        lines = []
+        seen = set()
+
+        def header(name, kind):
+            if name not in seen:
+                seen.add(name)
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} {kind}")
+
+        for (name, labels), value in counters:
+            header(name, "counter")
+            lines.append(f"{name}{_labels(labels)} {_num(value)}")
+
+        for name, kind, labels, value in sorted(samples, key=lambda s: s[0]):
+            header(name, kind)
+            lines.append(f"{name}{_labels(tuple(sorted(labels.items())))} {_num(value)}")
+
+        for (name, labels), (counts, total, count) in histograms:
+            header(name, "histogram")
+            cumulative = 0
+            for bound, n in zip(BUCKETS + (float("inf"),), counts):
+                cumulative += n
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{name}_bucket{_labels(labels + (('le', le),))} {cumulative}")
+            lines.append(f"{name}_sum{_labels(labels)} {_num(total)}")
+            lines.append(f"{name}_count{_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels) + "}"
+
+
+def _num(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+registry = Registry()
+registry.describe("augur_stage_seconds", "Time spent in an instrumented backend stage.")
+registry.describe("augur_http_request_seconds", "HTTP request latency by route.")
+registry.describe("augur_http_requests_total", "HTTP requests by route and status.")
+registry.describe("augur_slow_requests_total", "Requests slower than AUGUR_SLOW_REQUEST_MS.")
+registry.describe("augur_predictions_total", "get_prediction results by where they came from.")
+
+# spans of the request being handled (a list shared with worker threads)
+_trace = contextvars.ContextVar("augur_trace", default=None)
+
+
+class _Span:
+    __slots__ = ("name", "started")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self.started
+        registry.observe("augur_stage_seconds", elapsed, stage=self.name)
+        trace = _trace.get()
+        if trace is not None and len(trace) < MAX_TRACE_SPANS:
+            trace.append((self.name, self.started, elapsed, exc_type is not None))
+        return False
+
+
+def span(name):
+    """Context manager timing one stage (no-op when metrics are disabled)."""
+    if not ENABLED:
+        return _NOOP
+    return _Span(name)
+
+
+def timed(name):
+    """Decorator form of span(); leaves the function untouched when disabled."""
+    def wrap(fn):
+        if not ENABLED:
+            return fn
+
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            with _Span(name):
+                return fn(*args, **kwargs)
+        return inner
+    return wrap
+
+
+def incr(name, value=1, **labels):
+    if ENABLED:
+        registry.incr(name, value, **labels)
+
+
+def render(samples=()):
+    return registry.render(samples)
+
+
+class MetricsMiddleware:
+    """ASGI middleware: per-route latency histogram + sampled slow-request log."""
+
+    def __init__(self, app, slow_ms=None, sample=None, log_path=None):
+        self.app = app
+        self.slow_ms = SLOW_REQUEST_MS if slow_ms is None else slow_ms
+        self.sample = SLOW_SAMPLE if sample is None else sample
+        self.log_path = log_path or SLOW_LOG
+        self._log_lock = threading.Lock()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = {"code": 500, "streaming": False}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                # an event stream stays open by design; it is not a slow request
+                status["streaming"] = any(
+                    k == b"content-type" and v.startswith(b"text/event-stream")
+                    for k, v in message.get("headers", ())
+                )
+            await send(message)
+
+        trace = []
+        token = _trace.set(trace)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            _trace.reset(token)
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            method = scope.get("method", "")
+            registry.observe("augur_http_request_seconds", elapsed, method=method, route=path)
+            registry.incr("augur_http_requests_total", method=method, route=path, status=status["code"])
+            if elapsed * 1000 >= self.slow_ms and not status["streaming"]:
+                registry.incr("augur_slow_requests_total", method=method, route=path)
+                if random.random() < self.sample:
+                    self._log_slow(scope, path, status["code"], started, elapsed, trace)
+
+    def _log_slow(self, scope, route, status, started, elapsed, trace):
+        record = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "method": scope.get("method"),
+            "path": scope.get("path"),
+            "query": scope.get("query_string", b"").decode("latin-1"),
+            "route": route,
+            "status": status,
+            "ms": round(elapsed * 1000, 3),
+            "spans": [
+                {
+                    "stage": name,
+                    "offset_ms": round((span_start - started) * 1000, 3),
+                    "ms": round(duration * 1000, 3),
+                    **({"error": True} if failed else {}),
+                }
+                for name, span_start, duration, failed in sorted(trace, key=lambda s: s[1])
+            ],
+        }
+        try:
+            with self._log_lock:
+                os.makedirs(os.path.dirname(os.path.abspath(self.log_path)), exist_ok=True)
+                with open(self.log_path, "a") as fh:
+                    fh.write(json.dumps(record) + "\n")
+        except OSError as e:
+            print(f"[metrics] could not write slow request log: {e}")
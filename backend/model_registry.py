@@ -0,0 +1,231 @@
+# model_registry.py
+"""
+In-process cache of deserialized ticker models.
+
+get_prediction used to joblib.load the model and feature pickles on every
+call. The registry keeps them in an LRU bounded by entry count and by an
+approximate byte budget (size of the pickles on disk), and only reloads a
+ticker when its TrainedModel.last_trained_at row or the file mtimes change.
+That version is itself a database query and a few stats, so it is looked
+up at most once per `check_seconds` per ticker; invalidate() forces it.
+
+When a compiled export of the current pickle exists (compiled_model.py) it
+is loaded instead: a few memory-mapped arrays rather than the unpickled
+sklearn/xgboost objects, with the same predictions.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import compiled_model
+import metrics
+from db import SessionLocal, TrainedModel
+
+
+class _Entry:
+    __slots__ = ("model", "features", "version", "nbytes")
+
+    def __init__(self, model, features, version, nbytes):
+        self.model = model
+        self.features = features
+        self.version = version
+        self.nbytes = nbytes
+
+
+class ModelRegistry:
+    def __init__(self, model_dir, max_models=32, max_bytes=512 * 1024 * 1024, use_compiled=True,
+                 check_seconds=2.0):
+        self.model_dir = model_dir
+        self.max_models = max_models
+        self.max_bytes = max_bytes
+        self.use_compiled = use_compiled
+        self.check_seconds = check_seconds
+
+        self._entries = OrderedDict()
+        # ticker -> (monotonic time checked, _version() result)
+        self._checked = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._load_locks = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.reloads = 0
+        self.evictions = 0
+        self.compiled_loads = 0
+        self.load_seconds_total = 0.0
+        self.load_seconds_max = 0.0
+
+    def paths(self, ticker):
+        return (
+            os.path.join(self.model_dir, f"{ticker}_model.pkl"),
+            os.path.join(self.model_dir, f"{ticker}_features.pkl"),
+        )
+
+    def _version(self, ticker):
+        """
+        ((last_trained_at, model mtime, features mtime, compiled mtime),
+        pickle bytes), or None when the pickles are missing.
+        """
+        model_file, features_file = self.paths(ticker)
+        try:
+            model_stat = os.stat(model_file)
+            features_stat = os.stat(features_file)
+        except FileNotFoundError:
+            return None
+
+        trained_at = None
+        db = SessionLocal()
+        try:
+            row = (
+                db.query(TrainedModel.last_trained_at)
+                .filter(TrainedModel.ticker == ticker)
+                .one_or_none()
+            )
+            trained_at = row[0] if row else None
+        except Exception as e:
+            print(f"[model_registry] could not read TrainedModel for {ticker}: {e}")
+        finally:
+            db.close()
+
+        compiled_mtime = 0
+        if self.use_compiled:
+            try:
+                compiled_mtime = os.stat(
+                    os.path.join(compiled_model.compiled_path(self.model_dir, ticker), "meta.json")
+                ).st_mtime_ns
+            except FileNotFoundError:
+                pass
+
+        nbytes = model_stat.st_size + features_stat.st_size
+        return (trained_at, model_stat.st_mtime_ns, features_stat.st_mtime_ns, compiled_mtime), nbytes
+
+    def _current(self, ticker):
+        """_version(ticker), reused for check_seconds after it was looked up."""
+        now = time.monotonic()
+        with self._lock:
+            checked = self._checked.get(ticker)
+        if checked is not None and now - checked[0] < self.check_seconds:
+            return checked[1]
+        current = self._version(ticker)
+        with self._lock:
+            self._checked[ticker] = (now, current)
+        return current
+
+    def version(self, ticker):
+        """
+        Opaque string that changes whenever the ticker's model is retrained
+        or its files are replaced; None when there is no model.
+        """
+        current = self._current(ticker)
+        if current is None:
+            return None
+        trained_at, model_mtime, features_mtime, compiled_mtime = current[0]
+        trained = trained_at.isoformat() if trained_at else "-"
+        return f"{trained}|{model_mtime}|{features_mtime}|{compiled_mtime}"
+
+    def _load_lock(self, ticker):
+        with self._lock:
+            if ticker not in self._load_locks:
+                self._load_locks[ticker] = threading.Lock()
+            return self._load_locks[ticker]
+
+    def get(self, ticker):
+        """
+        Return (model, feature_list) for ticker, loading from disk on a miss
+        or when the stored version is stale. Returns None if no model exists.
+        """
+        current = self._current(ticker)
+        if current is None:
+            with self._lock:
+                self._remove(ticker)
+            return None
+        version, nbytes = current
+
+        with self._lock:
+            entry = self._entries.get(ticker)
+            if entry is not None and entry.version == version:
+                self._entries.move_to_end(ticker)
+                self.hits += 1
+                return entry.model, entry.features
+
+        # one loader per ticker; concurrent callers wait and then hit
+        with self._load_lock(ticker):
+            with self._lock:
+                entry = self._entries.get(ticker)
+                if entry is not None and entry.version == version:
+                    self._entries.move_to_end(ticker)
+                    self.hits += 1
+                    return entry.model, entry.features
+                self.misses += 1
+                if entry is not None:
+                    self.reloads += 1
+
+            model_file, features_file = self.paths(ticker)
+            started = time.perf_counter()
+            with metrics.span("model_registry.load"):
+                compiled = compiled_model.load(self.model_dir, ticker, model_file) if self.use_compiled else None
+                if compiled is not None:
+                    model, features, nbytes = compiled, compiled.features, compiled.nbytes
+                else:
+                    import joblib   # also pulls in sklearn/xgboost on unpickling
+                    model = joblib.load(model_file)
+                    features = joblib.load(features_file)
+            elapsed = time.perf_counter() - started
+
+            with self._lock:
+                if compiled is not None:
+                    self.compiled_loads += 1
+                self.load_seconds_total += elapsed
+                self.load_seconds_max = max(self.load_seconds_max, elapsed)
+                self._remove(ticker)
+                self._entries[ticker] = _Entry(model, features, version, nbytes)
+                self._bytes += nbytes
+                self._evict()
+            return model, features
+
+    def _remove(self, ticker):
+        entry = self._entries.pop(ticker, None)
+        if entry is not None:
+            self._bytes -= entry.nbytes
+
+    def _evict(self):
+        # always keep the most recently loaded entry, even if it alone is over budget
+        while len(self._entries) > 1 and (
+            len(self._entries) > self.max_models or self._bytes > self.max_bytes
+        ):
+            ticker, entry = self._entries.popitem(last=False)
+            self._bytes -= entry.nbytes
+            self.evictions += 1
+
+    def invalidate(self, ticker=None):
+        with self._lock:
+            if ticker is None:
+                self._entries.clear()
+                self._checked.clear()
+                self._bytes = 0
+            else:
+                self._remove(ticker)
+                self._checked.pop(ticker, None)
+
+    def stats(self):
+        with self._lock:
+            loads = self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_models": self.max_models,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "reloads": self.reloads,
+                "evictions": self.evictions,
+                "compiled_loads": self.compiled_loads,
+                "use_compiled": self.use_compiled,
+                "check_seconds": self.check_seconds,
+                "load_seconds_total": round(self.load_seconds_total, 6),
+                "load_seconds_avg": round(self.load_seconds_total / loads, 6) if loads else 0.0,
+                "load_seconds_max": round(self.load_seconds_max, 6),
+                "tickers": list(self._entries.keys()),
+            }
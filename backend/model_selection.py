@@ -0,0 +1,416 @@
+# model_selection.py
+"""
+Hyperparameter search for the per-ticker ensemble.
+
+train_models fits every ticker with MODEL_PARAMS and scores it on one
+chronological 70/30 split. search() instead samples `candidates`
+configurations from SEARCH_SPACE (the defaults always among them) and
+scores them with time-series cross-validation: expanding-window folds
+where each fold trains on everything before its test block, with a
+one-bar gap because Target looks one bar ahead.
+
+Weak configurations are pruned early by successive halving. Every
+configuration is first scored on the most recent fold only, the best
+1/eta of them go on to eta times as many folds, and so on until the
+survivors have been scored on all of them. Within a fit, XGBoost stops
+boosting once the last EARLY_STOP_FRACTION of the training rows stops
+improving, and the chosen config keeps the median best round count.
+The defaults are never pruned, so the winner is compared against them
+on the same folds.
+
+The (configuration, fold) fits of a rung run in parallel processes. Once
+a ticker's wall-clock budget is spent the pool is terminated, killing the
+fits still running so they cannot eat into the next ticker's budget (the
+next ticker starts a fresh pool), and the best configuration among those
+scored on the most folds wins. Without a pool the fit in progress is
+finished first. The choice
+and its per-fold scores are stored as the ticker's ModelConfig row
+(db.py), which train_models uses from then on.
+
+    python model_selection.py --tickers AAPL MSFT --workers 4 --budget 120 --train
+"""
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import queue
+import random
+import time
+from datetime import date, datetime, timedelta
+
+import numpy as np
+
+from db import SessionLocal, ModelConfig, init_db
+from loader import load_stocks
+
+
+# -----------------------------------------------------------
+# CONFIG
+# -----------------------------------------------------------
+CANDIDATES = int(os.environ.get("AUGUR_TUNE_CANDIDATES", 16))
+FOLDS = int(os.environ.get("AUGUR_TUNE_FOLDS", 5))
+ETA = int(os.environ.get("AUGUR_TUNE_ETA", 3))
+BUDGET_SECONDS = float(os.environ.get("AUGUR_TUNE_BUDGET_SECONDS", 120))
+
+# XGBoost boosts up to MAX_ROUNDS, stopping after EARLY_STOPPING_ROUNDS
+# without improvement on the last EARLY_STOP_FRACTION of the fold's rows
+MAX_ROUNDS = 1000
+EARLY_STOPPING_ROUNDS = 30
+EARLY_STOP_FRACTION = 0.15
+EARLY_STOP_MIN_ROWS = 20
+
+# member -> parameter -> values to sample from
+SEARCH_SPACE = {
+    'lr': {'C': [0.1, 1.0, 10.0]},
+    'rf': {
+        'n_estimators': [100, 200, 400],
+        'max_depth': [None, 4, 8, 16],
+        'min_samples_leaf': [1, 5, 20],
+    },
+    'xgb': {
+        'max_depth': [2, 3, 4, 6],
+        'learning_rate': [0.02, 0.05, 0.1],
+        'subsample': [0.7, 1.0],
+        'min_child_weight': [1, 5],
+    },
+}
+
+
+# -----------------------------------------------------------
+# SEARCH
+# -----------------------------------------------------------
+def sample_configs(candidates, space=SEARCH_SPACE, seed=42):
+    """candidates distinct configurations; the first one is MODEL_PARAMS."""
+    from train_models import model_params
+
+    default = model_params()
+    configs = [default]
+    seen = {json.dumps(default, sort_keys=True)}
+    rng = random.Random(seed)
+    size = math.prod(len(values) for member in space.values() for values in member.values())
+    while len(configs) < min(candidates, size + 1):
+        config = model_params({
+            name: {param: rng.choice(values) for param, values in member.items()}
+            for name, member in space.items()
+        })
+        key = json.dumps(config, sort_keys=True)
+        if key not in seen:
+            seen.add(key)
+            configs.append(config)
+    return configs
+
+
+def rungs(folds, eta):
+    """Folds scored per surviving configuration at each rung, e.g. 1, 3, 5."""
+    budgets, n = [], 1
+    while n < folds:
+        budgets.append(n)
+        n *= eta
+    return budgets + [folds]
+
+
+def _score_fold(params, X, y, train, test, threads=None):
+    """
+    Hold-out accuracy of the hard-voting ensemble for one fold, and the
+    best XGBoost round. (nan, None) when the fold cannot be fit.
+    """
+    from train_models import build_model
+
+    n_stop = max(EARLY_STOP_MIN_ROWS, int(len(train) * EARLY_STOP_FRACTION))
+    fit, stop = train[:-n_stop], train[-n_stop:]
+    if len(np.unique(y[fit])) < 2:
+        return float('nan'), None
+
+    members = dict(build_model(True, n_jobs=threads, params=params).estimators)
+    xgb = members['xgb'].set_params(n_estimators=MAX_ROUNDS, early_stopping_rounds=EARLY_STOPPING_ROUNDS)
+    xgb.fit(X[fit], y[fit], eval_set=[(X[stop], y[stop])], verbose=False)
+    members['lr'].fit(X[train], y[train])
+    members['rf'].fit(X[train], y[train])
+
+    # hard vote of three binary members = majority
+    votes = sum(members[name].predict(X[test]).astype(int) for name in ('lr', 'rf', 'xgb'))
+    predicted = (votes >= 2).astype(int)
+    return float(np.mean(predicted == y[test])), int(xgb.best_iteration)
+
+
+class FitPool:
+    """
+    Spawned worker processes for the fits, created on first use. Unlike a
+    ProcessPoolExecutor it can be terminated with fits still running.
+    """
+
+    def __init__(self, workers, threads):
+        self.workers = workers
+        self.threads = threads
+        self._pool = None
+
+    def get(self):
+        if self._pool is None:
+            from train_models import _limit_worker_threads
+
+            self._pool = multiprocessing.get_context("spawn").Pool(
+                self.workers, initializer=_limit_worker_threads, initargs=(self.threads,)
+            )
+        return self._pool
+
+    def terminate(self):
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+
+
+def _run_fits(tasks, X, y, splits, configs, deadline, pool, threads):
+    """
+    Score (config, fold) tasks until the deadline; yields
+    (config, fold, (accuracy, best_round)). Returns early on timeout,
+    terminating the pool's unfinished fits.
+    """
+    if pool is None:
+        for i, f in tasks:
+            if time.perf_counter() >= deadline:
+                return
+            train, test = splits[f]
+            try:
+                yield i, f, _score_fold(configs[i], X, y, train, test, threads)
+            except Exception as e:
+                print(f"[model_selection] config {i} fold {f} failed: {e}")
+                yield i, f, (float('nan'), None)
+        return
+
+    done = queue.Queue()
+    workers = pool.get()
+    for i, f in tasks:
+        workers.apply_async(
+            _score_fold, (configs[i], X, y, splits[f][0], splits[f][1], threads),
+            callback=lambda result, key=(i, f): done.put((key, result, None)),
+            error_callback=lambda error, key=(i, f): done.put((key, None, error)),
+        )
+    for _ in tasks:
+        try:
+            (i, f), result, error = done.get(timeout=max(0.0, deadline - time.perf_counter()))
+        except queue.Empty:
+            pool.terminate()
+            return
+        if error is not None:
+            print(f"[model_selection] config {i} fold {f} failed: {error}")
+            result = (float('nan'), None)
+        yield i, f, result
+
+
+def _mean(fold_scores):
+    values = [acc for acc, _ in fold_scores.values() if not np.isnan(acc)]
+    return float(np.mean(values)) if values else float('-inf')
+
+
+def search(df, candidates=CANDIDATES, folds=FOLDS, eta=ETA, budget_seconds=BUDGET_SECONDS,
+           pool=None, threads=None, seed=42):
+    """
+    Pick the best configuration for one ticker's rows (a compute_indicators
+    frame). pool: a FitPool to spread the fits over (None fits in this
+    process). Returns the chosen params, its per-fold accuracy
+    (oldest fold first) and search stats, or None if the budget ran out
+    before any fit finished.
+    """
+    from sklearn.model_selection import TimeSeriesSplit
+    from train_models import FEATURE_COLUMNS
+
+    started = time.perf_counter()
+    deadline = started + budget_seconds
+    X = df[FEATURE_COLUMNS].to_numpy(dtype=np.float64)
+    y = df['Target'].to_numpy(dtype=int)
+    # most recent fold first: it is the one every configuration is scored on
+    splits = list(TimeSeriesSplit(n_splits=folds, gap=1).split(X))[::-1]
+    configs = sample_configs(candidates, seed=seed)
+
+    scores = {i: {} for i in range(len(configs))}
+    alive = list(range(len(configs)))
+    fits = 0
+    timed_out = False
+    for budget in rungs(folds, eta):
+        tasks = [(i, f) for i in alive for f in range(budget) if f not in scores[i]]
+        for i, f, result in _run_fits(tasks, X, y, splits, configs, deadline, pool, threads):
+            scores[i][f] = result
+            fits += 1
+        if any(f not in scores[i] for i, f in tasks):
+            timed_out = True
+            break
+        if budget == folds:
+            break
+        # ties go to the lower index, i.e. the defaults first
+        ranked = sorted(alive, key=lambda i: (-_mean(scores[i]), i))
+        alive = ranked[:max(1, math.ceil(len(alive) / eta))]
+        if 0 not in alive:
+            alive.append(0)
+
+    depth = max(len(s) for s in scores.values())
+    if not depth:
+        return None
+    finalists = [i for i in scores if len(scores[i]) == depth]
+    best = min(finalists, key=lambda i: (-_mean(scores[i]), i))
+
+    params = {name: dict(values) for name, values in configs[best].items()}
+    rounds = [r for _, r in scores[best].values() if r is not None]
+    if rounds:
+        params['xgb']['n_estimators'] = int(np.median(rounds)) + 1
+    fold_scores = [scores[best][f][0] for f in sorted(scores[best], reverse=True)]
+    return {
+        "params": params,
+        "cv_scores": fold_scores,
+        "cv_mean": _finite(_mean(scores[best])),
+        "cv_std": _finite(float(np.nanstd(fold_scores))) if fold_scores else None,
+        "default_mean": _finite(_mean(scores[0])),
+        "candidates": len(configs),
+        "fits": fits,
+        "folds_scored": depth,
+        "timed_out": timed_out,
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+
+
+def _finite(value):
+    return value if value is not None and np.isfinite(value) else None
+
+
+# -----------------------------------------------------------
+# STORAGE
+# -----------------------------------------------------------
+def save_config(ticker, result, start, end):
+    db = SessionLocal()
+    try:
+        row = db.get(ModelConfig, ticker) or ModelConfig(ticker=ticker)
+        row.params = json.dumps(result["params"])
+        row.cv_scores = json.dumps(result["cv_scores"])
+        row.cv_mean = result["cv_mean"]
+        row.cv_std = result["cv_std"]
+        row.default_mean = result["default_mean"]
+        row.candidates = result["candidates"]
+        row.fits = result["fits"]
+        row.data_start = start
+        row.data_end = end
+        row.seconds = result["seconds"]
+        row.searched_at = datetime.utcnow()
+        db.merge(row)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        print(f"[model_selection] ERROR saving config for {ticker}: {e}")
+    finally:
+        db.close()
+
+
+def config_to_dict(row):
+    return {
+        "ticker": row.ticker,
+        "params": json.loads(row.params),
+        "cv_scores": json.loads(row.cv_scores),
+        "cv_mean": row.cv_mean,
+        "cv_std": row.cv_std,
+        "default_mean": row.default_mean,
+        "candidates": row.candidates,
+        "fits": row.fits,
+        "data_start": row.data_start,
+        "data_end": row.data_end,
+        "seconds": row.seconds,
+        "searched_at": row.searched_at.isoformat() if row.searched_at else None,
+    }
+
+
+def stored_configs(ticker=None):
+    db = SessionLocal()
+    try:
+        query = db.query(ModelConfig)
+        if ticker:
+            query = query.filter(ModelConfig.ticker == ticker.upper())
+        return [config_to_dict(row) for row in query.order_by(ModelConfig.ticker).all()]
+    finally:
+        db.close()
+
+
+# -----------------------------------------------------------
+# TUNE TICKERS
+# -----------------------------------------------------------
+def tune_tickers(tickers, years_back=3, workers=1, budget_seconds=BUDGET_SECONDS,
+                 candidates=CANDIDATES, folds=FOLDS, eta=ETA, train=False):
+    """
+    Search every ticker in turn (each gets budget_seconds) and store the
+    winners. workers > 1 runs each rung's fits in that many processes.
+    train=True then refits the tuned tickers' models with their configs.
+    """
+    tickers = [t.strip().upper() for t in tickers if t.strip()]
+    start = (date.today() - timedelta(days=365 * years_back)).strftime("%Y-%m-%d")
+    end = date.today().strftime("%Y-%m-%d")
+    data = load_stocks(tickers, start)
+    if not data:
+        print("[model_selection] ERROR: No data loaded.")
+        return {}
+
+    pool, threads = None, None
+    if workers > 1:
+        threads = max(1, (os.cpu_count() or 1) // workers)
+        pool = FitPool(workers, threads)
+
+    results = {}
+    try:
+        for ticker, df in data.items():
+            result = search(df, candidates, folds, eta, budget_seconds, pool=pool, threads=threads)
+            if result is None:
+                print(f"[model_selection] {ticker}: no fit finished within {budget_seconds:.0f}s, config kept")
+                continue
+            save_config(ticker, result, start, end)
+            results[ticker] = result
+            print(
+                f"[model_selection] {ticker}: cv {_fmt(result['cv_mean'])} vs default "
+                f"{_fmt(result['default_mean'])} over {result['folds_scored']} folds, "
+                f"{result['fits']} fits in {result['seconds']:.1f}s"
+                + (" (budget hit)" if result["timed_out"] else "")
+            )
+    finally:
+        if pool is not None:
+            pool.close()
+
+    if train and results:
+        import train_models
+
+        train_models.train_for_tickers(list(results), years_back=years_back, workers=workers)
+    return results
+
+
+def _fmt(score):
+    return f"{score:.4f}" if score is not None else "n/a"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tune per-ticker model hyperparameters")
+    parser.add_argument("--tickers", nargs="+", required=True)
+    parser.add_argument("--years", type=int, default=3, help="years of history to cross-validate on")
+    parser.add_argument("--workers", type=int, default=1, help="processes to run the fits in")
+    parser.add_argument("--budget", type=float, default=BUDGET_SECONDS, help="wall-clock seconds per ticker")
+    parser.add_argument("--candidates", type=int, default=CANDIDATES)
+    parser.add_argument("--folds", type=int, default=FOLDS)
+    parser.add_argument("--eta", type=int, default=ETA, help="keep the best 1/eta at each rung")
+    parser.add_argument("--train", action="store_true", help="refit the models with the chosen configs")
+    args = parser.parse_args()
+
+    init_db()
+    tune_tickers(
+        args.tickers,
+        years_back=args.years,
+        workers=args.workers,
+        budget_seconds=args.budget,
+        candidates=args.candidates,
+        folds=args.folds,
+        eta=args.eta,
+        train=args.train,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+# portfolio_risk.py
+"""
+Risk sizing for a whole set of positions at once (POST /api/risk).
+
+/api/stocks/{ticker}/risk sizes one trade from the ticker's last ATR. Here
+every ticker's bars are loaded in one load_bars call (from the bar store),
+the ATRs come from the streaming indicator engine, and stops, targets and
+share counts are computed for all positions as numpy arrays with the same
+rule.
+
+Portfolio numbers use daily close-to-close returns over the window the
+tickers share (dates where every one of them has a bar):
+
+  covariance            of daily returns, one centered matrix product
+  volatility            annualized stdev of the portfolio's daily return,
+                        sqrt(v' S v) for dollar values v, over equity
+  correlated_exposure   sqrt(v' C v) with C the correlation matrix; equal
+                        to the gross exposure when everything moves
+                        together, smaller the more the book diversifies
+  risk_contribution     v_i (S v)_i / v' S v per position, sums to 1
+
+Positions are valued at their last close. Held positions keep their share
+count; candidate entries (no shares given) are sized by the ATR rule.
+"""
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+from loader import load_bars, load_latest
+
+
+TRADING_DAYS = 252
+# ATRs come from the same year of bars as /api/stocks/{ticker}/risk, so both
+# endpoints size a ticker the same whatever the covariance window
+ATR_WINDOW_DAYS = 365
+# fewer shared returns than this and the covariance is not reported
+MIN_SHARED_RETURNS = 20
+
+
+def atr_levels(entry, atr, equity, risk_per_trade, atr_mult_sl, atr_mult_tp):
+    """
+    Vector form of the /risk rule: stop, target and recommended shares for
+    arrays of entry prices and ATRs. Also returns the reason each row is
+    unusable, or None.
+    """
+    entry = np.asarray(entry, dtype=np.float64)
+    atr = np.asarray(atr, dtype=np.float64)
+    sl = entry - atr_mult_sl * atr
+    tp = entry + atr_mult_tp * atr
+    risk_amt = equity * risk_per_trade
+    with np.errstate(divide='ignore', invalid='ignore'):
+        shares = np.minimum(risk_amt / (entry - sl), equity / entry)
+
+    # same checks, in the same order, as the single-ticker endpoint
+    errors = np.full(len(entry), None, dtype=object)
+    errors[~(sl > 0)] = 'stop loss bad'
+    errors[~(atr > 0)] = 'atr problem'
+    errors[np.isnan(atr)] = 'no data'
+    errors[~(entry > 0)] = 'bad entry'
+    ok = np.equal(errors, None)
+    shares = np.where(ok, np.floor(np.where(ok, shares, 0)), 0).astype(np.int64)
+    return sl, tp, shares, errors
+
+
+def _returns(bars, tickers, start):
+    """
+    (dates, daily close returns) over the dates every ticker has a bar
+    since start; dates are those of the closes the returns span.
+    """
+    closes = pd.concat({t: bars[t]['Close'] for t in tickers}, axis=1, join='inner')
+    closes = closes[closes.index >= start]
+    values = closes.to_numpy(dtype=np.float64)
+    if len(values) < 2:
+        return closes.index, np.empty((0, len(tickers)))
+    return closes.index, values[1:] / values[:-1] - 1
+
+
+def assess(positions, equity=100000.0, risk_per_trade=0.01, atr_mult_sl=1.5, atr_mult_tp=3.0,
+           lookback_days=365):
+    """
+    positions: [{"ticker", "entry_price", "shares" (optional)}]. Returns the
+    per-position sizing and the portfolio numbers described above.
+    """
+    tickers = [p["ticker"].upper() for p in positions]
+    unique = list(dict.fromkeys(tickers))
+    start = date.today() - timedelta(days=lookback_days)
+    atr_start = date.today() - timedelta(days=ATR_WINDOW_DAYS)
+    bars = load_bars(unique, min(start, atr_start).strftime("%Y-%m-%d"))
+    atr_from = pd.Timestamp(atr_start)
+    atr_bars = {t: df[df.index >= atr_from] for t, df in bars.items()}
+    latest = load_latest(unique, atr_start.strftime("%Y-%m-%d"), bars=atr_bars)
+
+    entry = np.array([p["entry_price"] for p in positions], dtype=np.float64)
+    atr = np.array([latest[t][1]['ATR'] if t in latest else np.nan for t in tickers])
+    last = np.array([bars[t]['Close'].iloc[-1] if t in latest else np.nan for t in tickers])
+    sl, tp, recommended, errors = atr_levels(entry, atr, equity, risk_per_trade, atr_mult_sl, atr_mult_tp)
+    ok = np.equal(errors, None)
+
+    held = np.array([p.get("shares") is not None for p in positions])
+    shares = np.where(held, [p.get("shares") or 0 for p in positions], recommended).astype(np.float64)
+    shares[~ok] = 0
+    value = shares * np.nan_to_num(last)
+    stop_risk = shares * np.maximum(entry - sl, 0)
+
+    rows = []
+    for i, ticker in enumerate(tickers):
+        row = {"ticker": ticker, "entry_price": float(entry[i])}
+        if not ok[i]:
+            row["error"] = errors[i]
+            rows.append(row)
+            continue
+        row.update({
+            "atr": float(atr[i]),
+            "stop_loss": float(sl[i]),
+            "take_profit": float(tp[i]),
+            "recommended_shares": int(recommended[i]),
+            "shares": float(shares[i]),
+            "last_close": float(last[i]),
+            "value": float(value[i]),
+            "weight": float(value[i] / equity),
+            "dollar_risk": float(stop_risk[i]),
+        })
+        rows.append(row)
+
+    portfolio = {
+        "equity": equity,
+        "positions": int(ok.sum()),
+        "gross_exposure": float(np.abs(value).sum()),
+        "dollar_risk": float(stop_risk.sum()),
+        "risk_pct": float(stop_risk.sum() / equity),
+    }
+    result = {"positions": rows, "portfolio": portfolio}
+
+    # positions in the same ticker are one exposure in the covariance
+    names = list(dict.fromkeys(t for t, good in zip(tickers, ok) if good))
+    if not names:
+        return result
+    column = {t: j for j, t in enumerate(names)}
+    exposure = np.zeros(len(names))
+    np.add.at(exposure, [column[t] for t in np.asarray(tickers)[ok]], value[ok])
+
+    dates, returns = _returns(bars, names, pd.Timestamp(start))
+    window = {"days": len(returns)}
+    result["window"] = window
+    if len(returns) < MIN_SHARED_RETURNS:
+        window["error"] = "not enough shared history"
+        return result
+    window.update({"start": dates[0].strftime("%Y-%m-%d"), "end": dates[-1].strftime("%Y-%m-%d")})
+
+    centered = returns - returns.mean(axis=0)
+    cov = centered.T @ centered / (len(returns) - 1)
+    std = np.sqrt(np.diag(cov))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        corr = np.nan_to_num(cov / np.outer(std, std))
+    np.fill_diagonal(corr, 1.0)
+
+    cov_v = cov @ exposure
+    variance = float(exposure @ cov_v)
+    daily_vol = np.sqrt(max(variance, 0.0))
+    correlated = np.sqrt(max(float(exposure @ corr @ exposure), 0.0))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        contribution = np.where(variance > 0, exposure * cov_v / variance, 0.0)
+
+    portfolio.update({
+        "volatility": float(daily_vol * np.sqrt(TRADING_DAYS) / equity),
+        "daily_volatility_dollars": float(daily_vol),
+        "correlated_exposure": float(correlated),
+        "diversification": float(correlated / portfolio["gross_exposure"]) if portfolio["gross_exposure"] else None,
+    })
+    for row in rows:
+        if "error" in row:
+            continue
+        j = column[row["ticker"]]
+        row["volatility"] = float(std[j] * np.sqrt(TRADING_DAYS))
+        # a ticker's share of the risk is split over its rows by value
+        row["risk_contribution"] = float(contribution[j] * row["value"] / exposure[j]) if exposure[j] else 0.0
+    result["covariance"] = {
+        "tickers": names,
+        "matrix": np.round(cov * TRADING_DAYS, 8).tolist(),   # annualized
+        "correlation": np.round(corr, 4).tolist(),
+    }
+    return result
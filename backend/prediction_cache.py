@@ -0,0 +1,155 @@
+# prediction_cache.py
+"""
+Cache of model outputs keyed by (ticker, latest bar date, model version).
+
+A prediction can only change when a new daily bar arrives or the model is
+retrained, so get_prediction looks here first. Only the newest key per
+ticker is kept in memory; with spill enabled it is also written to the
+prediction_cache table so other processes and restarts can reuse it.
+
+Resolving the current key costs a model-version and bar-store check, so a
+key confirmed less than `revalidate_seconds` ago is trusted as-is
+(recent()), which answers most calls without any I/O.
+
+train_for_tickers calls invalidate() for the tickers it retrains.
+"""
+import os
+import threading
+import time
+
+from db import SessionLocal, CachedPrediction
+
+
+class PredictionCache:
+    def __init__(self, spill=False, revalidate_seconds=5.0):
+        self.spill = spill
+        self.revalidate_seconds = revalidate_seconds
+        self._entries = {}   # ticker -> (bar_date, model_version, prediction)
+        self._verified = {}  # ticker -> monotonic time the key was last confirmed current
+        self._lock = threading.Lock()
+        self.recent_hits = 0
+        self.hits = 0
+        self.spill_hits = 0
+        self.misses = 0
+
+    def recent(self, ticker):
+        """Prediction whose key was confirmed current within revalidate_seconds, else None."""
+        with self._lock:
+            verified = self._verified.get(ticker)
+            entry = self._entries.get(ticker)
+            if entry is None or verified is None or time.monotonic() - verified > self.revalidate_seconds:
+                return None
+            self.recent_hits += 1
+            return entry[2]
+
+    def get(self, ticker, bar_date, model_version):
+        with self._lock:
+            entry = self._entries.get(ticker)
+            if entry is not None and entry[0] == bar_date and entry[1] == model_version:
+                self.hits += 1
+                self._verified[ticker] = time.monotonic()
+                return entry[2]
+
+        if self.spill:
+            row = self._spill_get(ticker)
+            if row is not None and row.bar_date == bar_date and row.model_version == model_version:
+                with self._lock:
+                    self._entries[ticker] = (bar_date, model_version, row.prediction)
+                    self._verified[ticker] = time.monotonic()
+                    self.spill_hits += 1
+                return row.prediction
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, ticker, bar_date, model_version, prediction):
+        with self._lock:
+            self._entries[ticker] = (bar_date, model_version, prediction)
+            self._verified[ticker] = time.monotonic()
+        if self.spill:
+            self._spill_put(ticker, bar_date, model_version, prediction)
+
+    def seed(self, ticker, bar_date, model_version, prediction):
+        """Restore a saved prediction; unlike put() it is not trusted by recent()."""
+        with self._lock:
+            self._entries.setdefault(ticker, (bar_date, model_version, prediction))
+
+    def invalidate(self, tickers=None):
+        with self._lock:
+            if tickers is None:
+                self._entries.clear()
+                self._verified.clear()
+            else:
+                for ticker in tickers:
+                    self._entries.pop(ticker, None)
+                    self._verified.pop(ticker, None)
+        if self.spill:
+            self._spill_delete(tickers)
+
+    def stats(self):
+        with self._lock:
+            cached = self.recent_hits + self.hits + self.spill_hits
+            lookups = cached + self.misses
+            return {
+                "entries": len(self._entries),
+                "spill": self.spill,
+                "revalidate_seconds": self.revalidate_seconds,
+                "recent_hits": self.recent_hits,
+                "hits": self.hits,
+                "spill_hits": self.spill_hits,
+                "misses": self.misses,
+                "hit_rate": round(cached / lookups, 4) if lookups else 0.0,
+            }
+
+    # ----- SQLite spill -----
+    def _spill_get(self, ticker):
+        db = SessionLocal()
+        try:
+            return db.get(CachedPrediction, ticker)
+        except Exception as e:
+            print(f"[prediction_cache] spill read failed for {ticker}: {e}")
+            return None
+        finally:
+            db.close()
+
+    def _spill_put(self, ticker, bar_date, model_version, prediction):
+        db = SessionLocal()
+        try:
+            db.merge(CachedPrediction(
+                ticker=ticker,
+                bar_date=bar_date,
+                model_version=model_version,
+                prediction=prediction,
+            ))
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            print(f"[prediction_cache] spill write failed for {ticker}: {e}")
+        finally:
+            db.close()
+
+    def _spill_delete(self, tickers):
+        db = SessionLocal()
+        try:
+            query = db.query(CachedPrediction)
+            if tickers is not None:
+                query = query.filter(CachedPrediction.ticker.in_(list(tickers)))
+            query.delete(synchronize_session=False)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            print(f"[prediction_cache] spill delete failed: {e}")
+        finally:
+            db.close()
+
+
+prediction_cache = PredictionCache(
+    spill=os.environ.get("AUGUR_PREDICTION_SPILL", "0") == "1",
+    revalidate_seconds=float(os.environ.get("AUGUR_PREDICTION_REVALIDATE", 5)),
+)
+
+
+def invalidate(tickers=None):
+    """Invalidation hook for training code: drop cached predictions for tickers."""
+    prediction_cache.invalidate(tickers)
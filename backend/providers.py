@@ -0,0 +1,189 @@
+# providers.py
+"""
+Market data providers used by loader.load_stocks.
+
+A provider only knows how to fetch raw OHLCV bars (daily, or one of
+INTRADAY_INTERVALS) for a list of tickers over a [start, end) date range,
+and the latest traded price. Caching and indicators live in
+loader.py / bar_store.py, so swapping providers (yfinance in production,
+CSV fixtures in tests) does not change anything downstream.
+"""
+import os
+
+import pandas as pd
+
+# yfinance takes ~0.7s to import, so it is loaded on first use; quotes.py and
+# api_server.py go through _yfinance() too, so replacing this attribute with
+# a fake (benchmarks/synthetic.install) covers every caller
+yf = None
+
+
+def _yfinance():
+    global yf
+    if yf is None:
+        import yfinance
+        yf = yfinance
+    return yf
+
+
+OHLCV_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Adj Close', 'Volume']
+
+INTRADAY_INTERVALS = ("1m", "5m", "15m", "30m", "1h")
+INTERVALS = ("1d",) + INTRADAY_INTERVALS
+
+# Yahoo rejects intraday requests spanning more than this many days
+_YF_MAX_SPAN_DAYS = {"1m": 7, "5m": 59, "15m": 59, "30m": 59, "1h": 729}
+
+
+def normalize_ohlcv(df, intraday=False):
+    """
+    Return a copy of df with a naive DatetimeIndex named 'Date' and exactly
+    the OHLCV_COLUMNS columns, sorted by date. Daily bars are dated at
+    midnight; intraday bars keep their (exchange local) time of day.
+    """
+    if df is None or df.empty:
+        return pd.DataFrame(columns=OHLCV_COLUMNS, index=pd.DatetimeIndex([], name='Date'))
+
+    df = df.copy()
+    if isinstance(df.columns, pd.MultiIndex):
+        # keep whichever level holds the price field names
+        for level in range(df.columns.nlevels):
+            if 'Close' in df.columns.get_level_values(level):
+                df.columns = df.columns.get_level_values(level)
+                break
+    if 'Adj Close' not in df.columns and 'Close' in df.columns:
+        df['Adj Close'] = df['Close']
+    df = df[OHLCV_COLUMNS].astype(float)
+
+    index = pd.DatetimeIndex(df.index).as_unit('ns')
+    if index.tz is not None:
+        index = index.tz_localize(None)
+    df.index = (index if intraday else index.normalize()).rename('Date')
+    df = df[~df.index.duplicated(keep='last')].sort_index()
+    return df.dropna(subset=['Close'])
+
+
+class YFinanceProvider:
+    """Downloads bars from Yahoo Finance, batching all tickers into one call."""
+
+    name = "yfinance"
+
+    def fetch(self, tickers, start, end, interval="1d"):
+        tickers = list(tickers)
+        if not tickers:
+            return {}
+        span = _YF_MAX_SPAN_DAYS.get(interval)
+        start, end = pd.Timestamp(start), pd.Timestamp(end)
+        if span and end - start > pd.Timedelta(days=span):
+            # one call per allowed span, stitched back together per ticker
+            parts = {}
+            edges = list(pd.date_range(start, end, freq=f"{span}D")) + [end]
+            for lo, hi in zip(edges[:-1], edges[1:]):
+                if lo < hi:
+                    for ticker, df in self._fetch(tickers, lo, hi, interval).items():
+                        parts.setdefault(ticker, []).append(df)
+            return {t: normalize_ohlcv(pd.concat(dfs), intraday=True) for t, dfs in parts.items()}
+        return self._fetch(tickers, start, end, interval)
+
+    def _fetch(self, tickers, start, end, interval):
+        raw = _yfinance().download(
+            tickers,
+            start=start.strftime("%Y-%m-%d"),
+            end=end.strftime("%Y-%m-%d"),
+            interval=interval,
+            group_by='ticker',
+            auto_adjust=False,
+            progress=False,
+            threads=True,
+        )
+        if raw is None or raw.empty:
+            return {}
+
+        result = {}
+        for ticker in tickers:
+            if isinstance(raw.columns, pd.MultiIndex):
+                if ticker not in raw.columns.get_level_values(0):
+                    continue
+                df = raw[ticker]
+            else:
+                df = raw
+            df = normalize_ohlcv(df, intraday=interval != "1d")
+            if not df.empty:
+                result[ticker] = df
+        return result
+
+    def latest_prices(self, tickers):
+        """Last traded price per ticker (today's partial bar included), one batched call."""
+        tickers = list(tickers)
+        if not tickers:
+            return {}
+        raw = _yfinance().download(
+            tickers,
+            period="5d",
+            interval="1d",
+            group_by='ticker',
+            auto_adjust=False,
+            progress=False,
+            threads=True,
+        )
+        return _last_closes(raw, tickers)
+
+
+def _last_closes(raw, tickers):
+    prices = {}
+    if raw is None or raw.empty:
+        return prices
+    for ticker in tickers:
+        if isinstance(raw.columns, pd.MultiIndex):
+            if ticker not in raw.columns.get_level_values(0):
+                continue
+            close = raw[ticker]['Close']
+        else:
+            close = raw['Close']
+        close = close.dropna()
+        if not close.empty and close.iloc[-1] > 0:
+            prices[ticker] = round(float(close.iloc[-1]), 2)
+    return prices
+
+
+class FixtureProvider:
+    """
+    Reads bars from <fixture_dir>/<TICKER>.csv (columns Date, Open, High,
+    Low, Close, [Adj Close,] Volume), or <TICKER>_<interval>.csv for
+    intraday bars. Used by tests and offline runs.
+    """
+
+    name = "fixture"
+
+    def __init__(self, fixture_dir):
+        self.fixture_dir = fixture_dir
+
+    def fetch(self, tickers, start, end, interval="1d"):
+        result = {}
+        for ticker in tickers:
+            name = ticker if interval == "1d" else f"{ticker}_{interval}"
+            path = os.path.join(self.fixture_dir, f"{name}.csv")
+            if not os.path.exists(path):
+                continue
+            df = normalize_ohlcv(pd.read_csv(path, index_col='Date', parse_dates=True), intraday=interval != "1d")
+            df = df[(df.index >= pd.Timestamp(start)) & (df.index < pd.Timestamp(end))]
+            if not df.empty:
+                result[ticker] = df
+        return result
+
+    def latest_prices(self, tickers):
+        prices = {}
+        for ticker, df in self.fetch(tickers, "1900-01-01", "2100-01-01").items():
+            prices[ticker] = round(float(df['Close'].iloc[-1]), 2)
+        return prices
+
+
+def provider_from_env():
+    """
+    Build the provider named by AUGUR_DATA_PROVIDER ("yfinance" by default,
+    or "fixture" which reads CSVs from AUGUR_FIXTURE_DIR).
+    """
+    name = os.environ.get("AUGUR_DATA_PROVIDER", "yfinance").lower()
+    if name == "fixture":
+        return FixtureProvider(os.environ.get("AUGUR_FIXTURE_DIR", "fixtures"))
+    return YFinanceProvider()
@@ -0,0 +1,341 @@
+# quotes.py
+"""
+Cached quote and company-name lookups for the stock endpoints.
+
+yf.Ticker(t).info is a slow metadata call, and we only need two things from
+it. Prices and names change at very different speeds, so each has its own TTL:
+price_ttl is seconds and name_ttl is days. Once the name is known, a price
+refresh goes through the loader's provider (a small batched download), not
+through .info.
+
+Concurrent lookups for the same ticker share one in-flight fetch. A price
+that has expired but is within `stale_ttl` of expiry is still returned
+right away, and a background refresh is started (stale-while-revalidate).
+A missing company name is handled the same way.
+
+With spill enabled (AUGUR_QUOTE_SPILL=1, set by start_server.py for
+multiple workers) fetched quotes are also written to the quote_cache
+table. A worker with a local miss reads the table before going upstream,
+so one fetch serves all workers.
+"""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, Future
+
+from loader import get_provider
+from db import SessionLocal, CachedQuote
+from providers import _yfinance
+import metrics
+
+
+@metrics.timed("quotes.get_price")
+def get_price(stock_obj, stock_info):
+    price = stock_info.get('currentPrice') or stock_info.get('regularMarketPrice') or stock_info.get('previousClose')
+    if not price or price == 0:
+        try:
+            history = stock_obj.history(period='1d')
+            if not history.empty:
+                price = history['Close'].iloc[-1]
+        except Exception:
+            pass
+    return round(float(price), 2) if price and price > 0 else None
+
+
+def get_companyname(stock_info):
+    return stock_info.get('longName') or stock_info.get('shortName') or None
+
+
+class _Entry:
+    __slots__ = ('symbol', 'price', 'price_at', 'company_name', 'name_at')
+
+    def __init__(self):
+        self.symbol = None
+        self.price = None
+        self.price_at = None
+        self.company_name = None
+        self.name_at = None
+
+
+class QuoteCache:
+    def __init__(self, price_ttl=15.0, name_ttl=3 * 86400.0, stale_ttl=60.0, fetch_timeout=20.0,
+                 max_background=4, spill=False):
+        self.spill = spill
+        self.price_ttl = price_ttl
+        self.name_ttl = name_ttl
+        self.stale_ttl = stale_ttl
+        self.fetch_timeout = fetch_timeout
+        self._entries = {}    # ticker -> _Entry
+        self._inflight = {}   # (ticker, kind) -> Future
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max_background, thread_name_prefix="quotes")
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.spill_hits = 0
+        self.revalidations = 0
+        self.info_fetches = 0
+        self.price_fetches = 0
+        self.errors = 0
+
+    def get(self, ticker):
+        """
+        Quote for ticker as {'symbol', 'price', 'company_name', 'age_s', 'stale'},
+        or None if the symbol does not exist. Fetch errors propagate when
+        there is nothing cached to fall back on.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(ticker)
+            if entry is not None and entry.name_at is not None and entry.symbol is None:
+                # cached "does not exist", kept for price_ttl
+                if now - entry.name_at <= self.price_ttl:
+                    self.hits += 1
+                    return None
+                entry = None
+            name_fresh = entry is not None and entry.name_at is not None and now - entry.name_at <= self.name_ttl
+            price_age = now - entry.price_at if entry is not None and entry.price_at is not None else None
+
+            if price_age is not None and price_age <= self.price_ttl:
+                self.hits += 1
+                fresh = True
+            elif price_age is not None and price_age <= self.price_ttl + self.stale_ttl:
+                self.stale_hits += 1
+                fresh = False
+            else:
+                self.misses += 1
+                fresh = None
+
+        if fresh is None:
+            # nothing usable: fetch inline (joining any fetch already running)
+            kind = 'price' if name_fresh else 'info'
+            self._flight(ticker, kind)
+            with self._lock:
+                entry = self._entries.get(ticker)
+                if entry is None or entry.symbol is None:
+                    return None
+                return self._quote(entry, time.monotonic())
+
+        if not fresh:
+            self._revalidate(ticker, 'price' if name_fresh else 'info')
+        elif not name_fresh:
+            self._revalidate(ticker, 'info')
+        with self._lock:
+            return self._quote(entry, now)
+
+    def put_price(self, ticker, price):
+        """Record a price fetched elsewhere (e.g. by the refresh engine)."""
+        if not price:
+            return
+        with self._lock:
+            entry = self._entries.get(ticker)
+            if entry is None or entry.symbol is None:
+                return
+            entry.price = price
+            entry.price_at = time.monotonic()
+        if self.spill:
+            self._spill_put(ticker)
+
+    def seed(self, ticker, company_name, price, age_s):
+        """Restore a quote saved before a restart, as if fetched age_s seconds ago."""
+        with self._lock:
+            if ticker in self._entries:
+                return
+            entry = self._entries[ticker] = _Entry()
+            entry.symbol = ticker
+            entry.company_name = company_name
+            entry.name_at = time.monotonic()
+            if price:
+                entry.price = price
+                entry.price_at = time.monotonic() - max(age_s, 0.0)
+
+    def invalidate(self, tickers=None):
+        with self._lock:
+            if tickers is None:
+                self._entries.clear()
+            else:
+                for ticker in tickers:
+                    self._entries.pop(ticker, None)
+
+    def stats(self):
+        with self._lock:
+            served = self.hits + self.stale_hits
+            lookups = served + self.misses
+            return {
+                'entries': len(self._entries),
+                'price_ttl': self.price_ttl,
+                'name_ttl': self.name_ttl,
+                'stale_ttl': self.stale_ttl,
+                'hits': self.hits,
+                'stale_hits': self.stale_hits,
+                'misses': self.misses,
+                'coalesced': self.coalesced,
+                'spill': self.spill,
+                'spill_hits': self.spill_hits,
+                'revalidations': self.revalidations,
+                'info_fetches': self.info_fetches,
+                'price_fetches': self.price_fetches,
+                'errors': self.errors,
+                'inflight': len(self._inflight),
+                'hit_rate': round(served / lookups, 4) if lookups else 0.0,
+            }
+
+    def _quote(self, entry, now):
+        age = now - entry.price_at if entry.price_at is not None else None
+        return {
+            'symbol': entry.symbol,
+            'price': entry.price,
+            'company_name': entry.company_name,
+            'age_s': round(age, 3) if age is not None else None,
+            'stale': age is None or age > self.price_ttl,
+        }
+
+    # ----- fetching -----
+    def _flight(self, ticker, kind):
+        """Run one fetch of `kind` for ticker, or wait for the one already running."""
+        key = (ticker, kind)
+        with self._lock:
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._inflight[key] = future
+            else:
+                self.coalesced += 1
+
+        if not owner:
+            return future.result(timeout=self.fetch_timeout)
+
+        try:
+            if not (self.spill and self._spill_get(ticker, kind)):
+                if kind == 'info':
+                    self._fetch_info(ticker)
+                else:
+                    self._fetch_price(ticker)
+                if self.spill:
+                    self._spill_put(ticker)
+            future.set_result(True)
+        except Exception as e:
+            with self._lock:
+                self.errors += 1
+            future.set_exception(e)
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+        return future.result()
+
+    def _revalidate(self, ticker, kind):
+        with self._lock:
+            if (ticker, kind) in self._inflight:
+                return
+            self.revalidations += 1
+        self._pool.submit(self._background, ticker, kind)
+
+    def _background(self, ticker, kind):
+        try:
+            self._flight(ticker, kind)
+        except Exception as e:
+            print(f"[quotes] background refresh of {ticker} failed: {e}")
+
+    def _fetch_info(self, ticker):
+        with metrics.span("quotes.yfinance_info"):
+            stock = _yfinance().Ticker(ticker)
+            info = stock.info
+        with self._lock:
+            self.info_fetches += 1
+        symbol = info.get('symbol') if info else None
+        price = get_price(stock, info) if info else None
+        name = get_companyname(info) if info else None
+
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.setdefault(ticker, _Entry())
+            entry.symbol = symbol
+            entry.company_name = name
+            entry.name_at = now
+            entry.price = price
+            entry.price_at = now if price else None
+
+    def _fetch_price(self, ticker):
+        with metrics.span("quotes.provider_price"):
+            price = get_provider().latest_prices([ticker]).get(ticker)
+        with self._lock:
+            self.price_fetches += 1
+        if not price:
+            # provider had nothing; fall back to the full metadata call
+            self._fetch_info(ticker)
+            return
+        with self._lock:
+            entry = self._entries.setdefault(ticker, _Entry())
+            entry.price = price
+            entry.price_at = time.monotonic()
+
+
+    # ----- SQLite spill -----
+    def _spill_get(self, ticker, kind):
+        """Load a quote another worker fetched; True if it is fresh enough for `kind`."""
+        db = SessionLocal()
+        try:
+            row = db.get(CachedQuote, ticker)
+        except Exception as e:
+            print(f"[quotes] spill read failed for {ticker}: {e}")
+            return False
+        finally:
+            db.close()
+        if row is None or row.name_at is None:
+            return False
+
+        wall, now = time.time(), time.monotonic()
+        name_age = wall - row.name_at
+        price_age = wall - row.price_at if row.price_at is not None else None
+        if row.symbol is None:
+            usable = name_age <= self.price_ttl
+        elif kind == 'info':
+            usable = name_age <= self.name_ttl and price_age is not None and price_age <= self.price_ttl
+        else:
+            usable = price_age is not None and price_age <= self.price_ttl
+        if not usable:
+            return False
+
+        with self._lock:
+            entry = self._entries.setdefault(ticker, _Entry())
+            entry.symbol = row.symbol
+            entry.company_name = row.company_name
+            entry.name_at = now - name_age
+            entry.price = row.price
+            entry.price_at = now - price_age if price_age is not None else None
+            self.spill_hits += 1
+        return True
+
+    def _spill_put(self, ticker):
+        wall, now = time.time(), time.monotonic()
+        with self._lock:
+            entry = self._entries.get(ticker)
+            if entry is None or entry.name_at is None:
+                return
+            row = CachedQuote(
+                ticker=ticker,
+                symbol=entry.symbol,
+                company_name=entry.company_name,
+                name_at=wall - (now - entry.name_at),
+                price=entry.price,
+                price_at=wall - (now - entry.price_at) if entry.price_at is not None else None,
+            )
+        db = SessionLocal()
+        try:
+            db.merge(row)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            print(f"[quotes] spill write failed for {ticker}: {e}")
+        finally:
+            db.close()
+
+
+quote_cache = QuoteCache(
+    price_ttl=float(os.environ.get("AUGUR_QUOTE_PRICE_TTL", 15)),
+    name_ttl=float(os.environ.get("AUGUR_QUOTE_NAME_TTL", 3 * 86400)),
+    stale_ttl=float(os.environ.get("AUGUR_QUOTE_STALE_TTL", 60)),
+    spill=os.environ.get("AUGUR_QUOTE_SPILL", "0") == "1",
+)
@@ -0,0 +1,136 @@
+# refresh.py
+"""
+Refresh engine behind PUT /api/stocks/refresh.
+
+One refresh does a single batched bars download for every tracked ticker
+(through loader.load_latest, which advances the streaming indicators of
+all of them in one pass), one batched price lookup, and then runs the per-ticker
+predictions in a bounded thread pool. A ticker whose prediction is not
+back within ticker_timeout of being submitted (queued behind stuck
+workers or stuck itself) is reported in `timed_out` instead of stalling
+the rest.
+
+The download and the price lookup run side by side and are each given
+fetch_timeout; one that does not answer in time counts as failed. The
+whole refresh is bounded by `deadline` seconds: predictions still queued
+or running then are reported as timed out, so hung workers can delay a
+refresh but never stall it.
+
+Concurrent refresh calls share the one that is already running, so a
+polling client can never stack refreshes on top of each other.
+"""
+import threading
+import time
+
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor, Future, wait, FIRST_COMPLETED, TimeoutError
+from datetime import date, timedelta
+
+from loader import load_latest, get_provider
+
+
+class RefreshEngine:
+    def __init__(self, predict_fn, max_workers=8, ticker_timeout=10.0, lookback_days=365,
+                 fetch_timeout=30.0, deadline=60.0):
+        """
+        predict_fn(ticker, data) -> int prediction, where data is a one-row
+        DataFrame with the indicator values of that ticker's latest bar.
+        """
+        self.predict_fn = predict_fn
+        self.ticker_timeout = ticker_timeout
+        self.lookback_days = lookback_days
+        self.fetch_timeout = fetch_timeout
+        self.deadline = deadline
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="refresh")
+        # downloads get their own threads so hung predictions cannot block them
+        self._io = ThreadPoolExecutor(max_workers=4, thread_name_prefix="refresh-io")
+        self._lock = threading.Lock()
+        self._inflight = None
+
+    def refresh(self, tickers):
+        """Run a refresh, or join the one already in flight."""
+        with self._lock:
+            if self._inflight is not None:
+                future, owner = self._inflight, False
+            else:
+                future, owner = Future(), True
+                self._inflight = future
+
+        if not owner:
+            return future.result()
+
+        try:
+            future.set_result(self._run(list(tickers)))
+        except Exception as e:
+            future.set_exception(e)
+        finally:
+            with self._lock:
+                self._inflight = None
+        return future.result()
+
+    def _run(self, tickers):
+        started = time.perf_counter()
+        if not tickers:
+            return {'results': {}, 'failed': [], 'timed_out': [], 'elapsed_ms': 0.0}
+
+        start_date = (date.today() - timedelta(days=self.lookback_days)).strftime("%Y-%m-%d")
+        prices_job = self._io.submit(get_provider().latest_prices, tickers)
+        latest_job = self._io.submit(load_latest, tickers, start_date)
+        prices = self._result(prices_job, "price lookup", started, {})
+        latest = self._result(latest_job, "bars download", started, {})
+        stock_data = {
+            ticker: pd.DataFrame([values], index=[bar_date])
+            for ticker, (bar_date, values) in latest.items()
+        }
+
+        failed = [t for t in tickers if t not in prices]
+        results = {}
+        pending = {}
+        for ticker in tickers:
+            if ticker in prices:
+                fut = self._pool.submit(self._predict, ticker, stock_data.get(ticker))
+                pending[fut] = ticker
+        predict_deadline = min(time.perf_counter() + self.ticker_timeout, started + self.deadline)
+
+        timed_out = []
+        while pending:
+            done, _ = wait(list(pending), timeout=0.05, return_when=FIRST_COMPLETED)
+            for fut in done:
+                ticker = pending.pop(fut)
+                try:
+                    pred = fut.result()
+                except Exception as e:
+                    print(f"[refresh] prediction failed for {ticker}: {e}")
+                    pred = -1
+                results[ticker] = {'price': prices[ticker], 'prediction': pred}
+
+            if time.perf_counter() > predict_deadline:
+                # queued ones are dropped; running ones keep their worker,
+                # but nobody waits for them
+                for fut, ticker in pending.items():
+                    fut.cancel()
+                    timed_out.append(ticker)
+                break
+
+        return {
+            'results': results,
+            'failed': failed,
+            'timed_out': timed_out,
+            'elapsed_ms': round((time.perf_counter() - started) * 1000, 1),
+        }
+
+    def _result(self, future, what, started, default):
+        """future's result, or default if it fails or outlives fetch_timeout / the deadline."""
+        timeout = min(self.fetch_timeout, max(0.0, self.deadline - (time.perf_counter() - started)))
+        try:
+            return future.result(timeout=timeout)
+        except TimeoutError:
+            print(f"[refresh] {what} timed out after {timeout:.1f}s")
+        except Exception as e:
+            print(f"[refresh] {what} failed: {e}")
+        return default
+
+    def _predict(self, ticker, data):
+        if data is None or data.empty:
+            return -1
+        return self.predict_fn(ticker, data)
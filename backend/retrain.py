@@ -0,0 +1,343 @@
+# retrain.py
+"""
+Scheduled retraining that only does the work the new data calls for.
+
+A nightly full refit of every model spends minutes of CPU per ticker on
+a few new bars. retrain_tickers() instead picks one of three modes per
+ticker, and records each choice as a TrainingRun row (db.py):
+
+  skipped      the training rows hash to the fingerprint of the last run
+               (weekends, holidays, halted tickers)
+  incremental  there are new bars: the XGBoost member keeps boosting from
+               its previous booster on the recent rows, the logistic
+               regression is refit (milliseconds) and the random forest
+               is kept as it is
+  full         no usable previous model, the last full refit is older than
+               AUGUR_FULL_REFIT_DAYS, too many new bars, or drift: the
+               previous model scored AUGUR_DRIFT_TOLERANCE below its
+               hold-out accuracy on the bars it had not seen
+
+To compare like with like, the fingerprint is taken over data loaded from
+the previous run's start date, and incremental runs keep that start. The
+window therefore grows until the next full refit moves it forward.
+
+    python retrain.py                      # every active model
+    python retrain.py --tickers AAPL MSFT --full
+"""
+import argparse
+import os
+import time
+import uuid
+from datetime import date, datetime, timedelta
+
+import pandas as pd
+from sqlalchemy import func
+
+from db import SessionLocal, TrainedModel, TrainingRun, init_db
+from loader import load_stocks
+import metrics
+import prediction_cache
+
+# train_models (sklearn, xgboost) is imported where it is used, so the API
+# server can list runs and queue retraining without loading it
+
+
+FULL_REFIT_DAYS = float(os.environ.get("AUGUR_FULL_REFIT_DAYS", 7))
+DRIFT_TOLERANCE = float(os.environ.get("AUGUR_DRIFT_TOLERANCE", 0.05))
+# fewer new rows than this are too noisy to judge drift on
+DRIFT_MIN_ROWS = int(os.environ.get("AUGUR_DRIFT_MIN_ROWS", 20))
+# more new rows than this fraction of the window get a full refit
+MAX_NEW_FRACTION = float(os.environ.get("AUGUR_RETRAIN_MAX_NEW_FRACTION", 0.1))
+# boosting rounds added per incremental update, and the recent rows they are fit on
+RETRAIN_ROUNDS = int(os.environ.get("AUGUR_RETRAIN_ROUNDS", 20))
+RECENT_ROWS = int(os.environ.get("AUGUR_RETRAIN_RECENT_ROWS", 250))
+
+
+class _NeedsFullRefit(Exception):
+    pass
+
+
+def active_tickers():
+    """Tickers with an active trained model."""
+    db = SessionLocal()
+    try:
+        return [t for (t,) in db.query(TrainedModel.ticker).filter(TrainedModel.is_active.is_(True)).all()]
+    finally:
+        db.close()
+
+
+def _previous_runs(tickers):
+    """ticker -> {fingerprint, data_start, last_bar, last_full_at} of its latest successful run."""
+    db = SessionLocal()
+    try:
+        done = TrainingRun.mode.in_(("skipped", "incremental", "full"))
+        latest_ids = (
+            db.query(func.max(TrainingRun.id))
+            .filter(TrainingRun.ticker.in_(tickers), done)
+            .group_by(TrainingRun.ticker)
+        )
+        latest = db.query(TrainingRun).filter(TrainingRun.id.in_(latest_ids)).all()
+        last_full = dict(
+            db.query(TrainingRun.ticker, func.max(TrainingRun.started_at))
+            .filter(TrainingRun.ticker.in_(tickers), TrainingRun.mode == "full")
+            .group_by(TrainingRun.ticker)
+            .all()
+        )
+        return {
+            run.ticker: {
+                "fingerprint": run.fingerprint,
+                "data_start": run.data_start,
+                "last_bar": run.last_bar,
+                "last_full_at": last_full.get(run.ticker),
+            }
+            for run in latest
+        }
+    finally:
+        db.close()
+
+
+def _full_refit_reason(prev, rows, new_rows):
+    if prev["last_full_at"] is None:
+        return "no full refit on record"
+    if datetime.utcnow() - prev["last_full_at"] >= timedelta(days=FULL_REFIT_DAYS):
+        return "schedule"
+    if new_rows > MAX_NEW_FRACTION * rows:
+        return "many new bars"
+    return None
+
+
+def _update_one(ticker, df, prev):
+    """
+    Incremental update of ticker's saved model with the rows after
+    prev["last_bar"]. Returns (model, pre_score); raises _NeedsFullRefit
+    when the saved model cannot be continued.
+    """
+    import joblib
+    from sklearn.metrics import accuracy_score
+    import train_models
+    from train_models import FEATURE_COLUMNS
+
+    model_path = os.path.join(train_models.modelDir, f"{ticker}_model.pkl")
+    features_path = os.path.join(train_models.modelDir, f"{ticker}_features.pkl")
+    try:
+        model = joblib.load(model_path)
+        features = joblib.load(features_path)
+    except Exception as e:
+        raise _NeedsFullRefit(f"previous model unreadable: {e}")
+    if list(features) != FEATURE_COLUMNS:
+        raise _NeedsFullRefit("features changed")
+
+    X, y = df[FEATURE_COLUMNS], df['Target']
+    new = df.index > prev["last_bar"]
+    # the newest row has no next close yet, so its target is not a label
+    scored = new.copy()
+    scored[-1] = False
+    pre_score = float(accuracy_score(y[scored], model.predict(X[scored]))) if scored.any() else None
+    if pre_score is not None and scored.sum() >= DRIFT_MIN_ROWS:
+        reference = _reference_score(ticker)
+        if reference is not None and pre_score < reference - DRIFT_TOLERANCE:
+            raise _NeedsFullRefit(f"drift ({pre_score:.3f} vs {reference:.3f})")
+
+    return continue_fit(model, X, y, int(new.sum())), pre_score
+
+
+def continue_fit(model, X, y, new_rows):
+    """
+    Continue a fitted model on X, y, whose last new_rows rows it has not
+    seen: the XGBoost member (or model) boosts RETRAIN_ROUNDS more rounds
+    from its booster, the logistic regression is refit and the random
+    forest is kept. Returns the updated model (an ensemble is updated in
+    place); raises _NeedsFullRefit when the model cannot be continued.
+    """
+    from sklearn.base import clone
+    from sklearn.ensemble import VotingClassifier
+    from xgboost import XGBClassifier
+
+    if isinstance(model, VotingClassifier):
+        names = [name for name, _ in model.estimators]
+        if "xgb" not in names:
+            raise _NeedsFullRefit("ensemble has no booster")
+        booster = model.named_estimators_["xgb"]
+        # the ensemble fits its members on label-encoded targets
+        y = pd.Series(model.le_.transform(y), index=y.index)
+    elif isinstance(model, XGBClassifier):
+        booster = model
+    else:
+        raise _NeedsFullRefit(f"cannot continue a {type(model).__name__}")
+
+    # keep boosting on the new rows plus some recent context for both classes
+    recent = slice(max(0, len(X) - max(RECENT_ROWS, new_rows + 1)), len(X))
+    updated = XGBClassifier(**{**booster.get_params(), "n_estimators": RETRAIN_ROUNDS})
+    try:
+        updated.fit(X.iloc[recent], y.iloc[recent], xgb_model=booster.get_booster())
+    except Exception as e:
+        raise _NeedsFullRefit(f"booster update failed: {e}")
+
+    if booster is model:
+        return updated
+    idx = names.index("xgb")
+    model.estimators_[idx] = updated
+    model.named_estimators_["xgb"] = updated
+    if "lr" in names:
+        lr = clone(model.named_estimators_["lr"]).fit(X, y)
+        model.estimators_[names.index("lr")] = lr
+        model.named_estimators_["lr"] = lr
+    return model
+
+
+def _reference_score(ticker):
+    db = SessionLocal()
+    try:
+        row = db.query(TrainedModel.val_score).filter(TrainedModel.ticker == ticker).one_or_none()
+        return row[0] if row else None
+    finally:
+        db.close()
+
+
+def retrain_tickers(tickers, years_back=3, force_full=False, workers=1):
+    """
+    Bring the models of tickers up to date with their data, doing as
+    little work as possible (see the module docstring). Returns the
+    TrainingRun rows of this batch as dicts.
+    """
+    import train_models
+    from train_models import FEATURE_COLUMNS, fingerprint
+
+    tickers = list(dict.fromkeys(t.strip().upper() for t in tickers if t.strip()))
+    if not tickers:
+        return []
+    batch_id = uuid.uuid4().hex[:12]
+    standard_start = (date.today() - timedelta(days=365 * years_back)).strftime("%Y-%m-%d")
+    prev = {} if force_full else _previous_runs(tickers)
+
+    # load each ticker from where its previous run started
+    by_start = {}
+    for ticker in tickers:
+        by_start.setdefault(prev[ticker]["data_start"] if ticker in prev else standard_start, []).append(ticker)
+    data = {}
+    with metrics.span("retrain.load_data"):
+        for start, group in by_start.items():
+            data.update(load_stocks(group, start))
+
+    runs, full, updated = [], {}, []
+    for ticker in tickers:
+        started = time.perf_counter()
+        run = {"batch_id": batch_id, "ticker": ticker, "started_at": datetime.utcnow()}
+        df = data.get(ticker)
+        if df is None or df.empty:
+            runs.append({**run, "mode": "failed", "reason": "no data"})
+            continue
+        p = prev.get(ticker)
+        if p is None:
+            full[ticker] = "full refit requested" if force_full else "no previous run"
+            continue
+
+        fp = fingerprint(df)
+        new_rows = int((df.index > p["last_bar"]).sum()) if p["last_bar"] else len(df)
+        run.update(fingerprint=fp, data_start=p["data_start"], last_bar=df.index[-1].strftime("%Y-%m-%d"),
+                   rows=len(df), new_rows=new_rows)
+        if fp == p["fingerprint"]:
+            runs.append({**run, "mode": "skipped", "reason": "data unchanged",
+                         "seconds": round(time.perf_counter() - started, 3)})
+            continue
+        reason = _full_refit_reason(p, len(df), new_rows)
+        if reason:
+            full[ticker] = reason
+            continue
+
+        try:
+            with metrics.span("retrain.incremental"):
+                model, pre_score = _update_one(ticker, df, p)
+                train_models.save_model(ticker, model, df[FEATURE_COLUMNS])
+        except _NeedsFullRefit as e:
+            full[ticker] = str(e)
+            continue
+        except Exception as e:
+            print(f"[retrain] incremental update of {ticker} failed: {e}")
+            full[ticker] = f"incremental update failed: {e}"
+            continue
+        updated.append(ticker)
+        runs.append({**run, "mode": "incremental", "reason": f"{new_rows} new bars",
+                     "pre_score": pre_score, "seconds": round(time.perf_counter() - started, 3)})
+        print(f"[retrain] {ticker}: +{RETRAIN_ROUNDS} rounds on {new_rows} new bars")
+
+    with metrics.span("retrain.db_write"):
+        train_models.record_runs(runs)
+        for start, group in by_start.items():
+            group = [t for t in group if t in updated]
+            if group:
+                train_models.record_models({t: None for t in group}, start, date.today().strftime("%Y-%m-%d"))
+    prediction_cache.invalidate(updated)
+
+    if full:
+        print(f"[retrain] full refit for {', '.join(f'{t} ({r})' for t, r in full.items())}")
+        with metrics.span("retrain.full"):
+            train_models.train_for_tickers(list(full), years_back=years_back, workers=workers,
+                                           reasons=full, batch_id=batch_id)
+
+    results = recent_runs(batch_id=batch_id)
+    counts = {}
+    for r in results:
+        counts[r["mode"]] = counts.get(r["mode"], 0) + 1
+    print(f"[retrain] batch {batch_id}: " + ", ".join(f"{n} {mode}" for mode, n in sorted(counts.items())))
+    return results
+
+
+def run_to_dict(run):
+    return {
+        "id": run.id,
+        "batch_id": run.batch_id,
+        "ticker": run.ticker,
+        "mode": run.mode,
+        "reason": run.reason,
+        "fingerprint": run.fingerprint,
+        "data_start": run.data_start,
+        "last_bar": run.last_bar,
+        "rows": run.rows,
+        "new_rows": run.new_rows,
+        "pre_score": run.pre_score,
+        "score": run.score,
+        "seconds": run.seconds,
+        "started_at": run.started_at.isoformat() if run.started_at else None,
+        "error": run.error,
+    }
+
+
+def recent_runs(limit=200, ticker=None, batch_id=None):
+    db = SessionLocal()
+    try:
+        query = db.query(TrainingRun)
+        if ticker:
+            query = query.filter(TrainingRun.ticker == ticker)
+        if batch_id:
+            query = query.filter(TrainingRun.batch_id == batch_id)
+        return [run_to_dict(r) for r in query.order_by(TrainingRun.id.desc()).limit(limit).all()]
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Retrain models whose data changed")
+    parser.add_argument("--tickers", nargs="*", default=None, help="default: every active model")
+    parser.add_argument("--full", action="store_true", help="full refit, ignoring fingerprints")
+    parser.add_argument("--years", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=1, help="processes for full refits")
+    args = parser.parse_args()
+
+    init_db()
+    tickers = args.tickers or active_tickers()
+    if not tickers:
+        print("No tickers to retrain.")
+        return
+    runs = retrain_tickers(tickers, years_back=args.years, force_full=args.full, workers=args.workers)
+    print(f"\n{'Ticker':<8}{'Mode':<13}{'Rows':>7}{'New':>6}{'Pre':>8}{'Score':>8}{'Seconds':>9}  Reason")
+    for r in sorted(runs, key=lambda r: r["ticker"]):
+        pre = f"{r['pre_score']:.4f}" if r["pre_score"] is not None else "-"
+        score = f"{r['score']:.4f}" if r["score"] is not None else "-"
+        seconds = f"{r['seconds']:.2f}" if r["seconds"] is not None else "-"
+        print(f"{r['ticker']:<8}{r['mode']:<13}{r['rows'] or 0:>7}{r['new_rows'] or 0:>6}"
+              f"{pre:>8}{score:>8}{seconds:>9}  {r['reason'] or ''}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,552 @@
+# screener.py
+"""
+Cross-sectional screening of a whole universe at once (GET /api/screener).
+
+A Panel holds the last `max_rows` daily bars of every ticker as 2D arrays
+(date x ticker) together with the compute_indicators set. The indicators
+come from PanelState, the vector form of indicator_engine.IndicatorState:
+every field has one slot per ticker, and each date is folded in for all
+tickers with numpy ops. A mask skips tickers without a bar that day, so
+each column matches what IndicatorState would give that ticker alone
+(different listing dates and gaps included).
+
+Refreshes are incremental. Only bars newer than the panel's last date are
+loaded (the loader fetches just the missing tail) and folded into the
+saved state. The panel is rebuilt when the universe changes or an older
+bar shows up late.
+
+Filters and rankings are small expressions over the panel's last row,
+parsed with ast and evaluated by a whitelist:
+
+    rsi < 30 and cross_above(macd, macd_signal)
+    change(close, 20)                 # rank by 20-bar return
+    close > sma and volume > 2 * prev(volume)
+"""
+import ast
+import os
+import threading
+import time
+from datetime import date, timedelta
+from functools import lru_cache
+
+import numpy as np
+
+from indicator_engine import (
+    INDICATOR_COLUMNS, SMA_WINDOW, EMA_WINDOW, RSI_WINDOW,
+    MACD_FAST, MACD_SLOW, MACD_SIGN, ATR_WINDOW,
+)
+
+
+PRICE_FIELDS = ['Open', 'High', 'Low', 'Close', 'Volume']
+
+# expression name -> panel field
+NAMES = {
+    'open': 'Open', 'high': 'High', 'low': 'Low', 'close': 'Close', 'volume': 'Volume',
+    'sma': 'SMA_3', 'ema': 'EMA_3', 'rsi': 'RSI', 'macd': 'MACD', 'macd_signal': 'MACD_signal', 'atr': 'ATR',
+}
+NAMES.update({col: col for col in INDICATOR_COLUMNS})
+
+MAX_EXPRESSION_LENGTH = 500
+
+
+class ExpressionError(ValueError):
+    pass
+
+
+# -----------------------------------------------------------
+# VECTOR INDICATOR STATE
+# -----------------------------------------------------------
+class PanelState:
+    """
+    IndicatorState for n tickers at once. Same recurrences, in the same
+    order, so the values match it bit for bit; update() advances only the
+    tickers selected by mask.
+    """
+
+    def __init__(self, n):
+        self.n = n
+        self.count = np.zeros(n, dtype=np.int64)
+        self.prev_close = np.zeros(n)
+        self.window = np.zeros((SMA_WINDOW, n))   # ring buffer, slot count % SMA_WINDOW
+        self.window_sum = np.zeros(n)
+        self.ema = np.zeros(n)
+        self.ema_fast = np.zeros(n)
+        self.ema_slow = np.zeros(n)
+        self.signal = np.zeros(n)
+        self.signal_count = np.zeros(n, dtype=np.int64)
+        self.avg_up = np.zeros(n)
+        self.avg_down = np.zeros(n)
+        self.tr_sum = np.zeros(n)
+        self.atr = np.zeros(n)
+
+    def update(self, high, low, close, mask):
+        """Fold in one date; returns {indicator: vector}, NaN where not warmed up or masked."""
+        nan = np.nan
+        count = self.count + mask
+        first = mask & (count == 1)
+        rest = mask & (count > 1)
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            # SMA: running sum over a per-ticker ring buffer
+            slot = self.count % SMA_WINDOW
+            cols = np.arange(self.n)
+            full = mask & (self.count >= SMA_WINDOW)
+            window_sum = np.where(full, self.window_sum - self.window[slot, cols], self.window_sum)
+            self.window_sum = np.where(mask, window_sum + close, window_sum)
+            self.window[slot[mask], cols[mask]] = close[mask]
+            sma = np.where(count >= SMA_WINDOW, self.window_sum / SMA_WINDOW, nan)
+
+            # EMAs seeded with the first close
+            def ewm(prev, alpha):
+                return np.where(first, close, np.where(rest, prev + alpha * (close - prev), prev))
+            self.ema = ewm(self.ema, 2.0 / (EMA_WINDOW + 1))
+            self.ema_fast = ewm(self.ema_fast, 2.0 / (MACD_FAST + 1))
+            self.ema_slow = ewm(self.ema_slow, 2.0 / (MACD_SLOW + 1))
+            ema = np.where(count >= EMA_WINDOW, self.ema, nan)
+
+            # MACD and its signal EMA, which starts at the first MACD value
+            macd_ready = mask & (count >= MACD_SLOW)
+            macd_now = self.ema_fast - self.ema_slow
+            signal_count = self.signal_count + macd_ready
+            alpha = 2.0 / (MACD_SIGN + 1)
+            self.signal = np.where(
+                macd_ready & (signal_count == 1), macd_now,
+                np.where(macd_ready, self.signal + alpha * (macd_now - self.signal), self.signal),
+            )
+            self.signal_count = signal_count
+            macd = np.where(count >= MACD_SLOW, macd_now, nan)
+            signal = np.where(signal_count >= MACD_SIGN, self.signal, nan)
+
+            # RSI with Wilder smoothing; the first bar counts as a 0 move
+            diff = np.where(rest, close - self.prev_close, 0.0)
+            up = np.maximum(diff, 0.0)
+            down = np.maximum(-diff, 0.0)
+            wilder = 1.0 / RSI_WINDOW
+            self.avg_up = np.where(first, up, np.where(rest, self.avg_up + wilder * (up - self.avg_up), self.avg_up))
+            self.avg_down = np.where(
+                first, down, np.where(rest, self.avg_down + wilder * (down - self.avg_down), self.avg_down)
+            )
+            rsi = np.where(
+                count >= RSI_WINDOW,
+                np.where(self.avg_down == 0, 100.0, 100.0 - 100.0 / (1.0 + self.avg_up / self.avg_down)),
+                nan,
+            )
+
+            # ATR: 0 until ATR_WINDOW true ranges are in, then their mean, then Wilder
+            tr = np.where(
+                first, high - low,
+                np.maximum(high - low, np.maximum(np.abs(high - self.prev_close), np.abs(low - self.prev_close))),
+            )
+            warming = mask & (count < ATR_WINDOW)
+            self.atr = np.where(
+                warming, 0.0,
+                np.where(mask & (count == ATR_WINDOW), (self.tr_sum + tr) / ATR_WINDOW,
+                         np.where(mask, (self.atr * (ATR_WINDOW - 1) + tr) / ATR_WINDOW, self.atr)),
+            )
+            self.tr_sum = np.where(warming, self.tr_sum + tr, self.tr_sum)
+
+        self.prev_close = np.where(mask, close, self.prev_close)
+        self.count = count
+        values = {'SMA_3': sma, 'EMA_3': ema, 'RSI': rsi, 'MACD': macd, 'MACD_signal': signal, 'ATR': self.atr}
+        return {col: np.where(mask, v, nan) for col, v in values.items()}
+
+
+# -----------------------------------------------------------
+# PANEL
+# -----------------------------------------------------------
+class Panel:
+    """date x ticker arrays for PRICE_FIELDS and INDICATOR_COLUMNS, NaN where a ticker has no bar."""
+
+    def __init__(self, tickers, dates, fields, state):
+        self.tickers = tickers
+        self.dates = dates        # datetime64[D], ascending
+        self.fields = fields      # name -> (rows, len(tickers)) float64
+        self.state = state        # PanelState after the last row
+        self.built_at = time.time()
+
+    @property
+    def last_date(self):
+        return self.dates[-1] if len(self.dates) else None
+
+
+def _columns(frames):
+    """{ticker: (dates as datetime64[D], {field: float64 array})}, converted once per load."""
+    bars = {}
+    for ticker, df in frames.items():
+        if not df.empty:
+            # one array per frame; per-column lookups cost more than the data at 500 tickers
+            values = df.to_numpy(dtype=np.float64)
+            columns = list(df.columns)
+            positions = [columns.index(f) for f in PRICE_FIELDS]
+            bars[ticker] = (
+                df.index.values.astype('datetime64[D]'),
+                {f: values[:, i] for f, i in zip(PRICE_FIELDS, positions)},
+            )
+    return bars
+
+
+def _split(bars, last):
+    """bars up to and including `last`, and those after it."""
+    seen, new = {}, {}
+    for ticker, (stamps, values) in bars.items():
+        cut = np.searchsorted(stamps, last, side='right')
+        seen[ticker] = (stamps[:cut], {f: v[:cut] for f, v in values.items()})
+        new[ticker] = (stamps[cut:], {f: v[cut:] for f, v in values.items()})
+    return seen, new
+
+
+def _stack(bars, tickers, dates):
+    """(rows, tickers) arrays of PRICE_FIELDS from _columns() bars, plus the has-a-bar mask."""
+    shape = (len(dates), len(tickers))
+    prices = {f: np.full(shape, np.nan) for f in PRICE_FIELDS}
+    mask = np.zeros(shape, dtype=bool)
+    for j, ticker in enumerate(tickers):
+        if ticker not in bars:
+            continue
+        stamps, values = bars[ticker]
+        rows = np.searchsorted(dates, stamps)
+        on_axis = rows < len(dates)
+        on_axis[on_axis] = dates[rows[on_axis]] == stamps[on_axis]
+        rows = rows[on_axis]
+        for f in PRICE_FIELDS:
+            prices[f][rows, j] = values[f][on_axis]
+        mask[rows, j] = True
+    return prices, mask
+
+
+def _fold(state, prices, mask):
+    """Run every row through state; returns the indicator arrays for those rows."""
+    out = {col: np.empty(mask.shape) for col in INDICATOR_COLUMNS}
+    for i in range(mask.shape[0]):
+        values = state.update(prices['High'][i], prices['Low'][i], prices['Close'][i], mask[i])
+        for col in INDICATOR_COLUMNS:
+            out[col][i] = values[col]
+    return out
+
+
+def _dates_of(bars):
+    stamps = [stamps for stamps, _ in bars.values() if len(stamps)]
+    return np.unique(np.concatenate(stamps)) if stamps else np.array([], dtype='datetime64[D]')
+
+
+# -----------------------------------------------------------
+# EXPRESSIONS
+# -----------------------------------------------------------
+_COMPARE = {
+    ast.Lt: np.less, ast.LtE: np.less_equal, ast.Gt: np.greater,
+    ast.GtE: np.greater_equal, ast.Eq: np.equal, ast.NotEq: np.not_equal,
+}
+_BINARY = {
+    ast.Add: np.add, ast.Sub: np.subtract, ast.Mult: np.multiply,
+    ast.Div: np.divide, ast.Pow: np.power, ast.Mod: np.mod,
+}
+
+
+def _lag(node):
+    if not isinstance(node, ast.Constant) or not isinstance(node.value, int) or node.value < 0:
+        raise ExpressionError("lags must be non-negative integer literals")
+    return node.value
+
+
+@lru_cache(maxsize=256)
+def compile_expression(text):
+    """
+    Compile text into fn(fields, offset) -> vector over tickers, where
+    offset counts rows back from the last one. Only the names in NAMES,
+    numbers, arithmetic, comparisons, and/or/not and the functions below
+    are accepted.
+    """
+    if len(text) > MAX_EXPRESSION_LENGTH:
+        raise ExpressionError(f"expression longer than {MAX_EXPRESSION_LENGTH} characters")
+    try:
+        tree = ast.parse(text, mode='eval')
+    except SyntaxError as e:
+        raise ExpressionError(f"invalid expression: {e.msg}")
+    return _compile(tree.body)
+
+
+def _compile(node):
+    if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)) and not isinstance(node.value, bool):
+        value = float(node.value)
+        return lambda fields, offset: value
+
+    if isinstance(node, ast.Name):
+        if node.id not in NAMES:
+            raise ExpressionError(f"unknown name {node.id!r}; use one of {', '.join(sorted(NAMES))}")
+        field = NAMES[node.id]
+        return lambda fields, offset: _row(fields[field], offset)
+
+    if isinstance(node, ast.BoolOp):
+        parts = [_compile(v) for v in node.values]
+        combine = np.logical_and if isinstance(node.op, ast.And) else np.logical_or
+
+        def boolop(fields, offset):
+            result = np.asarray(parts[0](fields, offset), dtype=bool)
+            for part in parts[1:]:
+                result = combine(result, np.asarray(part(fields, offset), dtype=bool))
+            return result
+        return boolop
+
+    if isinstance(node, ast.UnaryOp):
+        operand = _compile(node.operand)
+        if isinstance(node.op, ast.Not):
+            return lambda fields, offset: np.logical_not(operand(fields, offset))
+        if isinstance(node.op, ast.USub):
+            return lambda fields, offset: np.negative(operand(fields, offset))
+        if isinstance(node.op, ast.UAdd):
+            return operand
+
+    if isinstance(node, ast.BinOp) and type(node.op) in _BINARY:
+        op, left, right = _BINARY[type(node.op)], _compile(node.left), _compile(node.right)
+        return lambda fields, offset: op(left(fields, offset), right(fields, offset))
+
+    if isinstance(node, ast.Compare):
+        if not all(type(op) in _COMPARE for op in node.ops):
+            raise ExpressionError("unsupported comparison")
+        operands = [_compile(node.left)] + [_compile(c) for c in node.comparators]
+        ops = [_COMPARE[type(op)] for op in node.ops]
+
+        def compare(fields, offset):
+            values = [fn(fields, offset) for fn in operands]
+            result = ops[0](values[0], values[1])
+            for i, op in enumerate(ops[1:], start=1):
+                result = np.logical_and(result, op(values[i], values[i + 1]))
+            return result
+        return compare
+
+    if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and not node.keywords:
+        return _compile_call(node.func.id, node.args)
+
+    raise ExpressionError(f"unsupported syntax: {ast.dump(node)[:60]}")
+
+
+def _compile_call(name, args):
+    if name == 'prev' and len(args) in (1, 2):
+        # prev(x) / prev(x, n): x as of n rows earlier
+        inner, n = _compile(args[0]), (_lag(args[1]) if len(args) == 2 else 1)
+        return lambda fields, offset: inner(fields, offset + n)
+    if name == 'change' and len(args) in (1, 2):
+        # change(x, n): relative change of x over n rows
+        inner, n = _compile(args[0]), (_lag(args[1]) if len(args) == 2 else 1)
+        return lambda fields, offset: inner(fields, offset) / inner(fields, offset + n) - 1.0
+    if name in ('cross_above', 'cross_below') and len(args) == 2:
+        a, b = _compile(args[0]), _compile(args[1])
+        above = name == 'cross_above'
+
+        def cross(fields, offset):
+            now, before = a(fields, offset) - b(fields, offset), a(fields, offset + 1) - b(fields, offset + 1)
+            return (now > 0) & (before <= 0) if above else (now < 0) & (before >= 0)
+        return cross
+    if name in ('abs', 'log', 'sqrt') and len(args) == 1:
+        fn, inner = {'abs': np.abs, 'log': np.log, 'sqrt': np.sqrt}[name], _compile(args[0])
+        return lambda fields, offset: fn(inner(fields, offset))
+    if name in ('min', 'max') and len(args) >= 2:
+        fn, parts = (np.fmin if name == 'min' else np.fmax), [_compile(a) for a in args]
+
+        def extreme(fields, offset):
+            result = parts[0](fields, offset)
+            for part in parts[1:]:
+                result = fn(result, part(fields, offset))
+            return result
+        return extreme
+    raise ExpressionError(
+        f"unknown function {name}() with {len(args)} argument(s); "
+        "use prev, change, cross_above, cross_below, abs, log, sqrt, min or max"
+    )
+
+
+def _row(values, offset):
+    i = values.shape[0] - 1 - offset
+    if i < 0:
+        return np.full(values.shape[1], np.nan)
+    return values[i]
+
+
+# -----------------------------------------------------------
+# SCREENER
+# -----------------------------------------------------------
+def universe_from_env(default=()):
+    """
+    AUGUR_SCREENER_UNIVERSE as a comma-separated list of tickers, or
+    @path to a file with one ticker per line; `default` when unset.
+    """
+    spec = os.environ.get("AUGUR_SCREENER_UNIVERSE", "").strip()
+    if not spec:
+        return list(default)
+    if spec.startswith("@"):
+        with open(spec[1:]) as fh:
+            items = fh.read().split()
+    else:
+        items = spec.split(",")
+    return [t.strip().upper() for t in items if t.strip()]
+
+
+class Screener:
+    def __init__(self, universe_fn, history_days=400, max_rows=260, refresh_seconds=300.0, late_days=7):
+        """
+        universe_fn() -> tickers to screen. history_days of bars warm the
+        indicators up on a rebuild; the panel keeps the last max_rows dates.
+        """
+        self.universe_fn = universe_fn
+        self.history_days = history_days
+        self.max_rows = max_rows
+        self.refresh_seconds = refresh_seconds
+        self.late_days = late_days
+        self._panel = None
+        self._lock = threading.Lock()
+        self._refresh_guard = threading.Lock()
+        self._refreshing = False
+        self.rebuilds = 0
+        self.refreshes = 0
+        self.errors = 0
+        self.last_refresh_ms = 0.0
+
+    def panel(self):
+        """
+        The current panel. Only the first one is built in the caller; after
+        that a panel older than refresh_seconds is served while a background
+        thread refreshes it.
+        """
+        panel = self._panel
+        if panel is None:
+            return self.refresh()
+        if time.time() - panel.built_at >= self.refresh_seconds:
+            with self._refresh_guard:
+                start = not self._refreshing
+                self._refreshing = True
+            if start:
+                threading.Thread(target=self._refresh_quietly, name="screener-refresh", daemon=True).start()
+        return panel
+
+    def _refresh_quietly(self):
+        try:
+            self.refresh()
+        except Exception as e:
+            self.errors += 1
+            print(f"[screener] refresh failed: {e}")
+        finally:
+            self._refreshing = False
+
+    def refresh(self, force_rebuild=False):
+        from loader import load_bars
+
+        with self._lock:
+            started = time.perf_counter()
+            tickers = sorted(set(self.universe_fn()))
+            panel = self._panel
+            if force_rebuild or panel is None or panel.tickers != tickers or panel.last_date is None:
+                panel = self._rebuild(tickers, load_bars)
+            else:
+                panel = self._advance(panel, load_bars) or self._rebuild(tickers, load_bars)
+            self._panel = panel
+            self.refreshes += 1
+            self.last_refresh_ms = round((time.perf_counter() - started) * 1000, 3)
+            return panel
+
+    def _rebuild(self, tickers, load_bars):
+        start = (date.today() - timedelta(days=self.history_days)).isoformat()
+        bars = _columns(load_bars(tickers, start)) if tickers else {}
+        dates = _dates_of(bars)
+        prices, mask = _stack(bars, tickers, dates)
+        state = PanelState(len(tickers))
+        fields = {**prices, **_fold(state, prices, mask)}
+        self.rebuilds += 1
+        keep = slice(max(0, len(dates) - self.max_rows), len(dates))
+        return Panel(tickers, dates[keep], {k: v[keep] for k, v in fields.items()}, state)
+
+    def _advance(self, panel, load_bars):
+        """Panel with the bars after its last date folded in, or None if it needs a rebuild."""
+        last = panel.last_date
+        since = last - np.timedelta64(self.late_days, 'D')
+        seen, bars = _split(_columns(load_bars(panel.tickers, str(since + 1))), last)
+        # a bar inside the panel that it does not have means one arrived late
+        if not np.isin(_dates_of(seen), panel.dates).all():
+            return None
+        recent = panel.dates > since
+        if recent.any():
+            _, known = _stack(seen, panel.tickers, panel.dates[recent])
+            if (known & np.isnan(panel.fields['Close'][recent])).any():
+                return None
+
+        dates = _dates_of(bars)
+        if not len(dates):
+            panel.built_at = time.time()
+            return panel
+
+        state = _copy_state(panel.state)
+        prices, mask = _stack(bars, panel.tickers, dates)
+        new = {**prices, **_fold(state, prices, mask)}
+        all_dates = np.concatenate([panel.dates, dates])
+        keep = slice(max(0, len(all_dates) - self.max_rows), len(all_dates))
+        fields = {k: np.concatenate([panel.fields[k], new[k]])[keep] for k in panel.fields}
+        return Panel(panel.tickers, all_dates[keep], fields, state)
+
+    def screen(self, filter=None, rank=None, ascending=False, limit=50):
+        """
+        Tickers whose last bar passes `filter`, ordered by `rank` (or by
+        ticker), with their latest prices and indicators.
+        """
+        where = compile_expression(filter) if filter else None
+        score = compile_expression(rank) if rank else None
+        panel = self.panel()
+        started = time.perf_counter()
+        if panel.last_date is None:
+            return {"asof": None, "universe": len(panel.tickers), "matched": 0, "results": []}
+
+        with np.errstate(invalid='ignore', divide='ignore', over='ignore'):
+            present = ~np.isnan(panel.fields['Close'][-1])
+            selected = present.copy()
+            if where is not None:
+                selected &= np.broadcast_to(np.asarray(where(panel.fields, 0), dtype=bool), selected.shape)
+            scores = None
+            if score is not None:
+                scores = np.broadcast_to(np.asarray(score(panel.fields, 0), dtype=np.float64), selected.shape)
+
+        idx = np.flatnonzero(selected)
+        if scores is not None:
+            s = scores[idx]
+            # NaN scores go last either way
+            order = np.lexsort((s if ascending else -s, np.isnan(s)))
+            idx = idx[order]
+        idx = idx[:limit]
+
+        results = []
+        for j in idx:
+            row = {"ticker": panel.tickers[j]}
+            if scores is not None:
+                row["score"] = _plain(scores[j])
+            for name in ('close', 'volume', 'rsi', 'macd', 'macd_signal', 'sma', 'ema', 'atr'):
+                row[name] = _plain(panel.fields[NAMES[name]][-1, j])
+            results.append(row)
+        return {
+            "asof": str(panel.last_date),
+            "universe": len(panel.tickers),
+            "with_bar": int(present.sum()),
+            "matched": int(selected.sum()),
+            "results": results,
+            "ms": round((time.perf_counter() - started) * 1000, 3),
+        }
+
+    def stats(self):
+        panel = self._panel
+        return {
+            "tickers": len(panel.tickers) if panel else 0,
+            "rows": len(panel.dates) if panel else 0,
+            "asof": str(panel.last_date) if panel and panel.last_date is not None else None,
+            "age_s": round(time.time() - panel.built_at, 1) if panel else None,
+            "refreshes": self.refreshes,
+            "rebuilds": self.rebuilds,
+            "errors": self.errors,
+            "last_refresh_ms": self.last_refresh_ms,
+        }
+
+
+def _copy_state(state):
+    copy = PanelState.__new__(PanelState)
+    copy.__dict__ = {k: (v.copy() if isinstance(v, np.ndarray) else v) for k, v in state.__dict__.items()}
+    return copy
+
+
+def _plain(value):
+    value = float(value)
+    return None if np.isnan(value) else round(value, 4)
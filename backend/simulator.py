@@ -0,0 +1,368 @@
+# simulator.py
+"""
+Vectorized backtest of the ATR stop / target rule behind /risk.
+
+A long trade opens at the close of every bar where the signal is 1 and no
+trade is already open. It uses the sizing of the /risk endpoint:
+    stop   = entry - atr_mult_sl * ATR
+    target = entry + atr_mult_tp * ATR
+    shares = min(equity * risk_per_trade / (entry - stop), equity / entry)
+It closes at the first bar that touches the stop or the target (the stop
+wins if both are hit in one bar, and gaps fill at the open), or at the
+close after max_hold bars.
+
+For one ticker the whole grid is evaluated at once:
+  * stop and target hits are found with one sliding-window comparison per
+    stop multiple and per target multiple, not per combination;
+  * their (stop, target) outer product gives every trade's exit bar and price;
+  * the "one trade at a time" chain is walked for all combinations in
+    lockstep (one numpy step per trade, not per trade per combination);
+  * risk_per_trade only scales position size, so it is broadcast at the end.
+Position size is a fraction of current equity, so equity is the cumulative
+product of (1 + per-trade return).
+
+signals="model" (the default) replays the saved model's predictions.
+Those are in-sample on the bars the model was trained on. signals="target"
+replays the Target column, which is the real next-day move: that is
+look-ahead, so it is only an upper bound and the result says so.
+
+    python simulator.py --tickers AAPL MSFT --sl 1:3:0.25 --tp 1:6:0.5 --risk 0.005,0.01,0.02
+"""
+import argparse
+import json
+import time
+from datetime import date, timedelta
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from loader import load_stocks
+
+
+MAX_COMBINATIONS = 20000
+MAX_TICKERS = 50
+MAX_YEARS = 10
+MAX_HOLD = 250
+MAX_TOP = 50   # best combinations returned per ticker, each with its equity curve
+# a ticker's arrays are (S, T, bars), (R, S, bars) and (S or T, bars, max_hold);
+# their combined cells are capped, 10M float64 cells being ~80 MB
+MAX_CELLS = 10_000_000
+TRADING_DAYS = 252
+
+
+def simulate(bars, signals, sl_mults, tp_mults, risk_fracs, max_hold=20):
+    """
+    Backtest every (risk, sl, tp) combination on one ticker.
+    bars: DataFrame with Open/High/Low/Close/ATR; signals: 0/1 per bar.
+    Returns a dict of arrays shaped (R, S, T) (stats) plus the per-combination
+    trade list needed to build equity curves (see equity_curve).
+    """
+    sl_m = np.asarray(sl_mults, dtype=np.float64)
+    tp_m = np.asarray(tp_mults, dtype=np.float64)
+    risk = np.asarray(risk_fracs, dtype=np.float64)
+    S, T, R, H = len(sl_m), len(tp_m), len(risk), int(max_hold)
+
+    open_ = bars['Open'].to_numpy(np.float64)
+    high = bars['High'].to_numpy(np.float64)
+    low = bars['Low'].to_numpy(np.float64)
+    close = bars['Close'].to_numpy(np.float64)
+    atr = bars['ATR'].to_numpy(np.float64)
+    n = len(close)
+
+    signals = np.asarray(signals).astype(bool)
+    entries = np.flatnonzero(signals[:n - 1] & (atr[:n - 1] > 0))   # candidate entry bars
+    E = len(entries)
+    if E == 0:
+        return _empty_result(R, S, T)
+
+    # the H bars after each entry (NaN past the end of the data never trigger)
+    pad = np.full(H, np.nan)
+    fwd_open = sliding_window_view(np.concatenate([open_[1:], pad]), H)[entries]   # (E, H)
+    fwd_high = sliding_window_view(np.concatenate([high[1:], pad]), H)[entries]
+    fwd_low = sliding_window_view(np.concatenate([low[1:], pad]), H)[entries]
+
+    entry_px = close[entries]
+    entry_atr = atr[entries]
+    stop = entry_px - sl_m[:, None] * entry_atr      # (S, E)
+    target = entry_px + tp_m[:, None] * entry_atr    # (T, E)
+
+    # first bar offset (0..H-1) that hits the level, H if none
+    def first_hit(hit):
+        return np.where(hit.any(axis=-1), hit.argmax(axis=-1), H)
+
+    first_stop = first_hit(fwd_low[None] <= stop[:, :, None])       # (S, E)
+    first_tp = first_hit(fwd_high[None] >= target[:, :, None])      # (T, E)
+
+    # combine into (S, T, E); stop wins ties
+    fs = first_stop[:, None, :]
+    ft = first_tp[None, :, :]
+    stopped = (fs <= ft) & (fs < H)
+    took_profit = (ft < fs)
+    offset = np.minimum(np.minimum(fs, ft), H - 1)
+    exit_bar = np.minimum(entries + 1 + offset, n - 1)                # (S, T, E)
+
+    rows = np.arange(E)
+    open_at_stop = fwd_open[rows, np.minimum(first_stop, H - 1)]      # (S, E)
+    open_at_tp = fwd_open[rows, np.minimum(first_tp, H - 1)]          # (T, E)
+    stop_px = np.minimum(open_at_stop, stop)[:, None, :]
+    tp_px = np.maximum(open_at_tp, target)[None, :, :]
+    exit_px = np.where(stopped, stop_px, np.where(took_profit, tp_px, close[exit_bar]))
+    raw_return = exit_px / entry_px - 1.0                             # (S, T, E)
+
+    # walk the one-trade-at-a-time chain for all S*T combinations together
+    C = S * T
+    exit_flat = exit_bar.reshape(C, E)
+    next_entry = np.searchsorted(entries, exit_flat, side='left')     # (C, E), E = none left
+    pos = np.zeros(C, dtype=np.int64)
+    taken = []
+    while True:
+        active = pos < E
+        if not active.any():
+            break
+        taken.append(np.where(active, pos, -1))
+        pos = np.where(active, next_entry[np.arange(C), np.minimum(pos, E - 1)], E)
+    taken = np.stack(taken, axis=1)                                   # (C, K), -1 = no trade
+    valid = taken >= 0
+    idx = np.where(valid, taken, 0)
+
+    combo = np.arange(C)[:, None]
+    trade_raw = raw_return.reshape(C, E)[combo, idx]                  # (C, K)
+    trade_exit = exit_flat[combo, idx]
+    trade_entry = entries[idx]
+    sl_of_combo = np.repeat(np.arange(S), T)                          # (C,)
+
+    # fraction of equity in the trade: min(risk * entry / stop distance, 1)
+    size = np.minimum(
+        risk[:, None, None] * entry_px[None, None, :] / (sl_m[None, :, None] * entry_atr[None, None, :]),
+        1.0,
+    )                                                                 # (R, S, E)
+    trade_size = size[:, sl_of_combo[:, None], idx]                   # (R, C, K)
+    g = np.where(valid[None], trade_size * trade_raw[None], 0.0)      # (R, C, K)
+
+    equity = np.cumprod(1.0 + g, axis=-1)
+    peak = np.maximum.accumulate(np.maximum(equity, 1.0), axis=-1)
+    max_drawdown = (equity / peak - 1.0).min(axis=-1)
+
+    trades = valid.sum(axis=-1)                                       # (C,)
+    wins = ((g > 0) & valid[None]).sum(axis=-1)
+    gains = np.where(g > 0, g, 0.0).sum(axis=-1)
+    losses = -np.where(g < 0, g, 0.0).sum(axis=-1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = g.sum(axis=-1) / trades
+        var = (np.where(valid[None], (g - mean[..., None]) ** 2, 0.0)).sum(axis=-1) / np.maximum(trades - 1, 1)
+        sharpe = np.where(var > 0, mean / np.sqrt(var), 0.0)
+        win_rate = np.where(trades > 0, wins / trades, 0.0)
+        profit_factor = np.where(losses > 0, gains / losses, np.where(gains > 0, np.inf, 0.0))
+        avg_hold = np.where(trades > 0, np.where(valid, trade_exit - trade_entry, 0).sum(axis=-1) / trades, 0.0)
+
+    def grid(a):
+        return np.broadcast_to(a, (R, C)).reshape(R, S, T)
+
+    return {
+        'trades': grid(trades),
+        'win_rate': grid(win_rate),
+        'total_return': grid(equity[..., -1] - 1.0),
+        'max_drawdown': grid(max_drawdown),
+        'sharpe_per_trade': grid(np.nan_to_num(sharpe)),
+        'profit_factor': grid(profit_factor),
+        'avg_hold_bars': grid(avg_hold),
+        # kept for equity_curve
+        '_equity': equity.reshape(R, S, T, -1),
+        '_exit_bar': trade_exit.reshape(S, T, -1),
+        '_valid': valid.reshape(S, T, -1),
+    }
+
+
+def _empty_result(R, S, T):
+    zeros = np.zeros((R, S, T))
+    return {
+        'trades': zeros.astype(np.int64), 'win_rate': zeros, 'total_return': zeros,
+        'max_drawdown': zeros, 'sharpe_per_trade': zeros, 'profit_factor': zeros,
+        'avg_hold_bars': zeros,
+        '_equity': np.ones((R, S, T, 0)), '_exit_bar': np.zeros((S, T, 0), dtype=np.int64),
+        '_valid': np.zeros((S, T, 0), dtype=bool),
+    }
+
+
+def equity_curve(result, index, r, s, t):
+    """Dates and equity after each trade for one combination."""
+    valid = result['_valid'][s, t]
+    bars = result['_exit_bar'][s, t][valid]
+    equity = result['_equity'][r, s, t][valid]
+    return {
+        'dates': [index[b].strftime('%Y-%m-%d') for b in bars],
+        'equity': [round(float(v), 6) for v in equity],
+    }
+
+
+def model_signals(model, features, df):
+    return np.asarray(model.predict(df[features]))
+
+
+STAT_KEYS = ['trades', 'win_rate', 'total_return', 'max_drawdown', 'sharpe_per_trade', 'profit_factor', 'avg_hold_bars']
+
+
+def sweep(tickers, sl_mults, tp_mults, risk_fracs, years_back=3, max_hold=20,
+          signals="model", model_lookup=None, top=5, equity=100000.0):
+    """
+    Run simulate() for every ticker and rank the parameter grid.
+    model_lookup(ticker) -> (model, features) or None is used when
+    signals == "model". Returns a JSON-friendly dict: the full grid in
+    columns (parameters + stats averaged over tickers) and per-ticker
+    best combinations with their equity curves.
+    """
+    started = time.perf_counter()
+    sl_m, tp_m, risk = list(sl_mults), list(tp_mults), list(risk_fracs)
+    R, S, T = len(risk), len(sl_m), len(tp_m)
+    if R * S * T > MAX_COMBINATIONS:
+        raise ValueError(f"{R * S * T} combinations, at most {MAX_COMBINATIONS}")
+    if len(tickers) > MAX_TICKERS:
+        raise ValueError(f"{len(tickers)} tickers, at most {MAX_TICKERS}")
+    if not 0 < years_back <= MAX_YEARS:
+        raise ValueError(f"years must be more than 0 and at most {MAX_YEARS}")
+    if not 1 <= max_hold <= MAX_HOLD:
+        raise ValueError(f"max_hold must be 1-{MAX_HOLD} bars")
+    if not 1 <= top <= MAX_TOP:
+        raise ValueError(f"top must be 1-{MAX_TOP}")
+    if not equity > 0:
+        raise ValueError("equity must be positive")
+    cells = (S * T + R * S + (S + T) * max_hold) * int(TRADING_DAYS * years_back)
+    if cells > MAX_CELLS:
+        raise ValueError(f"grid too large for {years_back} years of bars; use fewer parameters or years")
+
+    start = (date.today() - timedelta(days=int(365 * years_back))).strftime("%Y-%m-%d")
+    data = load_stocks(tickers, start)
+
+    per_ticker, errors, stacked = {}, {}, {k: [] for k in STAT_KEYS}
+    for ticker in tickers:
+        df = data.get(ticker)
+        if df is None or df.empty:
+            errors[ticker] = "no data"
+            continue
+        if signals == "model":
+            found = model_lookup(ticker) if model_lookup else None
+            if found is None:
+                errors[ticker] = "no model"
+                continue
+            sig = model_signals(found[0], found[1], df)
+        else:
+            sig = df['Target'].to_numpy()
+
+        res = simulate(df, sig, sl_m, tp_m, risk, max_hold=max_hold)
+        for k in STAT_KEYS:
+            stacked[k].append(res[k])
+
+        order = np.argsort(-res['total_return'], axis=None)[:top]
+        best = []
+        for flat in order:
+            r, s, t = np.unravel_index(flat, (R, S, T))
+            curve = equity_curve(res, df.index, r, s, t)
+            curve['equity'] = [round(v * equity, 2) for v in curve['equity']]
+            best.append({
+                'risk_per_trade': risk[r], 'atr_mult_sl': sl_m[s], 'atr_mult_tp': tp_m[t],
+                **{k: _plain(res[k][r, s, t]) for k in STAT_KEYS},
+                'equity_curve': curve,
+            })
+        per_ticker[ticker] = {
+            'bars': len(df),
+            'start': df.index[0].strftime('%Y-%m-%d'),
+            'end': df.index[-1].strftime('%Y-%m-%d'),
+            'signals': int(np.count_nonzero(sig)),
+            'best': best,
+        }
+
+    result = {
+        'combinations': R * S * T,
+        'signals': signals,
+        # Target is the realised next-day move: replaying it looks ahead
+        'upper_bound': signals == "target",
+        'max_hold': max_hold,
+        'tickers': per_ticker,
+        'errors': errors,
+    }
+    if per_ticker:
+        mean = {k: np.mean(np.stack(v), axis=0) for k, v in stacked.items()}
+        mean['trades'] = np.sum(np.stack(stacked['trades']), axis=0)
+        rr, ss, tt = np.meshgrid(np.arange(R), np.arange(S), np.arange(T), indexing='ij')
+        result['grid'] = {
+            'risk_per_trade': [risk[i] for i in rr.ravel()],
+            'atr_mult_sl': [sl_m[i] for i in ss.ravel()],
+            'atr_mult_tp': [tp_m[i] for i in tt.ravel()],
+            **{k: [_plain(v) for v in mean[k].ravel()] for k in STAT_KEYS},
+        }
+        best_flat = int(np.argmax(mean['total_return']))
+        r, s, t = np.unravel_index(best_flat, (R, S, T))
+        result['best'] = {
+            'risk_per_trade': risk[r], 'atr_mult_sl': sl_m[s], 'atr_mult_tp': tp_m[t],
+            **{k: _plain(mean[k][r, s, t]) for k in STAT_KEYS},
+        }
+    result['elapsed_ms'] = round((time.perf_counter() - started) * 1000, 3)
+    return result
+
+
+def _plain(v):
+    v = v.item() if hasattr(v, 'item') else v
+    if isinstance(v, float):
+        return round(v, 6) if np.isfinite(v) else None
+    return v
+
+
+def _parse_values(spec):
+    """'1,1.5,2' or 'start:stop:step' (stop inclusive)."""
+    if ':' in spec:
+        lo, hi, step = (float(x) for x in spec.split(':'))
+        return [round(v, 6) for v in np.arange(lo, hi + step / 2, step)]
+    return [float(x) for x in spec.split(',') if x]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ATR stop/target parameter sweep")
+    parser.add_argument("--tickers", nargs="+", required=True)
+    parser.add_argument("--sl", default="1:3:0.25", help="atr_mult_sl values: a,b,c or start:stop:step")
+    parser.add_argument("--tp", default="1:6:0.5", help="atr_mult_tp values")
+    parser.add_argument("--risk", default="0.005,0.01,0.02", help="risk_per_trade values")
+    parser.add_argument("--years", type=float, default=3)
+    parser.add_argument("--max-hold", type=int, default=20, help="close a trade after this many bars")
+    parser.add_argument("--signals", choices=["model", "target"], default="model",
+                        help="target replays the realised next-day move (look-ahead, an upper bound)")
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--output", default=None, help="write the full result JSON here")
+    args = parser.parse_args()
+
+    model_lookup = None
+    if args.signals == "model":
+        from model_registry import ModelRegistry
+        from train_models import modelDir
+        model_lookup = ModelRegistry(modelDir).get
+
+    result = sweep(
+        [t.upper() for t in args.tickers],
+        _parse_values(args.sl), _parse_values(args.tp), _parse_values(args.risk),
+        years_back=args.years, max_hold=args.max_hold, signals=args.signals,
+        model_lookup=model_lookup,
+    )
+    for ticker, err in result['errors'].items():
+        print(f"[simulator] skipped {ticker}: {err}")
+    print(f"{result['combinations']} combinations x {len(result['tickers'])} tickers "
+          f"in {result['elapsed_ms']:.0f} ms")
+    if result['upper_bound']:
+        print("[simulator] signals=target replays the realised next-day move: an upper bound, not a backtest")
+
+    if 'grid' in result:
+        grid = result['grid']
+        order = np.argsort([-(v or 0) for v in grid['total_return']])[:args.top]
+        print(f"\n{'risk':>7}{'sl':>6}{'tp':>6}{'trades':>8}{'win':>7}{'return':>10}{'maxDD':>9}{'PF':>7}")
+        for i in order:
+            pf = grid['profit_factor'][i]
+            print(f"{grid['risk_per_trade'][i]:>7.3f}{grid['atr_mult_sl'][i]:>6.2f}{grid['atr_mult_tp'][i]:>6.2f}"
+                  f"{grid['trades'][i]:>8}{grid['win_rate'][i]:>7.2f}{grid['total_return'][i]:>10.2%}"
+                  f"{grid['max_drawdown'][i]:>9.2%}{(pf if pf is not None else float('inf')):>7.2f}")
+
+    if args.output:
+        with open(args.output, "w") as fh:
+            json.dump(result, fh)
+        print(f"\nwrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
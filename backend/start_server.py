@@ -1,9 +1,42 @@
 #!/usr/bin/env python3
+"""
+Start the API server.
+
+    python start_server.py                  # development: one process, auto-reload
+    python start_server.py --workers 4      # production: 4 worker processes, no reload
+
+Workers share the watchlist, quote cache and prediction cache through the
+SQLite database (AUGUR_SHARED_STATE, AUGUR_QUOTE_SPILL and
+AUGUR_PREDICTION_SPILL are turned on for them), and training leases make
+sure only one worker trains a given ticker at a time.
+"""
+import argparse
+import os
+
 import uvicorn
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Run the Augur API server")
+    parser.add_argument("--host", default=os.environ.get("AUGUR_HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("AUGUR_PORT", 5000)))
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("AUGUR_WORKERS", 1)),
+                        help="worker processes; more than 1 selects production mode")
+    parser.add_argument("--production", action="store_true",
+                        help="production mode (shared state, no reload) even with one worker")
+    args = parser.parse_args()
+
+    production = args.production or args.workers > 1
+
     print("Starting API Server...")
-    print("Server will be available at http://localhost:5000")
+    print(f"Server will be available at http://localhost:{args.port}")
+    if production:
+        # workers inherit the environment, so this switches all of them over
+        for name in ("AUGUR_SHARED_STATE", "AUGUR_QUOTE_SPILL", "AUGUR_PREDICTION_SPILL"):
+            os.environ.setdefault(name, "1")
+        print(f"Production mode: {args.workers} worker(s), shared state in SQLite")
     print("\nPress Ctrl+C to stop the server\n")
-    uvicorn.run("api_server:app", host="0.0.0.0", port=5000, reload=True)
 
+    if production:
+        uvicorn.run("api_server:app", host=args.host, port=args.port, workers=args.workers)
+    else:
+        uvicorn.run("api_server:app", host=args.host, port=args.port, reload=True)
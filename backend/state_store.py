@@ -0,0 +1,250 @@
+# state_store.py
+"""
+Durable copy of the tracked stocks, so a restart (or a --reload) comes back
+with the same watchlist instead of an empty one.
+
+Writes are buffered. put() and delete() only update an in-memory dirty set,
+and a flusher thread writes it every `flush_seconds` in one transaction, so
+a refresh of 50 tickers costs one commit rather than 50. The database runs
+in WAL mode (db.py), so these writes do not block readers.
+A crash can lose at most the last flush interval, and all of that state can
+be fetched again.
+
+load() is one SELECT. api_server restores the watchlist from it at startup,
+serves those rows immediately and re-validates stale ones in the background.
+
+With shared=True (several server workers on one database) the table is the
+watchlist: removals are written at once, and changed() tells a worker
+whether another one has written since it last looked, so it can reload.
+Every flush bumps the table's StateVersion row (db.py) in its own
+transaction and remembers the version it wrote, so a worker's own writes
+never count as changes. PRAGMA data_version, which moves on any commit
+to the file, only decides whether that row needs to be read at all.
+"""
+import json
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.sqlite import insert
+
+from db import engine, DB_PATH, TrackedStock, StateVersion
+
+
+_COLUMNS = ("company_name", "price", "prediction", "quoted_at", "bar_date", "features", "model_version")
+
+_DELETE = object()
+
+_VERSION_NAME = TrackedStock.__tablename__
+
+
+class StateStore:
+    def __init__(self, flush_seconds=1.0, enabled=True, shared=False):
+        self.flush_seconds = flush_seconds
+        self.enabled = enabled
+        self.shared = shared and enabled
+        self._version_conn = None
+        self._data_version = None
+        self._seen_version = None   # StateVersion of the table this worker has accounted for
+        self._version_lock = threading.Lock()
+        self._dirty = {}       # ticker -> {column: value} or _DELETE
+        self._clear = False    # delete every row before applying _dirty
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self.flushes = 0
+        self.rows_written = 0
+        self.errors = 0
+        self.last_flush_ms = 0.0
+
+    # ----- writes (buffered) -----
+    def put(self, ticker, **fields):
+        """Queue an upsert of some columns of ticker's row."""
+        if not self.enabled:
+            return
+        unknown = set(fields) - set(_COLUMNS)
+        if unknown:
+            raise ValueError(f"unknown state columns: {sorted(unknown)}")
+        if "features" in fields and fields["features"] is not None:
+            fields["features"] = json.dumps(fields["features"])
+        with self._lock:
+            pending = self._dirty.get(ticker)
+            if pending is None or pending is _DELETE:
+                self._dirty[ticker] = dict(fields)
+            else:
+                pending.update(fields)
+        self._ensure_thread()
+
+    def delete(self, ticker):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._dirty[ticker] = _DELETE
+        if self.shared:
+            self.flush()
+        else:
+            self._ensure_thread()
+
+    def clear(self):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._dirty.clear()
+            self._clear = True
+        if self.shared:
+            self.flush()
+        else:
+            self._ensure_thread()
+
+    def flush(self):
+        """Write everything queued so far in one transaction."""
+        with self._flush_lock:
+            with self._lock:
+                dirty, self._dirty = self._dirty, {}
+                clear, self._clear = self._clear, False
+            if not dirty and not clear:
+                return 0
+
+            started = time.perf_counter()
+            now = datetime.utcnow()
+            deletes = [t for t, fields in dirty.items() if fields is _DELETE]
+            # executemany needs the same columns in every row of a batch
+            batches = {}
+            for ticker, fields in dirty.items():
+                if fields is not _DELETE:
+                    batches.setdefault(tuple(sorted(fields)), []).append({"ticker": ticker, **fields})
+            try:
+                with engine.begin() as conn:
+                    if clear:
+                        conn.execute(delete(TrackedStock))
+                    if deletes:
+                        conn.execute(delete(TrackedStock).where(TrackedStock.ticker.in_(deletes)))
+                    for columns, rows in batches.items():
+                        stmt = insert(TrackedStock).values(added_at=now, updated_at=now)
+                        stmt = stmt.on_conflict_do_update(
+                            index_elements=[TrackedStock.ticker],
+                            set_={**{c: stmt.excluded[c] for c in columns}, "updated_at": now},
+                        )
+                        conn.execute(stmt, rows)
+                    if self.shared:
+                        before = self._bump_version(conn)
+            except Exception as e:
+                self.errors += 1
+                print(f"[state_store] flush failed, will retry: {e}")
+                self._requeue(dirty, clear)
+                return 0
+
+            if self.shared:
+                with self._version_lock:
+                    # only skip our own write: if someone else wrote in
+                    # between, changed() must still see their version
+                    if self._seen_version == before:
+                        self._seen_version = before + 1
+
+            written = len(deletes) + sum(len(rows) for rows in batches.values())
+            self.flushes += 1
+            self.rows_written += written
+            self.last_flush_ms = round((time.perf_counter() - started) * 1000, 3)
+            return written
+
+    def _requeue(self, dirty, clear):
+        # anything queued since the failed flush is newer and wins
+        with self._lock:
+            if clear and not self._clear:
+                self._clear = True
+                dirty = {}
+            for ticker, fields in dirty.items():
+                newer = self._dirty.get(ticker)
+                if newer is None:
+                    self._dirty[ticker] = fields
+                elif newer is not _DELETE and fields is not _DELETE:
+                    self._dirty[ticker] = {**fields, **newer}
+
+    @staticmethod
+    def _bump_version(conn):
+        """Increment the table's StateVersion inside conn's transaction; returns the old value."""
+        before = conn.execute(
+            select(StateVersion.version).where(StateVersion.name == _VERSION_NAME)
+        ).scalar() or 0
+        stmt = insert(StateVersion).values(name=_VERSION_NAME, version=before + 1)
+        conn.execute(stmt.on_conflict_do_update(index_elements=[StateVersion.name], set_={"version": before + 1}))
+        return before
+
+    # ----- reads -----
+    def changed(self):
+        """True if another worker wrote the table since the last call (always on the first)."""
+        with self._version_lock:
+            if self._version_conn is None:
+                self._version_conn = sqlite3.connect(DB_PATH, check_same_thread=False)
+            data_version = self._version_conn.execute("PRAGMA data_version").fetchone()[0]
+            if data_version == self._data_version and self._seen_version is not None:
+                return False
+            self._data_version = data_version
+            row = self._version_conn.execute(
+                "SELECT version FROM state_versions WHERE name = ?", (_VERSION_NAME,)
+            ).fetchone()
+            version = row[0] if row else 0
+            changed = version != self._seen_version
+            self._seen_version = version
+            return changed
+
+    def load(self):
+        """All persisted rows as {ticker: {column: value}}, features decoded."""
+        if not self.enabled:
+            return {}
+        with engine.connect() as conn:
+            rows = conn.execute(select(TrackedStock.__table__).order_by(TrackedStock.added_at)).mappings().all()
+        state = {}
+        for row in rows:
+            entry = {c: row[c] for c in _COLUMNS}
+            if entry["features"]:
+                try:
+                    entry["features"] = json.loads(entry["features"])
+                except ValueError:
+                    entry["features"] = None
+            state[row["ticker"]] = entry
+        return state
+
+    # ----- flusher thread -----
+    def _ensure_thread(self):
+        if self._thread is not None and self._thread.is_alive():
+            self._wakeup.set()
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name="state-store", daemon=True)
+                self._thread.start()
+        self._wakeup.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wakeup.wait()
+            self._wakeup.clear()
+            # let a burst of updates collect into one transaction
+            self._stop.wait(self.flush_seconds)
+            self.flush()
+
+    def close(self):
+        """Stop the flusher and write what is still queued."""
+        self._stop.set()
+        self._wakeup.set()
+        self.flush()
+
+    def stats(self):
+        with self._lock:
+            pending = len(self._dirty)
+        return {
+            "enabled": self.enabled,
+            "shared": self.shared,
+            "flush_seconds": self.flush_seconds,
+            "pending": pending,
+            "flushes": self.flushes,
+            "rows_written": self.rows_written,
+            "errors": self.errors,
+            "last_flush_ms": self.last_flush_ms,
+        }
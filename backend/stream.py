@@ -0,0 +1,199 @@
+# stream.py
+"""
+Server-push updates for the watchlist (GET /api/stocks/stream, SSE).
+
+One StockStream runs a scheduler thread that refreshes the tracked stocks
+once per tick and broadcasts only what changed since the last broadcast.
+Upstream work (the refresh) therefore does not grow with the number of
+open tabs, and the thread idles while nobody is subscribed.
+
+Each subscriber has a small bounded queue of pending diffs. A client too
+slow to drain it does not hold up the others or grow memory. Its queue is
+dropped, and the next thing it receives is one full snapshot. Diffs carry
+state, not deltas to replay, so nothing is lost by skipping them.
+
+Events:
+    snapshot  {"stocks": {TICKER: {companyName, price, prediction}}, "ts"}
+    diff      {"stocks": {TICKER: {only the changed fields}}, "removed": [...], "ts"}
+"""
+import asyncio
+import json
+import threading
+import time
+from collections import deque
+
+
+class _Subscriber:
+    def __init__(self, loop, max_pending):
+        self.loop = loop
+        self.max_pending = max_pending
+        self.event = asyncio.Event()
+        self._lock = threading.Lock()
+        self._pending = deque()
+        self._resync = True   # new subscribers start with a snapshot
+
+    def push(self, event):
+        """Queue a diff; returns True if the queue overflowed into a resync."""
+        overflow = False
+        with self._lock:
+            if self._resync:
+                pass  # a snapshot is already due, it will include this change
+            elif len(self._pending) >= self.max_pending:
+                self._pending.clear()
+                self._resync = True
+                overflow = True
+            else:
+                self._pending.append(event)
+        self._wake()
+        return overflow
+
+    def _wake(self):
+        try:
+            self.loop.call_soon_threadsafe(self.event.set)
+        except RuntimeError:
+            pass  # loop already closed; the subscriber is going away
+
+    def drain(self, snapshot_fn):
+        """Events to send now: a snapshot after a resync, else the queued diffs."""
+        with self._lock:
+            if self._resync:
+                self._resync = False
+                self._pending.clear()
+                return [snapshot_fn()]
+            events = list(self._pending)
+            self._pending.clear()
+            return events
+
+
+class StockStream:
+    def __init__(self, state_fn, refresh_fn, interval=60.0, max_pending=16, keepalive=15.0):
+        """
+        state_fn() -> {ticker: {field: value}} is the current watchlist;
+        refresh_fn() updates it from upstream (called once per tick).
+        """
+        self.state_fn = state_fn
+        self.refresh_fn = refresh_fn
+        self.interval = interval
+        self.max_pending = max_pending
+        self.keepalive = keepalive
+
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._publish_lock = threading.Lock()   # keeps diffs in state order
+        self._last = {}
+        self._last_tick = float("-inf")
+        self._thread = None
+        self._stop = threading.Event()
+        self._wakeup = threading.Event()
+
+        self.ticks = 0
+        self.diffs_sent = 0
+        self.resyncs = 0
+        self.refresh_errors = 0
+
+    # ----- subscribers -----
+    def subscribe(self, loop):
+        sub = _Subscriber(loop, self.max_pending)
+        with self._lock:
+            first = not self._subscribers
+            self._subscribers.add(sub)
+        self.publish()   # the first snapshot reflects the watchlist as of now
+        self._ensure_thread()
+        if first and time.monotonic() - self._last_tick >= self.interval:
+            self._wakeup.set()   # data is stale: refresh now, not one interval from now
+        sub._wake()
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            self._subscribers.discard(sub)
+
+    def snapshot(self):
+        with self._lock:
+            stocks = {t: dict(fields) for t, fields in self._last.items()}
+        return {"type": "snapshot", "stocks": stocks, "ts": time.time()}
+
+    async def events(self, is_disconnected):
+        """SSE text frames for one subscriber until it disconnects."""
+        sub = self.subscribe(asyncio.get_running_loop())
+        try:
+            while not await is_disconnected():
+                try:
+                    await asyncio.wait_for(sub.event.wait(), timeout=self.keepalive)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                sub.event.clear()
+                for event in sub.drain(self.snapshot):
+                    yield f"event: {event['type']}\ndata: {json.dumps({k: v for k, v in event.items() if k != 'type'})}\n\n"
+        finally:
+            self.unsubscribe(sub)
+
+    # ----- broadcasting -----
+    def publish(self):
+        """Diff the current watchlist against the last broadcast and push it."""
+        with self._publish_lock:
+            current = {t: dict(fields) for t, fields in self.state_fn().items()}
+            with self._lock:
+                changed = {}
+                for ticker, fields in current.items():
+                    before = self._last.get(ticker, {})
+                    delta = {k: v for k, v in fields.items() if before.get(k) != v}
+                    if delta:
+                        changed[ticker] = delta
+                removed = [t for t in self._last if t not in current]
+                self._last = current
+                subscribers = list(self._subscribers)
+
+            if not changed and not removed:
+                return None
+            event = {"type": "diff", "stocks": changed, "removed": removed, "ts": time.time()}
+            for sub in subscribers:
+                if sub.push(event):
+                    self.resyncs += 1
+            self.diffs_sent += len(subscribers)
+            return event
+
+    def _ensure_thread(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="stock-stream", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            if self._stop.is_set():
+                break
+            with self._lock:
+                idle = not self._subscribers
+            if idle:
+                continue
+            self.ticks += 1
+            self._last_tick = time.monotonic()
+            try:
+                self.refresh_fn()
+            except Exception as e:
+                self.refresh_errors += 1
+                print(f"[stream] refresh failed: {e}")
+            self.publish()
+
+    def stop(self):
+        self._stop.set()
+        self._wakeup.set()
+
+    def stats(self):
+        with self._lock:
+            subscribers = len(self._subscribers)
+        return {
+            "subscribers": subscribers,
+            "interval": self.interval,
+            "max_pending": self.max_pending,
+            "ticks": self.ticks,
+            "diffs_sent": self.diffs_sent,
+            "resyncs": self.resyncs,
+            "refresh_errors": self.refresh_errors,
+        }
@@ -0,0 +1,74 @@
+# tests/conftest.py
+"""
+Shared fixtures. Market data comes from CSV files read by
+providers.FixtureProvider, written from benchmarks.synthetic.SyntheticMarket
+so every run sees the same prices; caches and the database live under
+pytest's tmp_path.
+"""
+import os
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+# db.py opens its engine at import time
+os.environ.setdefault("AUGUR_DB_PATH", os.path.join(tempfile.mkdtemp(prefix="augur-tests-"), "test.db"))
+
+import pytest
+
+from benchmarks.synthetic import SyntheticMarket
+
+
+TICKERS = ["AAA", "BBB", "CCC"]
+
+
+@pytest.fixture(scope="session")
+def market():
+    return SyntheticMarket(years=2)
+
+
+@pytest.fixture(scope="session")
+def fixture_dir(market, tmp_path_factory):
+    """<TICKER>.csv daily bars for TICKERS, in the FixtureProvider layout."""
+    path = tmp_path_factory.mktemp("fixtures")
+    for ticker in TICKERS:
+        market.bars(ticker).to_csv(path / f"{ticker}.csv", index_label="Date")
+    return str(path)
+
+
+class RecordingProvider:
+    """FixtureProvider that records every fetch as (tickers, start, end)."""
+
+    def __init__(self, fixture_dir):
+        from providers import FixtureProvider
+
+        self.inner = FixtureProvider(fixture_dir)
+        self.calls = []
+
+    def fetch(self, tickers, start, end, interval="1d"):
+        self.calls.append((tuple(tickers), start, end))
+        return self.inner.fetch(tickers, start, end, interval=interval)
+
+    def latest_prices(self, tickers):
+        return self.inner.latest_prices(tickers)
+
+
+@pytest.fixture
+def provider(fixture_dir, tmp_path, monkeypatch):
+    """
+    A RecordingProvider installed in loader, with a fresh bar store,
+    column store and indicator engine under tmp_path.
+    """
+    import loader
+    from bar_store import BarStore
+    from column_store import ColumnStore
+    from indicator_engine import IndicatorEngine
+
+    recording = RecordingProvider(fixture_dir)
+    monkeypatch.setattr(loader, "_provider", recording)
+    monkeypatch.setattr(loader, "_store", BarStore(str(tmp_path / "bars")))
+    monkeypatch.setattr(loader, "_column_store", ColumnStore(str(tmp_path / "columns")))
+    monkeypatch.setattr(loader, "_engine", IndicatorEngine(None))
+    monkeypatch.setattr(loader, "_empty", {})
+    return recording
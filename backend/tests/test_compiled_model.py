@@ -0,0 +1,47 @@
+import os
+
+import joblib
+import numpy as np
+import pytest
+
+import compiled_model
+from indicators import compute_indicators
+from train_models import FEATURE_COLUMNS, build_model
+
+
+@pytest.fixture(scope="module")
+def split(market):
+    df = compute_indicators(market.bars("AAA").copy())
+    X, y = df[FEATURE_COLUMNS], df['Target']
+    cut = int(len(df) * 0.7)
+    return X.iloc[:cut], y.iloc[:cut], X.iloc[cut:]
+
+
+@pytest.mark.parametrize("use_ensemble,params", [
+    (True, None),
+    (True, {"rf": {"n_estimators": 30, "max_depth": 4}, "xgb": {"n_estimators": 50, "max_depth": 2}}),
+    (False, None),
+])
+def test_compiled_predictions_match_the_model(split, tmp_path, use_ensemble, params):
+    X_train, y_train, X_test = split
+    model = build_model(use_ensemble, n_jobs=1, params=params).fit(X_train, y_train)
+
+    path = compiled_model.export("AAA", model, FEATURE_COLUMNS, str(tmp_path))
+    compiled = compiled_model.CompiledModel(path)
+    for X in (X_train, X_test):
+        np.testing.assert_array_equal(compiled.predict(X), model.predict(X))
+    # a plain array in feature order works too
+    np.testing.assert_array_equal(compiled.predict(X_test.to_numpy()), model.predict(X_test))
+
+
+def test_load_ignores_a_compiled_model_of_another_pickle(split, tmp_path):
+    X_train, y_train, _ = split
+    model = build_model(True, n_jobs=1).fit(X_train, y_train)
+    model_file = str(tmp_path / "AAA_model.pkl")
+    joblib.dump(model, model_file)
+    compiled_model.export("AAA", model, FEATURE_COLUMNS, str(tmp_path), model_file=model_file)
+    assert compiled_model.load(str(tmp_path), "AAA", model_file) is not None
+
+    joblib.dump(model, model_file)
+    os.utime(model_file, ns=(0, 0))
+    assert compiled_model.load(str(tmp_path), "AAA", model_file) is None
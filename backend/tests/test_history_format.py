@@ -0,0 +1,85 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from history_format import downsample_line, downsample_ohlc, lttb_indices
+
+
+def lttb_reference(y, m):
+    """Textbook LTTB over the same buckets, one point at a time."""
+    n = len(y)
+    edges = np.linspace(1, n - 1, m - 1).astype(np.int64)
+    picked, a = [0], 0
+    for i in range(m - 2):
+        lo, hi = edges[i], edges[i + 1]
+        if i + 2 < len(edges):
+            nxt = range(edges[i + 1], edges[i + 2])
+            mx, my = np.mean(list(nxt)), np.mean([y[k] for k in nxt])
+        else:
+            mx, my = n - 1, y[-1]
+        best, best_area = lo, -1.0
+        for k in range(lo, hi):
+            area = abs((a - mx) * (y[k] - y[a]) - (a - k) * (my - y[a]))
+            if area > best_area:
+                best, best_area = k, area
+        picked.append(best)
+        a = best
+    return picked + [n - 1]
+
+
+def columns(market, ticker="AAA"):
+    bars = market.bars(ticker)
+    return {
+        "date": bars.index.values.astype("datetime64[D]"),
+        "open": bars["Open"].to_numpy(np.float32),
+        "high": bars["High"].to_numpy(np.float32),
+        "low": bars["Low"].to_numpy(np.float32),
+        "close": bars["Close"].to_numpy(np.float32),
+        "volume": bars["Volume"].to_numpy(np.float32),
+    }
+
+
+@pytest.mark.parametrize("points", [3, 10, 97, 250])
+def test_lttb_matches_reference(market, points):
+    y = market.bars("BBB")["Close"].to_numpy(np.float64)
+    got = lttb_indices(y, points)
+    assert list(got) == lttb_reference(y, points)
+    assert len(got) == points and got[0] == 0 and got[-1] == len(y) - 1
+    assert (np.diff(got) > 0).all()
+
+
+def test_lttb_short_series_is_kept():
+    assert list(lttb_indices(np.arange(5.0), 10)) == [0, 1, 2, 3, 4]
+
+
+def test_downsample_line_keeps_original_bars(market):
+    cols = columns(market)
+    out = downsample_line(cols, 100)
+    keep = np.searchsorted(cols["date"], out["date"])
+    for name in cols:
+        np.testing.assert_array_equal(out[name], cols[name][keep])
+
+
+@pytest.mark.parametrize("points", [7, 100, 333])
+def test_downsample_ohlc_matches_groupby(market, points):
+    cols = columns(market)
+    n = len(cols["date"])
+    out = downsample_ohlc(cols, points)
+    assert len(out["date"]) == points
+
+    starts = np.linspace(0, n, points + 1).astype(np.int64)[:-1]
+    bucket = np.searchsorted(starts, np.arange(n), side="right") - 1
+    frame = pd.DataFrame({k: v for k, v in cols.items() if k != "date"})
+    expected = frame.groupby(bucket).agg(
+        {"open": "first", "high": "max", "low": "min", "close": "last", "volume": "sum"}
+    )
+    np.testing.assert_array_equal(out["date"], cols["date"][starts])
+    for name in ("open", "high", "low", "close"):
+        np.testing.assert_array_equal(out[name], expected[name].to_numpy())
+    np.testing.assert_allclose(out["volume"], expected["volume"].to_numpy(), rtol=1e-6)
+
+
+def test_downsample_is_a_no_op_under_the_limit(market):
+    cols = columns(market)
+    assert downsample_ohlc(cols, len(cols["date"])) is cols
+    assert downsample_line(cols, len(cols["date"])) is cols
@@ -0,0 +1,66 @@
+import pandas as pd
+
+import loader
+from loader import _extend_coverage, _missing_ranges
+
+
+def ts(day):
+    return pd.Timestamp(day)
+
+
+def test_missing_ranges_are_head_and_tail():
+    coverage = (ts("2024-03-01"), ts("2024-06-01"))
+    assert _missing_ranges(None, ts("2024-01-01"), ts("2024-02-01")) == [(ts("2024-01-01"), ts("2024-02-01"))]
+    assert _missing_ranges(coverage, ts("2024-04-01"), ts("2024-05-01")) == []
+    assert _missing_ranges(coverage, ts("2024-01-01"), ts("2024-07-01")) == [
+        (ts("2024-01-01"), ts("2024-03-01")),
+        (ts("2024-06-01"), ts("2024-07-01")),
+    ]
+
+
+def test_extend_coverage_only_over_answered_ranges():
+    coverage = (ts("2024-03-01"), ts("2024-06-01"))
+    head = (ts("2024-01-01"), ts("2024-03-01"))
+    tail = (ts("2024-06-01"), ts("2024-07-01"))
+    assert _extend_coverage(coverage, ts("2024-01-01"), ts("2024-07-01"), {head, tail}) == (head[0], tail[1])
+    assert _extend_coverage(coverage, ts("2024-01-01"), ts("2024-07-01"), {tail}) == (coverage[0], tail[1])
+    assert _extend_coverage(None, head[0], head[1], set()) is None
+
+
+def test_wider_load_fetches_only_the_missing_head_and_tail(provider, market):
+    bars = market.bars("AAA")
+    first, last = bars.index[100], bars.index[300]
+    loader.load_bars(["AAA"], first.strftime("%Y-%m-%d"), last.strftime("%Y-%m-%d"))
+    assert provider.calls == [(("AAA",), first.strftime("%Y-%m-%d"), last.strftime("%Y-%m-%d"))]
+
+    start, end = bars.index[20], bars.index[400]
+    provider.calls.clear()
+    got = loader.load_bars(["AAA"], start.strftime("%Y-%m-%d"), end.strftime("%Y-%m-%d"))["AAA"]
+    assert sorted(provider.calls) == sorted([
+        (("AAA",), start.strftime("%Y-%m-%d"), first.strftime("%Y-%m-%d")),
+        (("AAA",), last.strftime("%Y-%m-%d"), end.strftime("%Y-%m-%d")),
+    ])
+
+    # the merged cache gives the same bars as one fetch of the whole range
+    expected = provider.inner.fetch(["AAA"], start.strftime("%Y-%m-%d"), end.strftime("%Y-%m-%d"))["AAA"]
+    pd.testing.assert_frame_equal(got, expected, check_freq=False)
+
+    provider.calls.clear()
+    loader.load_bars(["AAA"], start.strftime("%Y-%m-%d"), end.strftime("%Y-%m-%d"))
+    assert provider.calls == []
+
+
+def test_ticker_without_bars_is_not_covered(provider, market, monkeypatch):
+    index = market.bars("AAA").index
+    start, end = index[50].strftime("%Y-%m-%d"), index[90].strftime("%Y-%m-%d")
+    loader.load_bars(["AAA", "NONE"], start, end)
+    assert loader.get_store().read("NONE") == (None, None)
+    assert loader.get_store().read("AAA")[1] == (ts(start), ts(end))
+
+    # the empty answer is remembered for EMPTY_FETCH_TTL, then asked again
+    provider.calls.clear()
+    loader.load_bars(["NONE"], start, end)
+    assert provider.calls == []
+    monkeypatch.setattr(loader, "_empty", {})
+    loader.load_bars(["NONE"], start, end)
+    assert provider.calls == [(("NONE",), start, end)]
@@ -0,0 +1,55 @@
+import itertools
+import math
+
+import numpy as np
+import pytest
+
+import portfolio_risk
+from portfolio_risk import atr_levels
+
+
+def single(entry, atr, equity, risk, sl_mult, tp_mult):
+    """The checks of /api/stocks/{ticker}/risk, in its order."""
+    if entry <= 0:
+        return 'bad entry', None
+    if math.isnan(atr):
+        return 'no data', None
+    if atr <= 0:
+        return 'atr problem', None
+    sl = entry - sl_mult * atr
+    if sl <= 0:
+        return 'stop loss bad', None
+    return None, int(min(equity * risk / (entry - sl), equity / entry))
+
+
+def test_errors_and_shares_match_the_single_ticker_endpoint():
+    entries = [-5.0, 0.0, 0.5, 20.0, 150.0]
+    atrs = [np.nan, -1.0, 0.0, 0.2, 4.0, 30.0]
+    cases = list(itertools.product(entries, atrs))
+    entry = [e for e, _ in cases]
+    atr = [a for _, a in cases]
+    _, _, shares, errors = atr_levels(entry, atr, 50000.0, 0.01, 1.5, 3.0)
+    for i, (e, a) in enumerate(cases):
+        error, expected = single(e, a, 50000.0, 0.01, 1.5, 3.0)
+        assert errors[i] == error, (e, a)
+        assert shares[i] == (expected if error is None else 0), (e, a)
+
+
+def test_assess_reports_bad_rows_and_splits_the_risk(provider):
+    result = portfolio_risk.assess([
+        {"ticker": "AAA", "entry_price": 100.0},
+        {"ticker": "BBB", "entry_price": 100.0, "shares": 10},
+        {"ticker": "AAA", "entry_price": 100.0, "shares": 5},
+        {"ticker": "NONE", "entry_price": 100.0},
+        {"ticker": "CCC", "entry_price": -1.0},
+    ], lookback_days=200)
+    rows = result["positions"]
+    assert rows[3]["error"] == "no data"
+    assert rows[4]["error"] == "bad entry"
+    assert rows[1]["shares"] == 10 and rows[2]["shares"] == 5
+    assert result["portfolio"]["positions"] == 3
+
+    # one covariance column per ticker, and contributions add up to 1
+    assert result["covariance"]["tickers"] == ["AAA", "BBB"]
+    total = sum(r["risk_contribution"] for r in rows if "error" not in r)
+    assert total == pytest.approx(1.0)
@@ -0,0 +1,41 @@
+import numpy as np
+
+from indicator_engine import INDICATOR_COLUMNS, stream_indicators
+from screener import PanelState, _columns, _dates_of, _fold, _stack
+
+
+def test_panel_state_matches_indicator_state_bit_for_bit(market):
+    # tickers that start late and skip days exercise the per-ticker mask
+    frames = {
+        "AAA": market.bars("AAA"),
+        "BBB": market.bars("BBB").iloc[150:],
+        "CCC": market.bars("CCC").drop(market.bars("CCC").index[60:400:7]),
+    }
+    tickers = list(frames)
+    bars = _columns(frames)
+    dates = _dates_of(bars)
+    prices, mask = _stack(bars, tickers, dates)
+    out = _fold(PanelState(len(tickers)), prices, mask)
+
+    for j, ticker in enumerate(tickers):
+        expected = stream_indicators(frames[ticker])
+        rows = mask[:, j]
+        assert rows.sum() == len(expected)
+        for col in INDICATOR_COLUMNS:
+            np.testing.assert_array_equal(out[col][rows, j], expected[col].to_numpy(), err_msg=f"{ticker} {col}")
+        # dates without a bar stay NaN
+        assert np.isnan(out['ATR'][~rows, j]).all()
+
+
+def test_panel_state_folds_in_pieces_like_one_pass(market):
+    frames = {t: market.bars(t) for t in ("AAA", "BBB")}
+    bars = _columns(frames)
+    dates = _dates_of(bars)
+    prices, mask = _stack(bars, list(frames), dates)
+
+    whole = _fold(PanelState(2), prices, mask)
+    state = PanelState(2)
+    head = _fold(state, {f: v[:300] for f, v in prices.items()}, mask[:300])
+    tail = _fold(state, {f: v[300:] for f, v in prices.items()}, mask[300:])
+    for col in INDICATOR_COLUMNS:
+        np.testing.assert_array_equal(np.concatenate([head[col], tail[col]]), whole[col])
@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+from indicators import compute_indicators
+from simulator import simulate
+
+
+def reference(bars, signals, sl_mult, tp_mult, risk, max_hold):
+    """The trading rule of simulator.py, one trade at a time in plain Python."""
+    o, h, l, c, atr = (bars[k].to_numpy(float) for k in ('Open', 'High', 'Low', 'Close', 'ATR'))
+    n = len(c)
+    equity, trades, wins, hold = 1.0, 0, 0, 0
+    i = 0
+    while i < n - 1:
+        if not (signals[i] and atr[i] > 0):
+            i += 1
+            continue
+        entry = c[i]
+        stop, target = entry - sl_mult * atr[i], entry + tp_mult * atr[i]
+        exit_bar, exit_px = min(i + max_hold, n - 1), None
+        for j in range(i + 1, min(i + max_hold, n - 1) + 1):
+            if l[j] <= stop:
+                exit_bar, exit_px = j, min(o[j], stop)
+                break
+            if h[j] >= target:
+                exit_bar, exit_px = j, max(o[j], target)
+                break
+        if exit_px is None:
+            exit_px = c[exit_bar]
+        size = min(risk * entry / (sl_mult * atr[i]), 1.0)
+        gain = size * (exit_px / entry - 1.0)
+        equity *= 1.0 + gain
+        trades += 1
+        wins += gain > 0
+        hold += exit_bar - i
+        i = exit_bar   # the next trade may open on the exit bar
+    return trades, wins, equity - 1.0, hold
+
+
+@pytest.fixture(scope="module")
+def bars(market):
+    return compute_indicators(market.bars("AAA").copy())
+
+
+@pytest.mark.parametrize("max_hold", [1, 5, 20])
+def test_vectorized_chain_matches_one_trade_at_a_time(bars, max_hold):
+    rng = np.random.default_rng(3)
+    signals = rng.random(len(bars)) < 0.4
+    sl, tp, risk = [0.5, 1.5, 3.0], [1.0, 2.5], [0.005, 0.02]
+    res = simulate(bars, signals, sl, tp, risk, max_hold=max_hold)
+
+    for r, risk_frac in enumerate(risk):
+        for s, sl_mult in enumerate(sl):
+            for t, tp_mult in enumerate(tp):
+                trades, wins, total, hold = reference(bars, signals, sl_mult, tp_mult, risk_frac, max_hold)
+                assert res['trades'][r, s, t] == trades
+                assert res['win_rate'][r, s, t] == pytest.approx(wins / trades)
+                assert res['total_return'][r, s, t] == pytest.approx(total, rel=1e-9, abs=1e-12)
+                assert res['avg_hold_bars'][r, s, t] == pytest.approx(hold / trades)
+
+
+def test_no_signals_means_no_trades(bars):
+    res = simulate(bars, np.zeros(len(bars)), [1.0], [2.0], [0.01])
+    assert res['trades'].sum() == 0
+    assert (res['total_return'] == 0).all()
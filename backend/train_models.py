@@ -7,11 +7,23 @@ from sklearn.ensemble import RandomForestClassifier, VotingClassifier
 from xgboost import XGBClassifier
 from sklearn.metrics import accuracy_score
 import joblib
+import hashlib
+import json
 import os
+import sys
+import time
+import uuid
+import argparse
+import multiprocessing
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from datetime import date, timedelta, datetime
 
 # NEW: imports for DB
-from db import SessionLocal, TrainedModel
+from db import SessionLocal, TrainedModel, TrainingRun, ModelConfig
+import prediction_cache
+import compiled_model
+import metrics
 
 
 # -----------------------------------------------------------
@@ -23,88 +35,254 @@ stocksSupported = [
 ]
 
 baseDir = os.path.dirname(os.path.abspath(__file__))
-modelDir = os.path.join(baseDir, "models")
+modelDir = os.environ.get("AUGUR_MODEL_DIR", os.path.join(baseDir, "models"))
 os.makedirs(modelDir, exist_ok=True)
 
+# indicator columns the models are trained on
+FEATURE_COLUMNS = ['SMA_3', 'EMA_3', 'RSI', 'MACD', 'MACD_signal']
+
 
 # -----------------------------------------------------------
-# SAVE MODELS (unchanged)
+# SAVE MODELS
 # -----------------------------------------------------------
-def save_models(stocks_data, use_ensemble=True):
-    for ticker, df in stocks_data.items():
-        X = df[['SMA_3', 'EMA_3', 'RSI', 'MACD', 'MACD_signal']]
-        y = df['Target']
-        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.3, shuffle=False)
-
-        if use_ensemble:
-            model = VotingClassifier(
-                estimators=[
-                    ('lr', LogisticRegression(max_iter=1000, random_state=42)),
-                    ('rf', RandomForestClassifier(n_estimators=100, random_state=42)),
-                    ('xgb', XGBClassifier(
-                        n_estimators=200,
-                        max_depth=6,
-                        learning_rate=0.05,
-                        eval_metric='logloss',
-                        random_state=42
-                    )),
-                ],
-                voting='hard'
-            )
+# hyperparameters of each ensemble member unless model_selection.py has
+# stored tuned ones for the ticker (ModelConfig table)
+MODEL_PARAMS = {
+    'lr': {'C': 1.0},
+    'rf': {'n_estimators': 100, 'max_depth': None, 'min_samples_leaf': 1},
+    'xgb': {'n_estimators': 200, 'max_depth': 6, 'learning_rate': 0.05},
+}
 
-            model.fit(X_train, y_train)
-            ensemble_acc = accuracy_score(y_test, model.predict(X_test))
-            print(f"  Ensemble accuracy for {ticker}: {ensemble_acc:.4f}")
 
-        else:
-            model = XGBClassifier(
-                n_estimators=200,
-                max_depth=6,
-                learning_rate=0.05,
-                eval_metric='logloss'
-            )
-            model.fit(X_train, y_train)
+def model_params(params=None):
+    """MODEL_PARAMS with the members' entries overridden by params."""
+    params = params or {}
+    return {name: {**defaults, **params.get(name, {})} for name, defaults in MODEL_PARAMS.items()}
 
-        # Save files
-        model_path = os.path.join(modelDir, f"{ticker}_model.pkl")
-        features_path = os.path.join(modelDir, f"{ticker}_features.pkl")
 
-        joblib.dump(model, model_path)
-        joblib.dump(list(X.columns), features_path)
+def build_model(use_ensemble=True, n_jobs=None, params=None):
+    """
+    The estimator we train per ticker. n_jobs caps the RandomForest and
+    XGBoost thread count (None keeps their defaults); params overrides
+    MODEL_PARAMS.
+    """
+    params = model_params(params)
+    if use_ensemble:
+        return VotingClassifier(
+            estimators=[
+                ('lr', LogisticRegression(max_iter=1000, random_state=42, **params['lr'])),
+                ('rf', RandomForestClassifier(random_state=42, n_jobs=n_jobs, **params['rf'])),
+                ('xgb', XGBClassifier(
+                    eval_metric='logloss',
+                    random_state=42,
+                    n_jobs=n_jobs,
+                    **params['xgb'],
+                )),
+            ],
+            voting='hard'
+        )
+    return XGBClassifier(
+        eval_metric='logloss',
+        n_jobs=n_jobs,
+        **params['xgb'],
+    )
+
+
+def tuned_params(tickers):
+    """ticker -> params of its stored ModelConfig, for the tickers that have one."""
+    db = SessionLocal()
+    try:
+        rows = db.query(ModelConfig).filter(ModelConfig.ticker.in_(list(tickers))).all()
+        return {row.ticker: json.loads(row.params) for row in rows}
+    except Exception as e:
+        print(f"[train_models] could not read tuned configs: {e}")
+        return {}
+    finally:
+        db.close()
 
-        model_type = "Ensemble" if use_ensemble else "XGBoost"
-        print(f"Saved {model_type} model for {ticker} at {model_path}")
 
+def _reset_peak_rss():
+    """
+    Reset this process' peak RSS so the next reading covers one fit only.
+    Linux supports this (/proc/self/clear_refs); returns False elsewhere.
+    """
+    try:
+        with open("/proc/self/clear_refs", "w") as fh:
+            fh.write("5")
+        return True
+    except OSError:
+        return False
 
-# -----------------------------------------------------------
-# NEW: TRAIN FOR ANY TICKERS + DB WRITE
-# -----------------------------------------------------------
-def train_for_tickers(tickers, years_back: int = 3):
+
+def _peak_rss_mb():
+    """Peak resident memory of this process in MB (None where unsupported)."""
+    try:
+        with open("/proc/self/status") as fh:
+            for line in fh:
+                if line.startswith("VmHWM:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def fingerprint(df):
+    """Hash of the rows a model is fit on (dates, features and target)."""
+    h = hashlib.blake2b(digest_size=16)
+    h.update(",".join(FEATURE_COLUMNS).encode())
+    h.update(df.index.values.astype('datetime64[ns]').astype(np.int64).tobytes())
+    h.update(np.ascontiguousarray(df[FEATURE_COLUMNS + ['Target']].to_numpy(dtype=np.float64)).tobytes())
+    return h.hexdigest()
+
+
+def _single_threaded(model):
     """
-    Train models for a given list of tickers and save them to /models.
-    Also write/update metadata in the TrainedModel DB table.
+    Reset the fitted members' n_jobs to 1 before the model is pickled: the
+    server predicts one row at a time, where a thread pool per call only
+    adds overhead. (Training threads are set through build_model.) The
+    LogisticRegression is left alone: its n_jobs has no effect since
+    sklearn 1.8 and setting it warns on every fit.
     """
-    tickers = [t.upper() for t in tickers if t.strip()]
-    if not tickers:
-        return []
+    members = getattr(model, 'estimators_', None) or [model]
+    for est in list(members) + [model]:
+        if isinstance(est, (RandomForestClassifier, XGBClassifier, VotingClassifier)):
+            est.set_params(n_jobs=1)
+    return model
 
-    start = (date.today() - timedelta(days=365 * years_back)).strftime("%Y-%m-%d")
-    end = date.today().strftime("%Y-%m-%d")
-    print(f"[train_for_tickers] Loading data {start} → {end} for: {', '.join(tickers)}")
 
-    # Load data
-    data = load_stocks(tickers, start)
-    if not data:
-        print("[train_for_tickers] ERROR: No data loaded.")
-        return []
+def save_model(ticker, model, X):
+    """Write the model, its feature list and the compiled serving copy."""
+    model_path = os.path.join(modelDir, f"{ticker}_model.pkl")
+    features_path = os.path.join(modelDir, f"{ticker}_features.pkl")
 
-    # Save models to files
-    save_models(data, use_ensemble=True)
+    joblib.dump(_single_threaded(model), model_path)
+    joblib.dump(list(X.columns), features_path)
 
-    # ----- Write metadata to database -----
+    # compact memory-mapped copy used for serving (falls back to the pickle)
+    try:
+        compiled_model.export(ticker, model, list(X.columns), modelDir, model_file=model_path, X_check=X)
+    except Exception as e:
+        print(f"  WARNING: could not export compiled model for {ticker}: {e}")
+    return model_path
+
+
+def _fit_one(ticker, df, use_ensemble=True, n_jobs=None, params=None):
+    """
+    Fit and save one ticker's model; returns timing / memory stats. The
+    peak RSS is that of this fit where the platform can reset it, and the
+    whole process' peak so far otherwise (peak_rss_scope).
+    """
+    per_fit = _reset_peak_rss()
+    started = time.perf_counter()
+
+    X = df[FEATURE_COLUMNS]
+    y = df['Target']
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.3, shuffle=False)
+
+    model = build_model(use_ensemble, n_jobs=n_jobs, params=params)
+    model.fit(X_train, y_train)
+    accuracy = accuracy_score(y_test, model.predict(X_test))
+    if use_ensemble:
+        print(f"  Ensemble accuracy for {ticker}: {accuracy:.4f}")
+
+    model_path = save_model(ticker, model, X)
+    model_type = "Ensemble" if use_ensemble else "XGBoost"
+    print(f"Saved {model_type} model for {ticker} at {model_path}")
+
+    return {
+        "ticker": ticker,
+        "rows": len(df),
+        "accuracy": float(accuracy),
+        "seconds": round(time.perf_counter() - started, 3),
+        "peak_rss_mb": _peak_rss_mb(),
+        "peak_rss_scope": "fit" if per_fit else "process",
+        "pid": os.getpid(),
+    }
+
+
+def _limit_worker_threads(threads):
+    """Pool initializer: keep each worker's native thread pools to `threads`."""
+    for var in ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS"):
+        os.environ[var] = str(threads)
+    try:
+        from threadpoolctl import threadpool_limits
+        threadpool_limits(threads)
+    except ImportError:
+        pass
+
+
+def save_models(stocks_data, use_ensemble=True, workers=1, threads_per_worker=None, configs=None):
+    """
+    Train and save one model per ticker. With workers > 1 tickers are spread
+    over that many processes, each limited to threads_per_worker threads
+    (default: cores // workers) so the pool does not oversubscribe the CPU.
+    configs maps ticker -> params for build_model (see tuned_params).
+    Returns per-ticker stats (seconds, peak RSS, hold-out accuracy).
+    """
+    configs = configs or {}
+    started = time.perf_counter()
+    stats = []
+
+    if workers <= 1 or len(stocks_data) <= 1:
+        for ticker, df in stocks_data.items():
+            try:
+                stats.append(_fit_one(ticker, df, use_ensemble, n_jobs=threads_per_worker, params=configs.get(ticker)))
+            except Exception as e:
+                print(f"  ERROR training {ticker}: {e}")
+    else:
+        workers = min(workers, len(stocks_data))
+        threads = threads_per_worker or max(1, (os.cpu_count() or 1) // workers)
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_limit_worker_threads,
+            initargs=(threads,),
+        ) as pool:
+            futures = {
+                pool.submit(_fit_one, ticker, df, use_ensemble, threads, configs.get(ticker)): ticker
+                for ticker, df in stocks_data.items()
+            }
+            for future in as_completed(futures):
+                try:
+                    stats.append(future.result())
+                except Exception as e:
+                    print(f"  ERROR training {futures[future]}: {e}")
+
+    total = time.perf_counter() - started
+    _print_training_report(stats, total)
+    return stats
+
+
+def _print_training_report(stats, total_seconds):
+    if not stats:
+        return
+    print(f"\n{'Ticker':<8}{'Rows':>7}{'Acc':>8}{'Seconds':>10}{'Peak MB':>10}")
+    for s in sorted(stats, key=lambda s: s["ticker"]):
+        peak = f"{s['peak_rss_mb']:.1f}" if s["peak_rss_mb"] is not None else "n/a"
+        print(f"{s['ticker']:<8}{s['rows']:>7}{s['accuracy']:>8.4f}{s['seconds']:>10.2f}{peak:>10}")
+    if any(s.get("peak_rss_scope") == "process" for s in stats):
+        print("(Peak MB is each worker process' peak so far, not per ticker, on this platform)")
+    busy = sum(s["seconds"] for s in stats)
+    print(f"Trained {len(stats)} models in {total_seconds:.2f}s wall ({busy:.2f}s of fitting)\n")
+
+
+# -----------------------------------------------------------
+# NEW: TRAIN FOR ANY TICKERS + DB WRITE
+# -----------------------------------------------------------
+def record_models(scores, start, end):
+    """
+    Write/update the TrainedModel rows of the given tickers. scores maps
+    ticker -> hold-out accuracy, or None to keep the stored one.
+    """
     db = SessionLocal()
     try:
-        for ticker in data.keys():
+        for ticker, score in scores.items():
             model_path = os.path.join(modelDir, f"{ticker}_model.pkl")
             features_path = os.path.join(modelDir, f"{ticker}_features.pkl")
 
@@ -122,6 +300,8 @@ def train_for_tickers(tickers, years_back: int = 3):
                 existing.last_trained_at = datetime.utcnow()
                 existing.data_start = start
                 existing.data_end = end
+                if score is not None:
+                    existing.val_score = score
                 existing.is_active = True
 
             else:
@@ -133,6 +313,7 @@ def train_for_tickers(tickers, years_back: int = 3):
                     last_trained_at=datetime.utcnow(),
                     data_start=start,
                     data_end=end,
+                    val_score=score,
                     is_active=True,
                 )
                 db.add(tm)
@@ -146,13 +327,94 @@ def train_for_tickers(tickers, years_back: int = 3):
     finally:
         db.close()
 
-    return list(data.keys())
+
+def record_runs(runs):
+    """Append TrainingRun rows (dicts of its columns)."""
+    if not runs:
+        return
+    db = SessionLocal()
+    try:
+        db.add_all(TrainingRun(**run) for run in runs)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        print(f"[train_models] ERROR saving run history: {e}")
+    finally:
+        db.close()
+
+
+def train_for_tickers(tickers, years_back: int = 3, workers: int = 1, reasons=None, batch_id=None):
+    """
+    Train models for a given list of tickers and save them to /models.
+    Also write/update metadata in the TrainedModel DB table and record a
+    "full" TrainingRun per ticker (reasons: ticker -> why, default
+    "requested"). workers > 1 trains the tickers in parallel processes
+    (see save_models). Tickers tuned by model_selection.py are fit with
+    their stored config.
+    """
+    tickers = [t.upper() for t in tickers if t.strip()]
+    if not tickers:
+        return []
+    reasons = reasons or {}
+    batch_id = batch_id or uuid.uuid4().hex[:12]
+
+    start = (date.today() - timedelta(days=365 * years_back)).strftime("%Y-%m-%d")
+    end = date.today().strftime("%Y-%m-%d")
+    print(f"[train_for_tickers] Loading data {start} → {end} for: {', '.join(tickers)}")
+
+    # Load data
+    with metrics.span("train.load_data"):
+        data = load_stocks(tickers, start)
+    if not data:
+        print("[train_for_tickers] ERROR: No data loaded.")
+        return []
+
+    # Save models to files
+    started_at = datetime.utcnow()
+    with metrics.span("train.fit"):
+        stats = {
+            s["ticker"]: s
+            for s in save_models(data, use_ensemble=True, workers=workers, configs=tuned_params(data))
+        }
+
+    # ----- Write metadata to database -----
+    with metrics.span("train.db_write"):
+        record_models({t: s["accuracy"] for t, s in stats.items()}, start, end)
+        record_runs([
+            {
+                "batch_id": batch_id,
+                "ticker": ticker,
+                "mode": "full" if ticker in stats else "failed",
+                "reason": reasons.get(ticker, "requested") if ticker in stats else "training failed",
+                "fingerprint": fingerprint(data[ticker]) if ticker in stats else None,
+                "data_start": start,
+                # indicators drop the warm-up rows, so a short history is empty
+                "last_bar": data[ticker].index[-1].strftime("%Y-%m-%d") if len(data[ticker]) else None,
+                "rows": len(data[ticker]),
+                "score": stats[ticker]["accuracy"] if ticker in stats else None,
+                "seconds": stats[ticker]["seconds"] if ticker in stats else None,
+                "started_at": started_at,
+            }
+            for ticker in data
+        ])
+
+    # cached predictions were made by the old models
+    prediction_cache.invalidate(list(stats.keys()))
+
+    return list(stats.keys())
 
 
 # -----------------------------------------------------------
 # ORIGINAL MAIN() (kept for batch training)
 # -----------------------------------------------------------
 def main():
+    parser = argparse.ArgumentParser(description="Train models for supported stocks")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="train this many tickers in parallel processes")
+    parser.add_argument("--threads-per-worker", type=int, default=None,
+                        help="thread budget per worker (default: cores // workers)")
+    args = parser.parse_args()
+
     print("Training models for supported stocks\n")
     print(f"Stocks: {', '.join(stocksSupported)}")
 
@@ -166,7 +428,13 @@ def main():
             return
 
         print(f"Loaded {len(data)} stocks. Training...")
-        save_models(data, use_ensemble=True)
+        save_models(
+            data,
+            use_ensemble=True,
+            workers=args.workers,
+            threads_per_worker=args.threads_per_worker,
+            configs=tuned_params(data),
+        )
 
         print(f"\nDone! Models saved in: {modelDir}")
 
@@ -0,0 +1,317 @@
+# validation.py
+"""
+Walk-forward validation of the per-ticker models.
+
+For every ticker the last `days` bars are scored out of sample. The model
+(built with the ticker's tuned config from model_selection.py, if it has
+one) is fit on everything before the window and predicts the next
+`refit_every` bars in one batch. It is then continued with those bars the
+way retrain.py's incremental runs do (retrain.continue_fit: more boosting
+rounds from the XGBoost booster, the logistic regression refit, the random
+forest kept), and so on. A 60-day window with refit_every=20 costs one
+full fit and 2 updates per ticker, not 60 fits. refit_every=0 fits once
+for the whole window, and --saved scores the models in models/ without
+fitting anything.
+
+Tickers are validated in parallel processes (same pool setup as
+train_models.save_models). The confusion matrices for all tickers are then
+computed in one vectorized pass. The report is written to
+results/validation_report_<YYYYMMDD>.txt (the existing format) plus a
+.json with the same numbers and timings.
+
+    python validation.py                          # supported stocks, last 60 days
+    python validation.py --tickers AAPL MSFT --days 120 --refit-every 30 --workers 4
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date, timedelta
+
+import joblib
+import numpy as np
+
+from loader import load_stocks
+from retrain import _NeedsFullRefit, continue_fit
+from train_models import (
+    FEATURE_COLUMNS, build_model, modelDir, stocksSupported, tuned_params, _limit_worker_threads,
+)
+
+
+baseDir = os.path.dirname(os.path.abspath(__file__))
+RESULTS_DIR = os.path.join(os.path.dirname(baseDir), "results")
+
+# bars a fold needs to train on before it is worth scoring
+MIN_TRAIN_ROWS = 100
+
+
+# -----------------------------------------------------------
+# PER-TICKER WALK-FORWARD
+# -----------------------------------------------------------
+def _walk_forward(ticker, df, days, refit_every, use_saved=False, n_jobs=None, params=None):
+    """
+    Out-of-sample predictions for the last `days` bars of df; params is
+    the ticker's tuned config (None for the defaults).
+    """
+    started = time.perf_counter()
+
+    # the newest bar's next-day move is not known yet, so it has no target
+    df = df.iloc[:-1]
+    split = len(df) - days
+    if split < (0 if use_saved else MIN_TRAIN_ROWS):
+        raise ValueError(f"only {len(df)} rows, need {days + MIN_TRAIN_ROWS}")
+
+    y = df['Target'].to_numpy(dtype=np.int64)
+    preds = np.empty(days, dtype=np.int64)
+    fits = updates = 0
+
+    if use_saved:
+        model = joblib.load(os.path.join(modelDir, f"{ticker}_model.pkl"))
+        features = joblib.load(os.path.join(modelDir, f"{ticker}_features.pkl"))
+        preds[:] = model.predict(df[features].iloc[split:])
+    else:
+        X, target = df[FEATURE_COLUMNS], df['Target']
+        step = refit_every if refit_every and refit_every > 0 else days
+        model, fitted_to = None, 0
+        for lo in range(split, len(df), step):
+            hi = min(lo + step, len(df))
+            if model is not None:
+                try:
+                    model = continue_fit(model, X.iloc[:lo], target.iloc[:lo], lo - fitted_to)
+                    updates += 1
+                except _NeedsFullRefit as e:
+                    print(f"[validation] {ticker}: refitting at {df.index[lo].date()}: {e}")
+                    model = None
+            if model is None:
+                model = build_model(use_ensemble=True, n_jobs=n_jobs, params=params)
+                model.fit(X.iloc[:lo], target.iloc[:lo])
+                fits += 1
+            fitted_to = lo
+            preds[lo - split:hi - split] = model.predict(X.iloc[lo:hi])
+
+    return {
+        "ticker": ticker,
+        "dates": [d.strftime("%Y-%m-%d") for d in df.index[split:]],
+        "y_true": y[split:],
+        "y_pred": preds,
+        "fits": fits,
+        "updates": updates,
+        "tuned": params is not None,
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+
+
+# -----------------------------------------------------------
+# METRICS
+# -----------------------------------------------------------
+def score(y_true, y_pred):
+    """
+    Confusion-matrix metrics for a (tickers, days) batch of 0/1 labels.
+    Returns one dict of 1-D arrays (one entry per ticker).
+    """
+    y_true = np.atleast_2d(np.asarray(y_true, dtype=bool))
+    y_pred = np.atleast_2d(np.asarray(y_pred, dtype=bool))
+    tp = (y_true & y_pred).sum(axis=1)
+    fp = (~y_true & y_pred).sum(axis=1)
+    fn = (y_true & ~y_pred).sum(axis=1)
+    tn = (~y_true & ~y_pred).sum(axis=1)
+    total = tp + fp + fn + tn
+    with np.errstate(divide='ignore', invalid='ignore'):
+        accuracy = np.where(total > 0, (tp + tn) / total, 0.0)
+        precision = np.where(tp + fp > 0, tp / (tp + fp), 0.0)
+        recall = np.where(tp + fn > 0, tp / (tp + fn), 0.0)
+    return {
+        "total": total, "correct": tp + tn,
+        "tp": tp, "fp": fp, "fn": fn, "tn": tn,
+        "accuracy": accuracy, "precision": precision, "recall": recall,
+    }
+
+
+# -----------------------------------------------------------
+# RUN + REPORT
+# -----------------------------------------------------------
+def validate(tickers, days=60, refit_every=20, years_back=3, workers=1,
+             threads_per_worker=None, use_saved=False):
+    """Walk-forward validate tickers; returns the report dict (see write_report)."""
+    started = time.perf_counter()
+    start = (date.today() - timedelta(days=int(365 * years_back))).strftime("%Y-%m-%d")
+    data = load_stocks(tickers, start)
+    load_seconds = time.perf_counter() - started
+    configs = {} if use_saved else tuned_params(data)
+
+    runs, errors = [], {}
+    if workers <= 1 or len(data) <= 1:
+        for ticker, df in data.items():
+            try:
+                runs.append(_walk_forward(
+                    ticker, df, days, refit_every, use_saved, threads_per_worker, configs.get(ticker)
+                ))
+            except Exception as e:
+                errors[ticker] = str(e)
+    else:
+        workers = min(workers, len(data))
+        threads = threads_per_worker or max(1, (os.cpu_count() or 1) // workers)
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_limit_worker_threads,
+            initargs=(threads,),
+        ) as pool:
+            futures = {
+                pool.submit(_walk_forward, ticker, df, days, refit_every, use_saved, threads, configs.get(ticker)): ticker
+                for ticker, df in data.items()
+            }
+            for future in as_completed(futures):
+                try:
+                    runs.append(future.result())
+                except Exception as e:
+                    errors[futures[future]] = str(e)
+
+    for ticker in tickers:
+        if ticker not in data:
+            errors[ticker] = "no data"
+    for ticker, err in errors.items():
+        print(f"[validation] skipped {ticker}: {err}")
+
+    # keep the caller's ticker order in the report
+    order = {t: i for i, t in enumerate(tickers)}
+    runs.sort(key=lambda r: order.get(r["ticker"], len(order)))
+
+    metrics = score([r["y_true"] for r in runs], [r["y_pred"] for r in runs]) if runs else None
+    results = []
+    for i, r in enumerate(runs):
+        m = {k: v[i].item() for k, v in metrics.items()}
+        results.append({
+            "ticker": r["ticker"],
+            "start": r["dates"][0],
+            "end": r["dates"][-1],
+            **m,
+            "predicted_up": m["tp"] + m["fp"],
+            "actual_up": m["tp"] + m["fn"],
+            "fits": r["fits"],
+            "updates": r["updates"],
+            "tuned": r["tuned"],
+            "seconds": r["seconds"],
+        })
+
+    def mean(key):
+        return float(np.mean([r[key] for r in results])) if results else 0.0
+
+    return {
+        "date": date.today().isoformat(),
+        "days": days,
+        "refit_every": None if use_saved else (refit_every or days),
+        "mode": "saved" if use_saved else "walk-forward",
+        "results": results,
+        "errors": errors,
+        "averages": {
+            "accuracy": mean("accuracy"),
+            "precision": mean("precision"),
+            "recall": mean("recall"),
+        },
+        "timing": {
+            "load_seconds": round(load_seconds, 3),
+            "total_seconds": round(time.perf_counter() - started, 3),
+            "fit_seconds": round(sum(r["seconds"] for r in results), 3),
+            "workers": workers,
+        },
+    }
+
+
+def format_report(report):
+    lines = [
+        "MODEL VALIDATION REPORT",
+        "=" * 60,
+        f"Date: {report['date']}",
+        f"Validation Period: Last {report['days']} days",
+        f"Models Validated: {len(report['results'])}",
+    ]
+    if report["mode"] == "saved":
+        lines.append("Models: saved (no refit)")
+    else:
+        lines.append(f"Walk-forward: refit every {report['refit_every']} days")
+    lines.append("")
+
+    def pct(x):
+        return f"{x:.4f} ({x * 100:.2f}%)"
+
+    for r in report["results"]:
+        lines += [
+            "",
+            f"{r['ticker']} Results:",
+            "-" * 40,
+            f"Total Predictions: {r['total']}",
+            f"Correct Predictions: {r['correct']}",
+            f"Accuracy: {pct(r['accuracy'])}",
+            f"Precision: {pct(r['precision'])}",
+            f"Recall: {pct(r['recall'])}",
+            "",
+            "Confusion Matrix:",
+            f"  True Positives:  {r['tp']}",
+            f"  False Positives: {r['fp']}",
+            f"  False Negatives: {r['fn']}",
+            f"  True Negatives:  {r['tn']}",
+            "",
+            f"Predicted UP: {r['predicted_up']}, Actual UP: {r['actual_up']}",
+        ]
+
+    avg = report["averages"]
+    lines += [
+        "",
+        "",
+        "OVERALL AVERAGES:",
+        "-" * 40,
+        f"Average Accuracy:  {pct(avg['accuracy'])}",
+        f"Average Precision: {pct(avg['precision'])}",
+        f"Average Recall:    {pct(avg['recall'])}",
+    ]
+    return "\n".join(lines) + "\n"
+
+
+def write_report(report, output_dir=RESULTS_DIR):
+    """Write the .txt and .json report; returns both paths."""
+    os.makedirs(output_dir, exist_ok=True)
+    stem = os.path.join(output_dir, f"validation_report_{report['date'].replace('-', '')}")
+    with open(stem + ".txt", "w") as fh:
+        fh.write(format_report(report))
+    with open(stem + ".json", "w") as fh:
+        json.dump(report, fh, indent=2)
+    return stem + ".txt", stem + ".json"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Walk-forward validation of the per-ticker models")
+    parser.add_argument("--tickers", nargs="+", default=stocksSupported)
+    parser.add_argument("--days", type=int, default=60, help="length of the validation window")
+    parser.add_argument("--refit-every", type=int, default=20,
+                        help="refit after this many scored days (0 = fit once per ticker)")
+    parser.add_argument("--years", type=float, default=3, help="history to load per ticker")
+    parser.add_argument("--workers", type=int, default=1, help="validate this many tickers in parallel")
+    parser.add_argument("--threads-per-worker", type=int, default=None)
+    parser.add_argument("--saved", action="store_true", help="score the saved models instead of refitting")
+    parser.add_argument("--output-dir", default=RESULTS_DIR)
+    args = parser.parse_args()
+
+    report = validate(
+        [t.upper() for t in args.tickers],
+        days=args.days,
+        refit_every=args.refit_every,
+        years_back=args.years,
+        workers=args.workers,
+        threads_per_worker=args.threads_per_worker,
+        use_saved=args.saved,
+    )
+    txt_path, json_path = write_report(report, args.output_dir)
+
+    timing = report["timing"]
+    avg = report["averages"]
+    print(f"Validated {len(report['results'])} tickers in {timing['total_seconds']:.2f}s "
+          f"(data {timing['load_seconds']:.2f}s, fitting {timing['fit_seconds']:.2f}s)")
+    print(f"Average accuracy {avg['accuracy']:.4f}, precision {avg['precision']:.4f}, recall {avg['recall']:.4f}")
+    print(f"Report: {txt_path}\n        {json_path}")
+
+
+if __name__ == "__main__":
+    main()
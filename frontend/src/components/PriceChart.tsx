@@ -14,8 +14,13 @@ type HistoryPoint = {
 type HistoryResponse = {
   ticker: string;
   prices: HistoryPoint[];
+  sourcePoints?: number;
 };
 
+// zoomed-in slice fetched at higher resolution; `view` ties it to the
+// symbol + timeframe it was taken from
+type DetailRange = { view: string; start: string; end?: string };
+
 type Props = {
   symbol: string;
   period?: string;
@@ -35,6 +40,10 @@ const TIMEFRAMES = [
   { key: "MAX", period: "max" },
 ];
 
+// bars requested per fetch; the server downsamples longer ranges to this
+// (the plot is 800px wide, candles need ~2px each)
+const MAX_POINTS: Record<ChartType, number> = { candles: 400, line: 800 };
+
 // ---------- indicator calculations ----------
 
 function computeSMA(values: number[], length: number): (number | null)[] {
@@ -205,6 +214,12 @@ const PriceChart: React.FC<Props> = ({ symbol, period }) => {
   const [viewStart, setViewStart] = useState(0);
   const [viewEnd, setViewEnd] = useState<number | null>(null);
 
+  // bars in the loaded range before server-side downsampling
+  const [sourcePoints, setSourcePoints] = useState(0);
+  const [detailRange, setDetailRange] = useState<DetailRange | null>(null);
+  const viewKey = `${symbol}|${timeframeKey}`;
+  const detail = detailRange?.view === viewKey ? detailRange : null;
+
   // model prediction overlay
   const [prediction, setPrediction] = useState<PredictionValue>(null);
 
@@ -231,13 +246,20 @@ const PriceChart: React.FC<Props> = ({ symbol, period }) => {
 
         const data: HistoryResponse = await apiService.getStockHistory(
           symbol,
-          backendPeriod
+          backendPeriod,
+          {
+            start: detail?.start,
+            end: detail?.end,
+            maxPoints: MAX_POINTS[chartType],
+            mode: chartType === "line" ? "line" : "ohlc",
+          }
         );
 
         if (cancelled) return;
 
         const series = data.prices || [];
         setPrices(series);
+        setSourcePoints(data.sourcePoints ?? series.length);
         setViewStart(0);
         setViewEnd(series.length ? series.length - 1 : null);
         setHoverIndex(null);
@@ -256,7 +278,8 @@ const PriceChart: React.FC<Props> = ({ symbol, period }) => {
     return () => {
       cancelled = true;
     };
-  }, [symbol, timeframeKey]);
+    // eslint-disable-next-line react-hooks/exhaustive-deps
+  }, [symbol, timeframeKey, chartType, detail?.start, detail?.end]);
 
   // ---------- fetch prediction ----------
   useEffect(() => {
@@ -316,6 +339,23 @@ const PriceChart: React.FC<Props> = ({ symbol, period }) => {
 
   const hasData = visible.length > 0;
 
+  // zoomed into downsampled bars: fetch just that slice, at full resolution
+  // when it fits in MAX_POINTS
+  const downsampled = sourcePoints > total;
+  useEffect(() => {
+    if (!downsampled || !total || (safeStart === 0 && safeEnd === total - 1)) return;
+    const timer = setTimeout(() => {
+      setDetailRange({
+        view: viewKey,
+        start: prices[safeStart].date,
+        // a merged candle covers the bars up to the next one's date
+        end: safeEnd + 1 < total ? prices[safeEnd + 1].date : detail?.end,
+      });
+    }, 300);
+    return () => clearTimeout(timer);
+    // eslint-disable-next-line react-hooks/exhaustive-deps
+  }, [downsampled, safeStart, safeEnd, total]);
+
   // safe price range
   let yMin = 0;
   let yMax = 1;
@@ -520,6 +560,11 @@ const PriceChart: React.FC<Props> = ({ symbol, period }) => {
   const zoomByFactor = (factor: number) => {
     if (total <= 1) return;
     const current = safeEnd - safeStart + 1;
+    if (factor > 1 && detail && current >= total) {
+      // zooming out past the fetched slice: back to the whole timeframe
+      setDetailRange(null);
+      return;
+    }
     const newLen = Math.max(10, Math.min(total, Math.round(current * factor)));
     const center = safeStart + current / 2;
 
@@ -541,6 +586,7 @@ const PriceChart: React.FC<Props> = ({ symbol, period }) => {
   };
 
   const resetZoom = () => {
+    if (detail) setDetailRange(null);
     if (!total) return;
     setViewStart(0);
     setViewEnd(total - 1);
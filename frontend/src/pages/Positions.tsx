@@ -1,9 +1,42 @@
 // src/pages/Positions.tsx
-import React from "react";
+import React, { useEffect, useState } from "react";
 import { usePortfolio } from "../stores/portfolio";
+import { apiService, type PortfolioRiskResponse } from "../services/api";
 
 const Positions: React.FC = () => {
   const { positions, orders, equity, cash, closePosition } = usePortfolio();
+  const [risk, setRisk] = useState<PortfolioRiskResponse | null>(null);
+
+  // one bulk request for every holding (volatility, correlated exposure)
+  useEffect(() => {
+    if (positions.length === 0 || equity <= 0) {
+      setRisk(null);
+      return;
+    }
+    let cancelled = false;
+    apiService
+      .getPortfolioRisk({
+        equity,
+        positions: positions.map((p) => ({
+          ticker: p.symbol,
+          entry_price: p.avgPrice,
+          shares: p.qty,
+        })),
+      })
+      .then((data) => {
+        if (!cancelled) setRisk(data);
+      })
+      .catch(() => {
+        if (!cancelled) setRisk(null);
+      });
+    return () => {
+      cancelled = true;
+    };
+  }, [positions, equity]);
+
+  const riskBySymbol = new Map(
+    (risk?.positions ?? []).map((r) => [r.ticker, r] as const)
+  );
 
   return (
     <div className="p-4 md:p-6 space-y-6 text-sm">
@@ -30,6 +63,33 @@ const Positions: React.FC = () => {
         </div>
       </div>
 
+      {/* PORTFOLIO RISK */}
+      {risk?.portfolio.volatility != null && (
+        <div className="flex flex-wrap items-center gap-3 text-xs">
+          <div className="px-3 py-2 rounded-lg border border-zinc-700 bg-zinc-900/70">
+            <div className="text-zinc-400 text-[11px]">Volatility (ann.)</div>
+            <div className="text-zinc-100 font-semibold">
+              {(risk.portfolio.volatility * 100).toFixed(1)}%
+            </div>
+          </div>
+          <div className="px-3 py-2 rounded-lg border border-zinc-700 bg-zinc-900/70">
+            <div className="text-zinc-400 text-[11px]">Correlated Exposure</div>
+            <div className="text-zinc-100 font-semibold">
+              ${(risk.portfolio.correlated_exposure ?? 0).toFixed(2)}
+              <span className="text-zinc-500 font-normal">
+                {" "}of ${risk.portfolio.gross_exposure.toFixed(2)}
+              </span>
+            </div>
+          </div>
+          <div className="px-3 py-2 rounded-lg border border-zinc-700 bg-zinc-900/70">
+            <div className="text-zinc-400 text-[11px]">Risk to Stops</div>
+            <div className="text-zinc-100 font-semibold">
+              {(risk.portfolio.risk_pct * 100).toFixed(2)}%
+            </div>
+          </div>
+        </div>
+      )}
+
       {/* OPEN POSITIONS */}
       <div className="rounded-xl border border-zinc-800 bg-zinc-900/70 overflow-hidden">
         <div className="px-4 py-3 border-b border-zinc-800 flex items-center justify-between">
@@ -54,6 +114,7 @@ const Positions: React.FC = () => {
                   <th className="px-4 py-2 text-right text-zinc-400">Stop Loss</th>
                   <th className="px-4 py-2 text-right text-zinc-400">Take Profit</th>
                   <th className="px-4 py-2 text-right text-zinc-400">Value</th>
+                  <th className="px-4 py-2 text-right text-zinc-400">Risk Share</th>
                   <th className="px-4 py-2 text-right text-zinc-400">Actions</th>
                 </tr>
               </thead>
@@ -61,6 +122,7 @@ const Positions: React.FC = () => {
               <tbody>
                 {positions.map((p) => {
                   const value = p.qty * p.avgPrice;
+                  const share = riskBySymbol.get(p.symbol.toUpperCase())?.risk_contribution;
                   return (
                     <tr key={p.symbol} className="border-t border-zinc-800 hover:bg-zinc-900">
                       <td className="px-4 py-2 font-semibold text-zinc-100">{p.symbol}</td>
@@ -73,6 +135,9 @@ const Positions: React.FC = () => {
                         {p.takeProfit != null ? `$${p.takeProfit.toFixed(2)}` : "—"}
                       </td>
                       <td className="px-4 py-2 text-right">${value.toFixed(2)}</td>
+                      <td className="px-4 py-2 text-right">
+                        {share != null ? `${(share * 100).toFixed(1)}%` : "—"}
+                      </td>
                       <td className="px-4 py-2 text-right">
                         <button
                           onClick={() => closePosition(p.symbol)}
@@ -1,7 +1,7 @@
 // src/pages/Stocks.tsx
 import { useState, useEffect } from "react";
 import { apiService } from "../services/api";
-import type { StockData } from "../services/api";
+import type { StockData, StockStreamDiff } from "../services/api";
 import Tooltip from "../components/Tooltip";
 import PriceChart from "../components/PriceChart";
 
@@ -15,11 +15,20 @@ export default function Stocks() {
 
   useEffect(() => {
     loadTrackedStocks();
-    const interval = setInterval(
-      () => trackedStocks.length > 0 && refreshStocks(),
-      60000
-    );
-    return () => clearInterval(interval);
+    // prices and predictions are pushed by the server instead of polled
+    const close = apiService.streamStocks({
+      onSnapshot: ({ stocks }) => {
+        setTrackedStocks(
+          Object.entries(stocks).map(([name, fields]) => ({ name, ...fields }))
+        );
+        setLastUpdated(new Date());
+      },
+      onDiff: (diff) => {
+        setTrackedStocks((prev) => applyStockDiff(prev, diff));
+        setLastUpdated(new Date());
+      },
+    });
+    return close;
     // eslint-disable-next-line react-hooks/exhaustive-deps
   }, []);
 
@@ -79,8 +88,10 @@ export default function Stocks() {
     try {
       setLoading(true);
       setMsg("");
-      const updatedStocks = await apiService.refreshStocks();
-      setTrackedStocks(updatedStocks);
+      const { updated } = await apiService.refreshStocks();
+      setTrackedStocks((prev) =>
+        prev.map((s) => updated.find((u) => u.name === s.name) ?? s)
+      );
       setLastUpdated(new Date());
     } catch (err) {
       setMsg(
@@ -311,3 +322,18 @@ export default function Stocks() {
     </div>
   );
 }
+
+function applyStockDiff(
+  prev: StockData[],
+  { stocks, removed }: StockStreamDiff
+): StockData[] {
+  const next = prev
+    .filter((s) => !removed.includes(s.name))
+    .map((s) => (stocks[s.name] ? { ...s, ...stocks[s.name] } : s));
+  for (const [name, fields] of Object.entries(stocks)) {
+    if (!next.some((s) => s.name === name)) {
+      next.push({ name, price: 0, prediction: -1, ...fields });
+    }
+  }
+  return next;
+}
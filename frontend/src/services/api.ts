@@ -8,12 +8,55 @@ export interface StockData {
   companyName?: string;
   price: number;
   prediction: number; // 1 = UP, 0 = DOWN, -1 = no signal
+  trainingJobId?: string | null; // set by addStock while a model is training
 }
 
 export interface ApiError {
   error: string;
 }
 
+/**
+ * Result of PUT /api/stocks/refresh
+ */
+export interface RefreshResponse {
+  updated: StockData[];
+  failed: string[];
+  timed_out: string[];
+  elapsed_ms: number;
+  message: string;
+}
+
+/**
+ * Events from GET /api/stocks/stream (server-sent events).
+ * A snapshot carries the whole watchlist; a diff carries only the fields
+ * that changed per ticker plus the tickers that were removed.
+ */
+export interface StockStreamSnapshot {
+  stocks: Record<string, Omit<StockData, "name">>;
+  ts: number;
+}
+
+export interface StockStreamDiff {
+  stocks: Record<string, Partial<Omit<StockData, "name">>>;
+  removed: string[];
+  ts: number;
+}
+
+export interface StockStreamHandlers {
+  onSnapshot: (event: StockStreamSnapshot) => void;
+  onDiff: (event: StockStreamDiff) => void;
+  onError?: () => void;
+}
+
+/**
+ * Result of GET /api/predictions
+ */
+export interface BatchPredictionsResponse {
+  predictions: { ticker: string; prediction: number; latency_ms: number }[];
+  load_ms: number;
+  elapsed_ms: number;
+}
+
 /**
  * Price history point for charts
  */
@@ -29,6 +72,32 @@ export interface PriceHistoryPoint {
 export interface StockHistoryResponse {
   ticker: string;
   prices: PriceHistoryPoint[];
+  sourcePoints?: number; // bars in the range before downsampling
+}
+
+/**
+ * Range and downsampling options for getStockHistory
+ */
+export interface StockHistoryOptions {
+  start?: string; // "YYYY-MM-DD"; overrides period
+  end?: string; // "YYYY-MM-DD", inclusive
+  maxPoints?: number;
+  mode?: "ohlc" | "line"; // merged candles, or LTTB over the close
+  interval?: "1d" | "1m" | "5m" | "15m" | "30m" | "1h"; // intraday dates are "YYYY-MM-DDTHH:MM"
+}
+
+/**
+ * Columnar history payload (format=columns): one array per field
+ */
+export interface StockHistoryColumns {
+  ticker: string;
+  date: string[];
+  open: number[];
+  high: number[];
+  low: number[];
+  close: number[];
+  volume: number[];
+  source_points?: number;
 }
 
 /**
@@ -44,6 +113,147 @@ export interface RiskResponse {
   risk_per_trade: number;
 }
 
+/**
+ * Bulk risk request/response for POST /api/risk
+ */
+export interface RiskPosition {
+  ticker: string;
+  entry_price: number;
+  shares?: number | null; // held shares; omit to size a candidate entry
+}
+
+export interface PortfolioRiskRequest {
+  positions: RiskPosition[];
+  equity?: number;
+  risk_per_trade?: number;
+  atr_mult_sl?: number;
+  atr_mult_tp?: number;
+  lookback_days?: number;
+}
+
+export interface PositionRisk {
+  ticker: string;
+  entry_price: number;
+  error?: string; // set instead of the fields below when it cannot be sized
+  atr?: number;
+  stop_loss?: number;
+  take_profit?: number;
+  recommended_shares?: number;
+  shares?: number;
+  last_close?: number;
+  value?: number;
+  weight?: number;
+  dollar_risk?: number;
+  volatility?: number; // annualized
+  risk_contribution?: number; // share of portfolio variance
+}
+
+export interface PortfolioRiskResponse {
+  positions: PositionRisk[];
+  portfolio: {
+    equity: number;
+    positions: number;
+    gross_exposure: number;
+    dollar_risk: number;
+    risk_pct: number;
+    volatility?: number; // annualized, fraction of equity
+    daily_volatility_dollars?: number;
+    correlated_exposure?: number;
+    diversification?: number | null; // correlated / gross exposure
+  };
+  window?: { days: number; start?: string; end?: string; error?: string };
+  covariance?: {
+    tickers: string[];
+    matrix: number[][]; // annualized
+    correlation: number[][];
+  };
+}
+
+/**
+ * Screen options and response for GET /api/screener
+ */
+export interface ScreenOptions {
+  filter?: string; // e.g. "rsi < 30 and close > sma"
+  rank?: string; // e.g. "change(close, 20)"
+  order?: "asc" | "desc";
+  limit?: number;
+}
+
+export interface ScreenResult {
+  ticker: string;
+  score?: number | null;
+  close: number | null;
+  volume: number | null;
+  rsi: number | null;
+  macd: number | null;
+  macd_signal: number | null;
+  sma: number | null;
+  ema: number | null;
+  atr: number | null;
+}
+
+export interface ScreenResponse {
+  asof: string | null;
+  universe: number;
+  with_bar?: number;
+  matched: number;
+  results: ScreenResult[];
+  ms?: number;
+}
+
+/**
+ * Parameter sweep request/response for POST /api/simulate
+ */
+export interface SimulationRequest {
+  tickers: string[];
+  atr_mult_sl?: number[];
+  atr_mult_tp?: number[];
+  risk_per_trade?: number[];
+  years?: number;
+  max_hold?: number;
+  signals?: "target" | "model";
+  equity?: number;
+  top?: number;
+}
+
+export interface SimulationStats {
+  risk_per_trade: number;
+  atr_mult_sl: number;
+  atr_mult_tp: number;
+  trades: number;
+  win_rate: number;
+  total_return: number;
+  max_drawdown: number;
+  sharpe_per_trade: number;
+  profit_factor: number | null;
+  avg_hold_bars: number;
+}
+
+export interface SimulationResponse {
+  combinations: number;
+  signals: "target" | "model";
+  // true for signals="target", which replays realised moves (look-ahead)
+  upper_bound: boolean;
+  max_hold: number;
+  best?: SimulationStats;
+  // one array per parameter / stat, one entry per combination
+  grid?: Record<keyof SimulationStats, (number | null)[]>;
+  tickers: Record<
+    string,
+    {
+      bars: number;
+      start: string;
+      end: string;
+      signals: number;
+      best: (SimulationStats & {
+        equity_curve: { dates: string[]; equity: number[] };
+      })[];
+    }
+  >;
+  errors: Record<string, string>;
+  elapsed_ms: number;
+}
+
 /**
  * Metadata about trained ML models (for Model Status UI)
  * Returned by /api/models
@@ -55,6 +265,20 @@ export interface TrainedModelInfo {
   data_end?: string | null;
 }
 
+/**
+ * Background training job from /api/admin/train and /api/admin/jobs/{id}
+ */
+export interface TrainingJob {
+  id: string;
+  ticker: string;
+  status: "queued" | "running" | "succeeded" | "failed";
+  years_back: number;
+  submitted_at: string | null;
+  started_at: string | null;
+  finished_at: string | null;
+  error: string | null;
+}
+
 /**
  * Client wrapper around your FastAPI backend
  */
@@ -121,22 +345,33 @@ class ApiService {
   /**
    * PUT /api/stocks/refresh
    * Re-fetches data for all tracked stocks.
-   * Backend returns { updated, failed, message }.
+   * Backend returns { updated, failed, timed_out, elapsed_ms, message };
+   * symbols that were too slow are listed in both failed and timed_out.
    */
-  async refreshStocks(): Promise<{
-    updated: StockData[];
-    failed: string[];
-    message: string;
-  }> {
-    return this.request<{
-      updated: StockData[];
-      failed: string[];
-      message: string;
-    }>("/api/stocks/refresh", {
+  async refreshStocks(): Promise<RefreshResponse> {
+    return this.request<RefreshResponse>("/api/stocks/refresh", {
       method: "PUT",
     });
   }
 
+  /**
+   * GET /api/stocks/stream
+   * Subscribes to watchlist updates pushed by the server. EventSource
+   * reconnects on its own, and the server starts every connection with a
+   * snapshot. Returns a function that closes the stream.
+   */
+  streamStocks(handlers: StockStreamHandlers): () => void {
+    const source = new EventSource(`${API_BASE_URL}/api/stocks/stream`);
+    source.addEventListener("snapshot", (e) =>
+      handlers.onSnapshot(JSON.parse((e as MessageEvent).data))
+    );
+    source.addEventListener("diff", (e) =>
+      handlers.onDiff(JSON.parse((e as MessageEvent).data))
+    );
+    source.onerror = () => handlers.onError?.();
+    return () => source.close();
+  }
+
   /**
    * DELETE /api/stocks/{ticker}
    * Removes one stock from the tracked list.
@@ -160,6 +395,15 @@ class ApiService {
     });
   }
 
+  /**
+   * GET /api/predictions?tickers=AAPL,MSFT
+   * Predictions for many tickers in one round trip.
+   */
+  async getPredictions(tickers: string[]): Promise<BatchPredictionsResponse> {
+    const q = new URLSearchParams({ tickers: tickers.join(",") }).toString();
+    return this.request<BatchPredictionsResponse>(`/api/predictions?${q}`);
+  }
+
   // ---------- SINGLE STOCK DATA (PORTAL / TRADEVIEW) ----------
 
   /**
@@ -173,18 +417,39 @@ class ApiService {
   }
 
   /**
-   * GET /api/stocks/{ticker}/history?period=3mo
+   * GET /api/stocks/{ticker}/history?period=3mo&format=columns
    * Price history for charts.
    * period examples: "1d", "5d", "1mo", "3mo", "6mo", "1y", "5y", "max"
+   * Fetched as parallel arrays (smaller payload) and expanded here; the
+   * backend sends an ETag so the browser revalidates instead of re-downloading.
+   * With options.start/end only that slice is fetched, and with
+   * options.maxPoints the server downsamples it (sourcePoints in the
+   * result is the bar count before downsampling).
    */
   async getStockHistory(
     ticker: string,
-    period: string
+    period: string,
+    options: StockHistoryOptions = {}
   ): Promise<StockHistoryResponse> {
-    const q = new URLSearchParams({ period }).toString();
-    return this.request<StockHistoryResponse>(
+    const params: Record<string, string> = { period, format: "columns" };
+    if (options.start) params.start = options.start;
+    if (options.end) params.end = options.end;
+    if (options.maxPoints) params.max_points = String(options.maxPoints);
+    if (options.mode) params.mode = options.mode;
+    if (options.interval) params.interval = options.interval;
+    const q = new URLSearchParams(params).toString();
+    const cols = await this.request<StockHistoryColumns>(
       `/api/stocks/${encodeURIComponent(ticker)}/history?${q}`
     );
+    const prices: PriceHistoryPoint[] = cols.date.map((date, i) => ({
+      date,
+      open: cols.open[i],
+      high: cols.high[i],
+      low: cols.low[i],
+      close: cols.close[i],
+      volume: cols.volume[i],
+    }));
+    return { ticker: cols.ticker, prices, sourcePoints: cols.source_points };
   }
 
   /**
@@ -212,6 +477,43 @@ class ApiService {
     );
   }
 
+  /**
+   * GET /api/screener
+   * Tickers whose latest bar passes the filter, ordered by the rank expression.
+   */
+  async screenStocks(options: ScreenOptions = {}): Promise<ScreenResponse> {
+    const params: Record<string, string> = {};
+    if (options.filter) params.filter = options.filter;
+    if (options.rank) params.rank = options.rank;
+    if (options.order) params.order = options.order;
+    if (options.limit) params.limit = String(options.limit);
+    const q = new URLSearchParams(params).toString();
+    return this.request<ScreenResponse>(`/api/screener${q ? `?${q}` : ""}`);
+  }
+
+  /**
+   * POST /api/risk
+   * Stops, targets and sizes for many positions plus portfolio volatility
+   * and correlated exposure.
+   */
+  async getPortfolioRisk(req: PortfolioRiskRequest): Promise<PortfolioRiskResponse> {
+    return this.request<PortfolioRiskResponse>("/api/risk", {
+      method: "POST",
+      body: JSON.stringify(req),
+    });
+  }
+
+  /**
+   * POST /api/simulate
+   * Backtests the risk stop/target rule over a grid of parameters.
+   */
+  async simulateRisk(req: SimulationRequest): Promise<SimulationResponse> {
+    return this.request<SimulationResponse>("/api/simulate", {
+      method: "POST",
+      body: JSON.stringify(req),
+    });
+  }
+
   // ---------- MODEL MANAGEMENT (for future / Model Status UI) ----------
 
   /**
@@ -225,14 +527,14 @@ class ApiService {
   /**
    * POST /api/admin/train
    * Body: { tickers: string[] }
-   * Trigger training for one or more tickers (optional admin feature).
-   * NOTE: Backend endpoint needs to exist for this to work.
+   * Queues background training for one or more tickers (optional admin feature).
+   * Returns one job per ticker; poll getTrainingJob(id) until it finishes.
    */
   async trainModels(tickers: string[]): Promise<{
-    trained: string[];
+    jobs: TrainingJob[];
     message: string;
   }> {
-    return this.request<{ trained: string[]; message: string }>(
+    return this.request<{ jobs: TrainingJob[]; message: string }>(
       "/api/admin/train",
       {
         method: "POST",
@@ -240,6 +542,16 @@ class ApiService {
       }
     );
   }
+
+  /**
+   * GET /api/admin/jobs/{id}
+   * Status of a background training job.
+   */
+  async getTrainingJob(id: string): Promise<TrainingJob> {
+    return this.request<TrainingJob>(
+      `/api/admin/jobs/${encodeURIComponent(id)}`
+    );
+  }
 }
 
 export const apiService = new ApiService();